@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+asyncio (aiohttp) による非同期のページ取得
+
+抽出の大半はネットワーク待ちのため、プロセス数 (CPUコア数) に関係なく数百のURLを
+同時に取得します。取得した本文は PrefetchedResponse として抽出器に渡し、
+BeautifulSoup による解析とそれ以降のフォールバック (Selenium / Jina) は
+抽出ワーカーのプロセスプールで行います。
+
+aiohttp がインストールされていない場合は AIOHTTP_AVAILABLE が False になり、
+抽出器は従来のプロセスプールのみのエンジンで動作します。
+"""
+
+import asyncio
+import sqlite3
+import time
+
+import requests
+from requests.compat import chardet
+from requests.structures import CaseInsensitiveDict
+
+import host_limiter
+
+try:
+    import aiohttp
+    AIOHTTP_AVAILABLE = True
+except ImportError:
+    AIOHTTP_AVAILABLE = False
+
+# 同時接続数の既定値と、同一ホストへの同時接続数の上限
+DEFAULT_CONCURRENCY = 200
+PER_HOST_LIMIT = 8
+# 1つのURLの取得タイムアウト（秒）。requests の通常抽出と同じ
+DEFAULT_TIMEOUT = 30
+
+
+class PrefetchedResponse:
+    """非同期に取得した応答を requests.Response と同じ属性で扱うためのラッパー"""
+
+    def __init__(self, prefetched):
+        """
+        Parameters:
+        prefetched (dict): fetch_all が返した結果 {'status', 'headers', 'body'} または {'error'}
+                           (HTTPキャッシュの本文を使う場合は 'cached' と前回の抽出結果 'extraction' も含む)
+        """
+        self.error = prefetched.get('error')
+        self.status_code = prefetched.get('status')
+        self.headers = CaseInsensitiveDict(prefetched.get('headers') or {})
+        self.content = prefetched.get('body') or b''
+        self.url = prefetched.get('url')
+        # 本文がHTTPキャッシュに保存したものと同じか、その本文から前回抽出した (テキスト, 抽出方法)
+        self.http_cached = prefetched.get('cached', False)
+        self.cached_extraction = prefetched.get('extraction')
+
+    def raise_for_status(self):
+        """取得エラーまたはHTTPエラーの場合は requests と同じ例外を送出する"""
+        if self.error:
+            raise requests.exceptions.ConnectionError(self.error)
+        if self.status_code is not None and self.status_code >= 400:
+            raise requests.exceptions.HTTPError(f"{self.status_code} Error for url: {self.url}")
+
+    @property
+    def apparent_encoding(self):
+        """本文から推定したエンコーディング (requests と同じ chardet / charset_normalizer を使用)"""
+        detected = chardet.detect(self.content) if chardet else None
+        return detected['encoding'] if detected else None
+
+    @property
+    def text(self):
+        return self.content.decode(self.apparent_encoding or 'utf-8', errors='replace')
+
+
+async def _acquire(limiter, host):
+    """
+    ホストへのリクエスト枠が空くまで（イベントループを止めずに）待って取得する
+
+    Raises:
+    host_limiter.HostBlockedError: 待つ時間が max_wait を超える場合
+    """
+    loop = asyncio.get_running_loop()
+    started = time.time()
+    while True:
+        lease_id, wait = await loop.run_in_executor(None, limiter.try_acquire, host)
+        if lease_id is not None:
+            return lease_id
+        limiter.check_wait(host, started, wait)
+        await asyncio.sleep(min(wait, host_limiter.MAX_POLL_INTERVAL))
+
+
+async def _fetch(session, url, timeout, limiter=None):
+    """1つのURLを取得する（エラーは結果の 'error' に入れて返す）"""
+    host = host_limiter.host_of(url)
+    lease_id = None
+    # (リクエスト制限の記録はSQLiteへの書き込みで他のワークスペースを待つことがあるため、
+    #  枠の取得と同様にイベントループのスレッドでは行わない)
+    loop = asyncio.get_running_loop()
+    try:
+        if limiter is not None and host:
+            lease_id = await _acquire(limiter, host)
+        async with session.get(url, timeout=aiohttp.ClientTimeout(total=timeout), allow_redirects=True) as response:
+            body = await response.read()
+            if response.status == 429 and limiter is not None:
+                await loop.run_in_executor(None, limiter.penalize, host,
+                                           host_limiter.retry_after_seconds(response.headers))
+            return {
+                'url': str(response.url),
+                'status': response.status,
+                'headers': dict(response.headers),
+                'body': body,
+            }
+    except asyncio.TimeoutError:
+        return {'url': url, 'error': f"タイムアウト ({timeout}秒)"}
+    except (aiohttp.ClientError, ValueError) as e:
+        return {'url': url, 'error': str(e) or type(e).__name__}
+    except sqlite3.Error as e:
+        return {'url': url, 'error': f"リクエスト制限の確認エラー: {e}"}
+    except host_limiter.HostBlockedError as e:
+        return {'url': url, 'error': str(e)}
+    finally:
+        if lease_id is not None:
+            # (取得が中断された場合も返却は最後まで行う)
+            await asyncio.shield(loop.run_in_executor(None, limiter.release, lease_id))
+
+
+async def _fetch_all(items, on_done, concurrency, timeout, headers, limiter):
+    connector = aiohttp.TCPConnector(limit=concurrency, limit_per_host=PER_HOST_LIMIT)
+    async with aiohttp.ClientSession(connector=connector, headers=headers) as session:
+        async def fetch_one(tag, url):
+            on_done(tag, url, await _fetch(session, url, timeout, limiter))
+        await asyncio.gather(*(fetch_one(tag, url) for tag, url in items))
+
+
+def fetch_all(items, on_done, concurrency=DEFAULT_CONCURRENCY, timeout=DEFAULT_TIMEOUT, headers=None, limiter=None):
+    """
+    URLを非同期に取得し、取得できたものから on_done を呼び出す（全件の完了まで戻らない）
+
+    Parameters:
+    items (list): (呼び出し側の識別子, URL) のリスト
+    on_done (callable): on_done(識別子, URL, 結果の辞書) を取得完了ごとに呼び出す
+    concurrency (int): 同時接続数
+    timeout (float): 1つのURLの取得タイムアウト（秒）
+    headers (dict): 全リクエストに付けるヘッダー
+    limiter (HostLimiter): ホストごとのリクエスト制限（Noneの場合は制限しない）
+    """
+    asyncio.run(_fetch_all(list(items), on_done, concurrency, timeout, headers or {}, limiter))
@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+複数マシンでキーワードを分担するためのコーディネーター
+
+delivery_folder の未処理キーワードをHTTPのリース方式で各ワーカーノードに配布します。
+ワーカーはキーワードを取得 (lease) し、処理中は定期的に延長 (heartbeat) して、
+完了したら統合テキストを返します (complete)。期限内に延長されなかったリースは
+ワーカーが停止したものとみなし、キーワードを再びキューに戻します。
+
+エンドポイント (いずれもJSON):
+    POST /lease      {"worker": 名前}                          -> {"keyword", "lease_id", "content", "lease_timeout"}
+    POST /heartbeat  {"lease_id"}                              -> {"ok"}
+    POST /complete   {"lease_id", "keyword", "text"}           -> {"ok"}
+    POST /fail       {"lease_id", "error"}                     -> {"ok"}
+    GET  /status                                               -> 処理状況
+"""
+
+import json
+import os
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from update_delivery_file import deliver_text
+
+DEFAULT_PORT = 8765
+DEFAULT_LEASE_TIMEOUT = 120
+DEFAULT_MAX_ATTEMPTS = 3
+# キーワードがない場合にワーカーへ返す再問い合わせまでの秒数
+RETRY_AFTER = 5
+# 期限切れリースを確認する間隔（秒）
+REAP_INTERVAL = 1.0
+
+
+class LeaseTable:
+    """キーワードのリース状態を管理する（スレッドセーフ）"""
+
+    def __init__(self, delivery_folder, lease_timeout=DEFAULT_LEASE_TIMEOUT, max_attempts=DEFAULT_MAX_ATTEMPTS):
+        """
+        初期化メソッド
+
+        Parameters:
+        delivery_folder (str): 納品フォルダー
+        lease_timeout (float): ハートビートがない場合にリースを失効させるまでの秒数
+        max_attempts (int): 1キーワードあたりの最大試行回数（超えたら失敗として配布しない）
+        """
+        self.delivery_folder = delivery_folder
+        self.lease_timeout = lease_timeout
+        self.max_attempts = max_attempts
+        self.lock = threading.Lock()
+        self.leases = {}  # lease_id -> {'keyword', 'worker', 'leased_at', 'expires_at'}
+        self.attempts = {}  # keyword -> 配布回数
+        self.completed = []
+        self.failed = []
+
+    def _remaining_keywords(self):
+        """delivery_folder 内の未処理キーワードを返す"""
+        completed_folder = os.path.join(self.delivery_folder, 'completed_folder')
+        try:
+            names = sorted(f for f in os.listdir(self.delivery_folder) if f.endswith('.txt'))
+        except FileNotFoundError:
+            return []
+        completed = set(os.listdir(completed_folder)) if os.path.isdir(completed_folder) else set()
+        return [os.path.splitext(name)[0] for name in names if name not in completed]
+
+    def _pending_keywords(self):
+        """リース中・失敗済みを除いた配布可能なキーワードを返す"""
+        leased = set(lease['keyword'] for lease in self.leases.values())
+        return [keyword for keyword in self._remaining_keywords()
+                if keyword not in leased and keyword not in self.failed]
+
+    def _record_attempt_failure(self, keyword, reason):
+        """試行の失敗を記録し、上限に達したキーワードは配布対象から外す"""
+        if self.attempts.get(keyword, 0) >= self.max_attempts:
+            self.failed.append(keyword)
+            print(f"キーワード '{keyword}' は {self.max_attempts} 回失敗したため配布を中止します ({reason})")
+        else:
+            print(f"キーワード '{keyword}' をキューに戻しました ({reason})")
+
+    def lease(self, worker):
+        """
+        未処理のキーワードを1つリースする
+
+        Returns:
+        dict: リース情報。配布できるキーワードがない場合は {'keyword': None, 'finished': 全て完了したか}
+        """
+        with self.lock:
+            self._reap_expired_locked()
+            pending = self._pending_keywords()
+            if not pending:
+                return {'keyword': None, 'finished': not self.leases, 'retry_after': RETRY_AFTER}
+
+            keyword = pending[0]
+            with open(os.path.join(self.delivery_folder, f"{keyword}.txt"), 'r', encoding='utf-8-sig') as f:
+                content = f.read()
+            lease_id = uuid.uuid4().hex
+            now = time.time()
+            self.leases[lease_id] = {
+                'keyword': keyword,
+                'worker': worker,
+                'leased_at': now,
+                'expires_at': now + self.lease_timeout,
+            }
+            self.attempts[keyword] = self.attempts.get(keyword, 0) + 1
+            print(f"リース: '{keyword}' -> {worker} (試行 {self.attempts[keyword]})")
+            return {'keyword': keyword, 'lease_id': lease_id, 'content': content, 'lease_timeout': self.lease_timeout}
+
+    def heartbeat(self, lease_id):
+        """リースを延長する（失効済みの場合はFalse）"""
+        with self.lock:
+            lease = self.leases.get(lease_id)
+            if lease is None:
+                return False
+            lease['expires_at'] = time.time() + self.lease_timeout
+            return True
+
+    def complete(self, lease_id, keyword, text):
+        """
+        ワーカーから返された統合テキストを納品する
+
+        リースが失効していても、他のワーカーに再配布されていなければ結果を受け付ける。
+
+        Returns:
+        bool: 納品した場合True
+        """
+        with self.lock:
+            lease = self.leases.pop(lease_id, None)
+            if lease is not None:
+                keyword = lease['keyword']
+            elif any(other['keyword'] == keyword for other in self.leases.values()):
+                print(f"警告: '{keyword}' の結果は失効したリースのものであり、再配布済みのため破棄します")
+                return False
+
+            target_filepath = os.path.join(self.delivery_folder, f"{keyword}.txt")
+            if not keyword or not os.path.isfile(target_filepath):
+                print(f"警告: '{keyword}' の納品ファイルが見つからないため結果を破棄します")
+                return False
+            deliver_text(target_filepath, text, self.delivery_folder)
+            self.completed.append(keyword)
+            if keyword in self.failed:
+                self.failed.remove(keyword)
+            print(f"完了: '{keyword}' ({lease['worker'] if lease else '失効したリース'})")
+            return True
+
+    def fail(self, lease_id, error=None):
+        """ワーカーでの処理失敗を記録する"""
+        with self.lock:
+            lease = self.leases.pop(lease_id, None)
+            if lease is None:
+                return False
+            self._record_attempt_failure(lease['keyword'], f"{lease['worker']} で失敗: {error}")
+            return True
+
+    def reap_expired(self):
+        """期限切れのリースを失効させる"""
+        with self.lock:
+            self._reap_expired_locked()
+
+    def _reap_expired_locked(self):
+        """期限切れのリースを失効させる（ロック取得済みで呼ぶ）"""
+        now = time.time()
+        for lease_id, lease in list(self.leases.items()):
+            if lease['expires_at'] <= now:
+                del self.leases[lease_id]
+                self._record_attempt_failure(lease['keyword'], f"{lease['worker']} のリースが期限切れ")
+
+    def status(self):
+        """処理状況を辞書で返す"""
+        with self.lock:
+            now = time.time()
+            return {
+                'pending': len(self._pending_keywords()),
+                'leased': [{'keyword': lease['keyword'], 'worker': lease['worker'],
+                            'seconds': round(now - lease['leased_at'], 1)} for lease in self.leases.values()],
+                'completed': list(self.completed),
+                'failed': list(self.failed),
+            }
+
+    def is_finished(self):
+        """配布できるキーワードもリース中のキーワードもなければTrue"""
+        with self.lock:
+            return not self.leases and not self._pending_keywords()
+
+
+class CoordinatorRequestHandler(BaseHTTPRequestHandler):
+    """リースプロトコルのHTTPハンドラー"""
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if not length:
+            return {}
+        return json.loads(self.rfile.read(length).decode('utf-8'))
+
+    def do_GET(self):
+        if self.path == '/status':
+            self._send_json(200, self.server.lease_table.status())
+        else:
+            self._send_json(404, {'error': 'not found'})
+
+    def do_POST(self):
+        table = self.server.lease_table
+        try:
+            request = self._read_json()
+            if self.path == '/lease':
+                self._send_json(200, table.lease(request.get('worker') or self.client_address[0]))
+            elif self.path == '/heartbeat':
+                ok = table.heartbeat(request.get('lease_id'))
+                self._send_json(200 if ok else 410, {'ok': ok})
+            elif self.path == '/complete':
+                ok = table.complete(request.get('lease_id'), request.get('keyword'), request.get('text') or '')
+                self._send_json(200 if ok else 409, {'ok': ok})
+            elif self.path == '/fail':
+                ok = table.fail(request.get('lease_id'), request.get('error'))
+                self._send_json(200 if ok else 410, {'ok': ok})
+            else:
+                self._send_json(404, {'error': 'not found'})
+        except (ValueError, OSError) as e:
+            print(f"エラー: {self.path} の処理中にエラーが発生しました: {e}")
+            self._send_json(500, {'error': str(e)})
+
+    def log_message(self, format, *args):
+        # リクエストごとのアクセスログは出力しない (リース・完了はLeaseTableで表示)
+        pass
+
+
+def serve(delivery_folder, host='127.0.0.1', port=DEFAULT_PORT, lease_timeout=DEFAULT_LEASE_TIMEOUT,
+          max_attempts=DEFAULT_MAX_ATTEMPTS, should_stop=None, exit_when_done=True):
+    """
+    コーディネーターを起動し、全キーワードが完了するか停止要求があるまで待つ
+
+    Parameters:
+    delivery_folder (str): 納品フォルダー
+    host (str): 待ち受けるアドレス
+    port (int): 待ち受けるポート
+    lease_timeout (float): リースの有効期限（秒）
+    max_attempts (int): 1キーワードあたりの最大試行回数
+    should_stop (callable): Trueを返したら終了する関数（停止要求の確認用）
+    exit_when_done (bool): 全キーワードが完了したら終了する
+
+    Returns:
+    dict: 最終的な処理状況（LeaseTable.status() の値）
+    """
+    lease_table = LeaseTable(delivery_folder, lease_timeout, max_attempts)
+    server = ThreadingHTTPServer((host, port), CoordinatorRequestHandler)
+    server.daemon_threads = True
+    server.lease_table = lease_table
+    server_thread = threading.Thread(target=server.serve_forever, daemon=True)
+    server_thread.start()
+    print(f"コーディネーターを http://{host}:{server.server_address[1]} で起動しました (リース期限: {lease_timeout}秒)")
+
+    finished_at = None
+    try:
+        while True:
+            time.sleep(REAP_INTERVAL)
+            lease_table.reap_expired()
+            if should_stop and should_stop():
+                print("停止要求を受け付けました。コーディネーターを終了します。")
+                break
+            if not exit_when_done:
+                continue
+            if not lease_table.is_finished():
+                finished_at = None
+            elif finished_at is None:
+                # 待機中のワーカーが完了を受け取れるよう、再問い合わせの間隔だけ待ってから終了する
+                finished_at = time.time()
+                print("すべてのキーワードの処理が完了しました。")
+            elif time.time() - finished_at > RETRY_AFTER + REAP_INTERVAL:
+                break
+    finally:
+        server.shutdown()
+        server.server_close()
+    return lease_table.status()
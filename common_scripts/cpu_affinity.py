@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+同時実行する作業フォルダー間でのCPUコアの割り当て
+
+run_all_starts.py がスロットごとに重ならないコアの集合を決め、環境変数
+WEBTEXT_CPU_SET で start.py に渡します。start.py は cpu_ratio をこの集合に対して
+適用するため、全スロットの抽出処理が先頭のコアに集中することがなくなります。
+"""
+
+import glob
+import os
+import re
+
+# スロットに割り当てたCPUの集合を子プロセスへ渡す環境変数 (例: "0-3,8")
+CPU_SET_ENV = 'WEBTEXT_CPU_SET'
+
+# 割り当て方式
+LAYOUT_SHARED = 'shared'  # 割り当てなし (従来どおり全スロットが先頭からのコアを使う)
+LAYOUT_SPREAD = 'spread'  # 利用可能なコアを連続した区間に分けて割り当てる
+LAYOUT_NUMA = 'numa'      # NUMAノードをまたがないように割り当てる
+LAYOUTS = [LAYOUT_SHARED, LAYOUT_SPREAD, LAYOUT_NUMA]
+
+NUMA_NODE_GLOB = '/sys/devices/system/node/node[0-9]*/cpulist'
+
+
+def parse_cpu_list(text):
+    """
+    "0-3,8,10-11" 形式の文字列をCPU番号のリストに変換する
+
+    Returns:
+    list: 昇順のCPU番号のリスト（解析できない場合は空リスト）
+    """
+    cpus = set()
+    for part in (text or '').strip().split(','):
+        part = part.strip()
+        if not part:
+            continue
+        match = re.fullmatch(r'(\d+)(?:-(\d+))?', part)
+        if not match:
+            return []
+        start = int(match.group(1))
+        end = int(match.group(2)) if match.group(2) else start
+        cpus.update(range(start, end + 1))
+    return sorted(cpus)
+
+
+def format_cpu_list(cpus):
+    """CPU番号のリストを "0-3,8" 形式の文字列に変換する"""
+    ranges = []
+    for cpu in sorted(set(cpus)):
+        if ranges and cpu == ranges[-1][1] + 1:
+            ranges[-1][1] = cpu
+        else:
+            ranges.append([cpu, cpu])
+    return ','.join(str(start) if start == end else f"{start}-{end}" for start, end in ranges)
+
+
+def available_cpus():
+    """このプロセスが使用できるCPU番号のリストを返す"""
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def numa_nodes():
+    """
+    NUMAノードごとのCPU番号のリストを返す（Linux以外や単一ノードの場合はNone）
+
+    Returns:
+    list: [[ノード0のCPU], [ノード1のCPU], ...]（使用可能なCPUのみ）
+    """
+    usable = set(available_cpus())
+    nodes = []
+    for path in sorted(glob.glob(NUMA_NODE_GLOB), key=lambda p: int(re.search(r'node(\d+)', p).group(1))):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                cpus = [cpu for cpu in parse_cpu_list(f.read()) if cpu in usable]
+        except OSError:
+            continue
+        if cpus:
+            nodes.append(cpus)
+    return nodes if len(nodes) > 1 else None
+
+
+def _split(cpus, parts):
+    """CPUのリストを parts 個の連続した区間にできるだけ均等に分ける"""
+    if parts <= len(cpus):
+        base, extra = divmod(len(cpus), parts)
+        result = []
+        start = 0
+        for i in range(parts):
+            size = base + (1 if i < extra else 0)
+            result.append(cpus[start:start + size])
+            start += size
+        return result
+    # スロット数がCPU数より多い場合は、1コアを複数スロットで共有する
+    return [[cpus[i % len(cpus)]] for i in range(parts)]
+
+
+def partition_cpus(num_slots, layout=LAYOUT_SPREAD):
+    """
+    スロットごとに重ならないCPUの集合を決める
+
+    Parameters:
+    num_slots (int): スロット数
+    layout (str): 割り当て方式 (shared / spread / numa)
+
+    Returns:
+    list: スロットごとのCPU番号のリスト（shared の場合は全要素がNone）
+    """
+    if layout == LAYOUT_SHARED or num_slots < 1:
+        return [None] * num_slots
+
+    nodes = numa_nodes() if layout == LAYOUT_NUMA else None
+    if not nodes:
+        if layout == LAYOUT_NUMA:
+            print("NUMAノード情報が見つからないため、spread 方式で割り当てます。")
+        return _split(available_cpus(), num_slots)
+
+    # ノードのCPU数に比例してスロットを配分し、各ノード内で分割する
+    total_cpus = sum(len(node) for node in nodes)
+    slots_per_node = [num_slots * len(node) // total_cpus for node in nodes]
+    remainders = sorted(range(len(nodes)),
+                        key=lambda i: num_slots * len(nodes[i]) / total_cpus - slots_per_node[i], reverse=True)
+    for i in remainders[:num_slots - sum(slots_per_node)]:
+        slots_per_node[i] += 1
+
+    partitions = []
+    for node, node_slots in zip(nodes, slots_per_node):
+        if node_slots:
+            partitions.extend(_split(node, node_slots))
+    return partitions
+
+
+def cpu_set_from_env():
+    """
+    環境変数 WEBTEXT_CPU_SET で割り当てられたCPUのリストを返す
+
+    Returns:
+    list: 割り当てられたCPU番号のリスト（未設定または無効な場合はNone）
+    """
+    value = os.environ.get(CPU_SET_ENV)
+    if not value:
+        return None
+    usable = set(available_cpus())
+    cpus = [cpu for cpu in parse_cpu_list(value) if cpu in usable]
+    if not cpus:
+        print(f"警告: {CPU_SET_ENV}={value} に使用可能なCPUが含まれていないため無視します。")
+        return None
+    return cpus
+
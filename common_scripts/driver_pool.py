@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+抽出ワーカープロセスごとのChromeドライバープール
+
+URLごとにChromeを起動・終了する代わりに、プロセス内でドライバーを使い回します。
+ページを処理するたびにCookie・ストレージを消去して about:blank に戻し、
+一定数のページを処理したドライバーや状態をリセットできなくなったドライバー
+（クラッシュしたブラウザー）は終了して次回に新しく起動します。
+"""
+
+import os
+import threading
+from multiprocessing import util
+
+try:
+    import psutil
+    PSUTIL_AVAILABLE = True
+except ImportError:
+    PSUTIL_AVAILABLE = False
+
+# config.ini のセクション名と既定値
+CONFIG_SECTION = 'DRIVER_POOL'
+DEFAULT_POOL_SIZE = 1      # プロセスごとに保持するドライバーの最大数
+DEFAULT_MAX_PAGES = 50     # ドライバーを再起動するまでに処理するページ数
+
+# ページ間で消去するストレージ（現在のオリジン分）
+_CLEAR_STORAGE_SCRIPT = 'try { window.localStorage.clear(); window.sessionStorage.clear(); } catch (e) {}'
+
+# プロセスごとのプール (fork後の子プロセスでは作り直す)
+_pool = None
+
+
+def read_config(config):
+    """
+    config.ini の [DRIVER_POOL] からプールの設定を読み込む
+
+    Parameters:
+    config (ConfigParser): 読み込み済みの設定
+
+    Returns:
+    tuple: (プールサイズ, ドライバーごとの最大ページ数)
+    """
+    size = DEFAULT_POOL_SIZE
+    max_pages = DEFAULT_MAX_PAGES
+    if config.has_section(CONFIG_SECTION):
+        size = config.getint(CONFIG_SECTION, 'size', fallback=DEFAULT_POOL_SIZE)
+        max_pages = config.getint(CONFIG_SECTION, 'max_pages', fallback=DEFAULT_MAX_PAGES)
+    return max(1, size), max(1, max_pages)
+
+
+def reset_driver(driver):
+    """
+    次のページのためにドライバーの状態を消去する
+
+    Raises:
+    Exception: ブラウザーが応答しない場合（呼び出し側でドライバーを破棄する）
+    """
+    # ページが開いた追加のウィンドウを閉じる
+    handles = driver.window_handles
+    for handle in handles[1:]:
+        driver.switch_to.window(handle)
+        driver.close()
+    driver.switch_to.window(handles[0])
+    driver.execute_script(_CLEAR_STORAGE_SCRIPT)
+    try:
+        # 全ドメインのCookieを消去する (Chrome DevTools Protocol)
+        driver.execute_cdp_cmd('Network.clearBrowserCookies', {})
+    except AttributeError:
+        driver.delete_all_cookies()
+    driver.get('about:blank')
+
+
+def _quit(driver):
+    """ドライバーを終了する（終了時のエラーは無視する）"""
+    try:
+        driver.quit()
+    except Exception as e:
+        print(f"Seleniumドライバー終了エラー: {e}")
+
+
+def _kill(driver):
+    """応答しないドライバーを強制終了する（chromedriver と、psutil があれば配下のChromeも）"""
+    process = getattr(getattr(driver, 'service', None), 'process', None)
+    if process is None:
+        return
+    try:
+        if PSUTIL_AVAILABLE:
+            for child in psutil.Process(process.pid).children(recursive=True):
+                child.kill()
+        process.kill()
+        process.wait(timeout=5)
+    except Exception as e:
+        print(f"Seleniumドライバー強制終了エラー: {e}")
+
+
+class DriverPool:
+    """プロセス内で使い回すWebDriverのプール"""
+
+    def __init__(self, factory, size=DEFAULT_POOL_SIZE, max_pages=DEFAULT_MAX_PAGES):
+        """
+        初期化メソッド
+
+        Parameters:
+        factory (callable): 新しいドライバーを返す関数（失敗時はNone）
+        size (int): 保持するドライバーの最大数（使用中を含む）
+        max_pages (int): ドライバーを再起動するまでに処理するページ数
+        """
+        self.factory = factory
+        self.size = size
+        self.max_pages = max_pages
+        self.pid = os.getpid()
+        self._idle = []
+        self._borrowed = {}  # id(driver) -> 貸し出し中のドライバー
+        self._pages = {}  # id(driver) -> 処理したページ数
+        self._in_use = 0
+        self._cond = threading.Condition()
+        self.launched = 0
+        self.recycled = 0
+
+    def acquire(self):
+        """
+        ドライバーを借りる（空きがなく上限に達している場合は返却を待つ）
+
+        Returns:
+        WebDriver: ドライバー（起動に失敗した場合はNone）
+        """
+        with self._cond:
+            while not self._idle and self._in_use >= self.size:
+                self._cond.wait()
+            self._in_use += 1
+            if self._idle:
+                driver = self._idle.pop()
+                self._borrowed[id(driver)] = driver
+                return driver
+        try:
+            driver = self.factory()
+        except BaseException:
+            # (起動中に処理時間の上限を超えた場合など。借りていないドライバーの枠を戻す)
+            self._return_slot()
+            raise
+        if driver is None:
+            self._return_slot()
+            return None
+        self.launched += 1
+        self._pages[id(driver)] = 0
+        self._borrowed[id(driver)] = driver
+        return driver
+
+    def release(self, driver, discard=False):
+        """
+        ドライバーを返却する
+
+        状態のリセットに失敗した場合・最大ページ数に達した場合・discard の場合はドライバーを終了する。
+
+        Parameters:
+        driver (WebDriver): acquire() で借りたドライバー（Noneの場合は何もしない）
+        discard (bool): 再利用せずに終了する場合True
+        """
+        if driver is None or id(driver) not in self._borrowed:
+            # 貸し出していない（discard_borrowed で強制終了済みの）ドライバー
+            return
+        pages = self._pages.get(id(driver), 0) + 1
+        self._pages[id(driver)] = pages
+        if not discard and pages < self.max_pages:
+            try:
+                reset_driver(driver)
+            except Exception as e:
+                print(f"ドライバーの状態をリセットできないため再起動します: {e}")
+                discard = True
+        else:
+            discard = True
+
+        # リセットが終わるまでは貸し出し中のまま (途中で処理時間の上限を超えたら discard_borrowed で終了させる)
+        self._borrowed.pop(id(driver), None)
+        try:
+            if discard:
+                self._pages.pop(id(driver), None)
+                self.recycled += 1
+                _quit(driver)
+        finally:
+            # (終了中に処理時間の上限を超えても、枠は必ず戻す)
+            with self._cond:
+                self._in_use -= 1
+                if not discard:
+                    self._idle.append(driver)
+                self._cond.notify()
+
+    def _return_slot(self):
+        """ドライバーを貸し出さなかった枠を戻す"""
+        with self._cond:
+            self._in_use -= 1
+            self._cond.notify()
+
+    def discard_borrowed(self):
+        """貸し出し中のドライバーをすべて強制終了する（URLの処理時間の上限を超えた場合に使用）"""
+        borrowed = list(self._borrowed.values())
+        self._borrowed.clear()
+        for driver in borrowed:
+            self._pages.pop(id(driver), None)
+            self.recycled += 1
+            _kill(driver)
+        with self._cond:
+            self._in_use -= len(borrowed)
+            self._cond.notify_all()
+        return len(borrowed)
+
+    def close(self):
+        """保持しているドライバーをすべて終了する（プールを作成したプロセスでのみ）"""
+        if os.getpid() != self.pid:
+            return
+        with self._cond:
+            idle, self._idle = self._idle, []
+        for driver in idle:
+            _quit(driver)
+        self._pages.clear()
+
+
+def get_pool(factory, size=DEFAULT_POOL_SIZE, max_pages=DEFAULT_MAX_PAGES):
+    """
+    現在のプロセスのドライバープールを返す（なければ作成する）
+
+    プロセスの終了時 (ProcessPoolExecutor のワーカーを含む) に保持しているドライバーを終了する。
+    """
+    global _pool
+    if _pool is None or _pool.pid != os.getpid():
+        _pool = DriverPool(factory, size, max_pages)
+        # multiprocessing のワーカーは atexit を実行しないため Finalize で終了処理を登録する
+        util.Finalize(_pool, _pool.close, exitpriority=10)
+    return _pool
+
+
+def discard_borrowed():
+    """現在のプロセスで貸し出し中のドライバーを強制終了する"""
+    if _pool is None or _pool.pid != os.getpid():
+        return 0
+    return _pool.discard_borrowed()
+
+
+def close_pool():
+    """現在のプロセスのドライバープールを閉じる"""
+    global _pool
+    if _pool is not None:
+        _pool.close()
+        _pool = None
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+キーワード・ワークスペース間で共有する抽出結果のキャッシュ
+
+関連するキーワードの検索結果には同じURL（Wikipediaの記事、よく見られる知恵袋の質問、
+大手ニュースのページなど）が繰り返し現れます。ここでは正規化したURLをキーに、
+抽出後のテキストとテキストを取得できた抽出方法を共有状態ディレクトリのSQLiteに保存し、
+有効期限内であれば抽出をやり直さずに再利用します。合計サイズが上限を超えたら
+最も長く使われていないものから削除します (LRU)。
+"""
+
+import os
+import sqlite3
+import time
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import shared_state
+
+# キャッシュのデータベースファイル名（共有状態ディレクトリ内）
+CACHE_DB_NAME = 'extraction_cache.sqlite3'
+
+# config.ini のセクション名と既定値
+CONFIG_SECTION = 'EXTRACTION_CACHE'
+DEFAULT_TTL_HOURS = 168    # 有効期限（時間）
+DEFAULT_MAX_MB = 1024      # 合計サイズの上限（MB）
+
+# 正規化で取り除くトラッキング用のクエリパラメーター
+TRACKING_PARAMS = {'gclid', 'fbclid', 'yclid', 'mc_cid', 'mc_eid', 'ref_src'}
+TRACKING_PARAM_PREFIXES = ('utm_',)
+
+# 追加がこの件数に達するごとに期限切れの削除とサイズの確認を行う
+EVICT_CHECK_INTERVAL = 100
+# サイズの上限を超えたときに1回で削除する最大件数
+EVICT_BATCH = 200
+
+# プロセスごとのキャッシュ (fork後の子プロセスでは作り直す)
+_cache = None
+
+
+def read_config(config):
+    """
+    config.ini の [EXTRACTION_CACHE] から設定を読み込む
+
+    Parameters:
+    config (ConfigParser): 読み込み済みの設定
+
+    Returns:
+    dict: 設定（get_cache に渡す）
+    """
+    settings = {'enabled': True, 'ttl_hours': DEFAULT_TTL_HOURS, 'max_mb': DEFAULT_MAX_MB}
+    if config.has_section(CONFIG_SECTION):
+        settings['enabled'] = config.getboolean(CONFIG_SECTION, 'enabled', fallback=True)
+        settings['ttl_hours'] = config.getfloat(CONFIG_SECTION, 'ttl_hours', fallback=DEFAULT_TTL_HOURS)
+        settings['max_mb'] = config.getfloat(CONFIG_SECTION, 'max_mb', fallback=DEFAULT_MAX_MB)
+    return settings
+
+
+def normalize_url(url):
+    """
+    キャッシュのキーにするURLを返す
+
+    スキームとホスト名を小文字にし、既定のポート・フラグメント・トラッキング用の
+    パラメーターを取り除き、クエリパラメーターを並べ替える。
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower()
+    try:
+        port = parts.port
+    except ValueError:
+        port = None
+    netloc = host if port is None or (scheme, port) in (('http', 80), ('https', 443)) else f"{host}:{port}"
+    params = [(key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+              if key.lower() not in TRACKING_PARAMS and not key.lower().startswith(TRACKING_PARAM_PREFIXES)]
+    return urlunsplit((scheme, netloc, parts.path or '/', urlencode(sorted(params)), ''))
+
+
+class ExtractionCache:
+    """正規化したURLをキーに抽出結果を保存するSQLiteキャッシュ"""
+
+    def __init__(self, settings, db_path=CACHE_DB_NAME):
+        """
+        初期化メソッド
+
+        Parameters:
+        settings (dict): read_config() が返した設定
+        db_path (str): データベースファイル（共有状態ディレクトリからの相対パス、または絶対パス）
+        """
+        self.settings = settings
+        self.ttl = settings['ttl_hours'] * 3600
+        self.max_bytes = int(settings['max_mb'] * 1024 * 1024)
+        self.pid = os.getpid()
+        self._puts = 0
+        self.conn = shared_state.connect(db_path, timeout=10.0)
+        self.conn.executescript('''
+            CREATE TABLE IF NOT EXISTS cache (
+                key TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                text TEXT NOT NULL,
+                tier TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed_at);
+        ''')
+
+    def get(self, url):
+        """
+        キャッシュされた抽出結果を返す
+
+        Returns:
+        tuple: (抽出テキスト, 抽出方法)（ない場合・期限切れの場合はNone）
+        """
+        key = normalize_url(url)
+        now = time.time()
+        row = self.conn.execute('SELECT text, tier, created_at FROM cache WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        if now - row['created_at'] > self.ttl:
+            self.conn.execute('DELETE FROM cache WHERE key = ?', (key,))
+            return None
+        self.conn.execute('UPDATE cache SET accessed_at = ? WHERE key = ?', (now, key))
+        return row['text'], row['tier']
+
+    def put(self, url, text, tier):
+        """抽出結果を保存する（同じキーの結果は置き換える）"""
+        now = time.time()
+        self.conn.execute('''
+            INSERT OR REPLACE INTO cache (key, url, text, tier, size, created_at, accessed_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (normalize_url(url), url, text, tier, len(text.encode('utf-8')), now, now))
+        self._puts += 1
+        if self._puts % EVICT_CHECK_INTERVAL == 1:
+            self.evict()
+
+    def evict(self):
+        """期限切れの結果を削除し、合計サイズが上限を超えていれば古いものから削除する"""
+        self.conn.execute('DELETE FROM cache WHERE created_at < ?', (time.time() - self.ttl,))
+        while True:
+            count, total = self.conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache').fetchone()
+            if total <= self.max_bytes:
+                break
+            # 超過分に見合う件数 (最大 EVICT_BATCH 件) を削除する
+            batch = min(EVICT_BATCH, count * (total - self.max_bytes) // total + 1)
+            deleted = self.conn.execute('''
+                DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY accessed_at LIMIT ?)
+            ''', (batch,)).rowcount
+            if not deleted:
+                break
+
+
+def get_cache(settings):
+    """
+    現在のプロセスのキャッシュを返す（無効の場合・データベースを開けない場合はNone）
+
+    Parameters:
+    settings (dict): read_config() が返した設定
+    """
+    global _cache
+    if not settings or not settings.get('enabled'):
+        return None
+    if _cache is None or _cache.pid != os.getpid() or _cache.settings != settings:
+        try:
+            _cache = ExtractionCache(settings)
+        except sqlite3.Error as e:
+            print(f"抽出キャッシュを開けませんでした。キャッシュなしで続行します: {e}")
+            return None
+    return _cache
+
+
+def lookup(url, settings):
+    """キャッシュされた抽出結果 (抽出テキスト, 抽出方法) を返す（ない場合・無効の場合はNone）"""
+    cache = get_cache(settings)
+    if cache is None:
+        return None
+    try:
+        return cache.get(url)
+    except sqlite3.Error as e:
+        print(f"抽出キャッシュを読み込めませんでした: {url} - {e}")
+        return None
+
+
+def store(url, text, tier, settings):
+    """抽出結果をキャッシュに保存する（無効の場合・保存できない場合は何もしない）"""
+    cache = get_cache(settings)
+    if cache is None:
+        return
+    try:
+        cache.put(url, text, tier)
+    except sqlite3.Error as e:
+        print(f"抽出キャッシュに保存できませんでした: {url} - {e}")
@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+失敗したURL・ホストの記録（ネガティブキャッシュと回路遮断器）
+
+存在しないホストや停止しているサイトへのリンクは、GETのタイムアウト、Seleniumの起動、
+Jina AI Reader の試行をすべて経てから失敗し、そのリンクを含むキーワードごとに同じ時間を
+使います。ここでは失敗の種類（名前解決の失敗、接続拒否、403/404/410、繰り返しのタイムアウト）を
+URLごとに共有状態ディレクトリのSQLiteへ有効期限付きで記録し、期限内は抽出を省略します。
+さらにホストごとに連続した接続の失敗を数え、しきい値を超えたホストは一定時間 (回路遮断器が
+開いている間) 抽出せずにすぐ失敗として返します。時間が過ぎたら1件だけ試し (半開)、
+成功すれば元に戻し、失敗すれば待ち時間を倍にして再び遮断します。
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from urllib.parse import urlparse
+
+import shared_state
+from extraction_cache import normalize_url
+
+# 失敗の記録のデータベースファイル名（共有状態ディレクトリ内）
+FAILURE_DB_NAME = 'failure_cache.sqlite3'
+
+# 失敗の種類
+FAILURE_DNS = 'dns'            # 名前解決の失敗
+FAILURE_REFUSED = 'refused'    # 接続拒否
+FAILURE_TIMEOUT = 'timeout'    # タイムアウト
+FAILURE_FORBIDDEN = 'http_403'
+FAILURE_NOT_FOUND = 'http_404'
+FAILURE_GONE = 'http_410'
+HTTP_FAILURES = {403: FAILURE_FORBIDDEN, 404: FAILURE_NOT_FOUND, 410: FAILURE_GONE}
+# ホストに到達できないことを示す失敗（回路遮断器で数える）
+HOST_FAILURES = (FAILURE_DNS, FAILURE_REFUSED, FAILURE_TIMEOUT)
+
+# 取得エラーのメッセージ（小文字）から失敗の種類を判定するための文字列 (上から順に判定する)
+ERROR_PATTERNS = [
+    (FAILURE_DNS, ('nameresolutionerror', 'name or service not known', 'nodename nor servname',
+                   'getaddrinfo failed', 'temporary failure in name resolution', 'no address associated',
+                   'clientconnectordnserror', 'could not contact dns servers')),
+    (FAILURE_REFUSED, ('connection refused', 'connectionrefusederror', 'errno 111', 'winerror 10061',
+                       'connect call failed')),
+    (FAILURE_TIMEOUT, ('timeout', 'timed out', 'タイムアウト')),
+]
+
+# config.ini のセクション名と既定値
+CONFIG_SECTION = 'FAILURE_CACHE'
+DEFAULT_TTL_HOURS = {       # 失敗の種類ごとの有効期限（時間）
+    FAILURE_DNS: 6,
+    FAILURE_REFUSED: 1,
+    FAILURE_TIMEOUT: 6,
+    'http': 24,             # 403/404/410
+}
+DEFAULT_TIMEOUT_REPEATS = 2      # URLをタイムアウトで省略するのに必要なタイムアウトの回数
+DEFAULT_BREAKER_THRESHOLD = 3    # 回路遮断器を開く、ホストへの連続した接続の失敗の回数
+DEFAULT_BREAKER_COOLDOWN = 600   # 回路遮断器を開いておく秒数（再び失敗するごとに倍にする）
+
+# 回路遮断器を開いておく最大の秒数
+MAX_BREAKER_COOLDOWN = 6 * 3600
+# 半開のときに試す1件の処理を待つ最大の秒数（過ぎたら別のプロセスが試す）
+PROBE_TTL = 300
+
+# プロセスごとの記録 (fork後の子プロセスでは作り直す)
+_cache = None
+
+
+def read_config(config):
+    """
+    config.ini の [FAILURE_CACHE] から設定を読み込む
+
+    Parameters:
+    config (ConfigParser): 読み込み済みの設定
+
+    Returns:
+    dict: 設定（get_cache に渡す）
+    """
+    settings = {
+        'enabled': True,
+        'ttl_hours': dict(DEFAULT_TTL_HOURS),
+        'timeout_repeats': DEFAULT_TIMEOUT_REPEATS,
+        'breaker_threshold': DEFAULT_BREAKER_THRESHOLD,
+        'breaker_cooldown': DEFAULT_BREAKER_COOLDOWN,
+    }
+    if config.has_section(CONFIG_SECTION):
+        settings['enabled'] = config.getboolean(CONFIG_SECTION, 'enabled', fallback=True)
+        for kind, hours in DEFAULT_TTL_HOURS.items():
+            settings['ttl_hours'][kind] = config.getfloat(CONFIG_SECTION, f'{kind}_ttl_hours', fallback=hours)
+        settings['timeout_repeats'] = config.getint(CONFIG_SECTION, 'timeout_repeats', fallback=DEFAULT_TIMEOUT_REPEATS)
+        settings['breaker_threshold'] = config.getint(CONFIG_SECTION, 'breaker_threshold',
+                                                      fallback=DEFAULT_BREAKER_THRESHOLD)
+        settings['breaker_cooldown'] = config.getfloat(CONFIG_SECTION, 'breaker_cooldown',
+                                                       fallback=DEFAULT_BREAKER_COOLDOWN)
+    return settings
+
+
+def host_of(url):
+    """回路遮断器のキーにするホスト（小文字のホスト名。ポートを指定したURLは ホスト名:ポート）"""
+    parts = urlparse(url)
+    host = (parts.hostname or '').lower()
+    try:
+        port = parts.port
+    except ValueError:
+        port = None
+    return f"{host}:{port}" if host and port else host
+
+
+def classify_error(error):
+    """
+    取得エラーを失敗の種類に分類する
+
+    Parameters:
+    error (Exception または str): requests / aiohttp の例外、または取得エラーのメッセージ
+
+    Returns:
+    str: FAILURE_DNS / FAILURE_REFUSED / FAILURE_TIMEOUT（分類できなければNone）
+    """
+    if isinstance(error, BaseException):
+        message = f"{type(error).__name__}: {error}"
+    else:
+        message = str(error)
+    message = message.lower()
+    for failure, patterns in ERROR_PATTERNS:
+        if any(pattern in message for pattern in patterns):
+            return failure
+    return None
+
+
+class FailureCache:
+    """失敗したURLとホストの回路遮断器をSQLiteに記録する"""
+
+    def __init__(self, settings, db_path=FAILURE_DB_NAME):
+        """
+        初期化メソッド
+
+        Parameters:
+        settings (dict): read_config() が返した設定
+        db_path (str): データベースファイル（共有状態ディレクトリからの相対パス、または絶対パス）
+        """
+        self.settings = settings
+        self.db_path = db_path
+        self.pid = os.getpid()
+        self._local = threading.local()  # スレッドごとの接続 (ヘッジでは別スレッドから取得する)
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = shared_state.connect(self.db_path, timeout=10.0)
+            conn.executescript('''
+                CREATE TABLE IF NOT EXISTS url_failures (
+                    key TEXT PRIMARY KEY,
+                    url TEXT NOT NULL,
+                    failure TEXT NOT NULL,
+                    count INTEGER NOT NULL,
+                    expires_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS host_breakers (
+                    host TEXT PRIMARY KEY,
+                    failures INTEGER NOT NULL,
+                    failure TEXT,
+                    cooldown REAL NOT NULL DEFAULT 0,
+                    opened_until REAL NOT NULL DEFAULT 0,
+                    probe_until REAL NOT NULL DEFAULT 0,
+                    updated_at REAL NOT NULL
+                );
+            ''')
+            self._local.conn = conn
+        return conn
+
+    def _ttl(self, failure):
+        hours = self.settings['ttl_hours']
+        return hours.get(failure, hours.get('http', DEFAULT_TTL_HOURS['http'])) * 3600
+
+    def check(self, url, probe=True):
+        """
+        URLの抽出を省略するかどうかを判定する
+
+        Parameters:
+        url (str): 抽出するURL
+        probe (bool): 回路遮断器が半開のホストであれば、このURLを試す1件として確保する。
+                      False の場合は遮断器が開いている間だけ省略し、半開のホストは確保せずに通す
+
+        Returns:
+        str: 省略する理由（'url:失敗の種類' または 'host:失敗の種類'。省略しない場合はNone）
+        """
+        now = time.time()
+        conn = self._conn()
+        row = conn.execute('SELECT failure, count, expires_at FROM url_failures WHERE key = ?',
+                           (normalize_url(url),)).fetchone()
+        if row is not None and row['expires_at'] > now and (
+                row['failure'] != FAILURE_TIMEOUT or row['count'] >= self.settings['timeout_repeats']):
+            return f"url:{row['failure']}"
+
+        host = host_of(url)
+        row = conn.execute('SELECT * FROM host_breakers WHERE host = ?', (host,)).fetchone()
+        if row is None or row['failures'] < self.settings['breaker_threshold']:
+            return None
+        if row['opened_until'] > now:
+            return f"host:{row['failure']}"
+        if not probe:
+            return None
+        # 半開: 他のプロセスが試していなければ、このURLで試す
+        claimed = conn.execute('''
+            UPDATE host_breakers SET probe_until = ? WHERE host = ? AND probe_until <= ? AND opened_until <= ?
+        ''', (now + PROBE_TTL, host, now, now)).rowcount
+        if claimed:
+            print(f"回路遮断器の待ち時間が過ぎたため、{host} を1件試します: {url}")
+            return None
+        return f"host:{row['failure']}"
+
+    def record_url(self, url, failure):
+        """すべての抽出方法で失敗したURLを失敗の種類とともに記録する（タイムアウトは回数を数える）"""
+        now = time.time()
+        self._conn().execute('''
+            INSERT INTO url_failures (key, url, failure, count, expires_at, updated_at) VALUES (?, ?, ?, 1, ?, ?)
+            ON CONFLICT(key) DO UPDATE SET
+                count = CASE WHEN url_failures.failure = excluded.failure AND url_failures.expires_at > excluded.updated_at
+                             THEN url_failures.count + 1 ELSE 1 END,
+                failure = excluded.failure, expires_at = excluded.expires_at, updated_at = excluded.updated_at
+        ''', (normalize_url(url), url, failure, now + self._ttl(failure), now))
+
+    def clear_url(self, url):
+        """抽出に成功したURLの失敗の記録を削除する"""
+        self._conn().execute('DELETE FROM url_failures WHERE key = ?', (normalize_url(url),))
+
+    def host_failed(self, url, failure):
+        """
+        ホストへの接続の失敗を数え、しきい値に達したら回路遮断器を開く
+
+        遮断器が開いている間に届いた失敗（開く前から処理中だったURLの失敗）は数えない。
+        半開で試したURLが失敗した場合だけ、待ち時間を前回の倍にして開き直す。
+        """
+        host = host_of(url)
+        if not host:
+            return
+        now = time.time()
+        threshold = self.settings['breaker_threshold']
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute('SELECT * FROM host_breakers WHERE host = ?', (host,)).fetchone()
+            failures = (row['failures'] if row else 0) + 1
+            cooldown = row['cooldown'] if row else 0.0
+            opened_until = 0.0
+            if row is not None and row['failures'] >= threshold:
+                if row['probe_until'] <= now:
+                    # 開いている間、または半開で試すURLを確保する前に届いた失敗は数えない
+                    conn.execute('COMMIT')
+                    return
+                # 半開で試したURLが失敗したので、前回の倍の時間開き直す
+                cooldown = min(cooldown * 2, MAX_BREAKER_COOLDOWN)
+                opened_until = now + cooldown
+            elif failures >= threshold:
+                cooldown = self.settings['breaker_cooldown']
+                opened_until = now + cooldown
+            conn.execute('''
+                INSERT OR REPLACE INTO host_breakers
+                    (host, failures, failure, cooldown, opened_until, probe_until, updated_at)
+                VALUES (?, ?, ?, ?, ?, 0, ?)
+            ''', (host, failures, failure, cooldown, opened_until, now))
+            conn.execute('COMMIT')
+        except BaseException:
+            # (処理時間の上限による中断を含め、トランザクションを残さない)
+            conn.execute('ROLLBACK')
+            raise
+        if opened_until:
+            print(f"{host} への接続に {failures} 回続けて失敗したため ({failure})、"
+                  f"{cooldown:g}秒間このホストの抽出を省略します。")
+
+    def host_succeeded(self, url):
+        """ホストから応答があったので、失敗の回数と回路遮断器を元に戻す"""
+        host = host_of(url)
+        if host and self._conn().execute('DELETE FROM host_breakers WHERE host = ?', (host,)).rowcount:
+            print(f"{host} から応答があったため、接続の失敗の記録を消去しました。")
+
+    def open_breakers(self):
+        """
+        回路遮断器が開いているホストを返す
+
+        Returns:
+        dict: ホスト -> {'failure', 'failures', 'remaining_seconds'}
+        """
+        now = time.time()
+        rows = self._conn().execute('SELECT * FROM host_breakers WHERE failures >= ? AND opened_until > ?',
+                                    (self.settings['breaker_threshold'], now)).fetchall()
+        return {row['host']: {'failure': row['failure'], 'failures': row['failures'],
+                              'remaining_seconds': round(row['opened_until'] - now, 1)} for row in rows}
+
+
+def get_cache(settings):
+    """
+    現在のプロセスの失敗の記録を返す（無効の場合はNone）
+
+    Parameters:
+    settings (dict): read_config() が返した設定
+    """
+    global _cache
+    if not settings or not settings.get('enabled'):
+        return None
+    if _cache is None or _cache.pid != os.getpid() or _cache.settings != settings:
+        _cache = FailureCache(settings)
+    return _cache
+
+
+def _call(method, settings, *args):
+    """失敗の記録の method を呼び出す（無効の場合・エラーの場合はNone）"""
+    cache = get_cache(settings)
+    if cache is None:
+        return None
+    try:
+        return getattr(cache, method)(*args)
+    except sqlite3.Error as e:
+        print(f"失敗したURL・ホストの記録を読み書きできませんでした: {e}")
+        return None
+
+
+def check(url, settings, probe=True):
+    """URLの抽出を省略する理由を返す（省略しない場合・無効の場合はNone）"""
+    return _call('check', settings, url, probe)
+
+
+def record_url(url, failure, settings):
+    """すべての抽出方法で失敗したURLを記録する"""
+    _call('record_url', settings, url, failure)
+
+
+def clear_url(url, settings):
+    """抽出に成功したURLの失敗の記録を削除する"""
+    _call('clear_url', settings, url)
+
+
+def host_failed(url, failure, settings):
+    """ホストへの接続の失敗を記録する（HOST_FAILURES 以外は数えない）"""
+    if failure in HOST_FAILURES:
+        _call('host_failed', settings, url, failure)
+
+
+def host_succeeded(url, settings):
+    """ホストから応答があったことを記録する"""
+    _call('host_succeeded', settings, url)
+
+
+def open_breakers(settings):
+    """回路遮断器が開いているホストを返す（無効の場合は空の辞書）"""
+    return _call('open_breakers', settings) or {}
@@ -571,7 +571,14 @@ def extract_top_urls_from_search_url(driver, search_url, num_urls=3):
     return urls[:num_urls] # 念のため最後にnum_urlsでスライス
 
 def integrated_google_search(google_url):
+    """
+    Google検索結果ページと関連検索からURLを収集し、urls/google_urls.txt に保存する
+
+    Returns:
+    list: 保存したURLのリスト（エラー時はNone）
+    """
     driver = None # driver変数を初期化
+    saved_urls = None
     try:
         # ディレクトリの確認
         base_dir = ensure_directories_exist()
@@ -590,6 +597,10 @@ def integrated_google_search(google_url):
         
         # ウィンドウサイズを設定
         options.add_argument("--start-maximized")
+
+        # run_all_starts.py の headlessモードから起動された場合は画面なしで起動
+        if os.environ.get('WEBTEXT_HEADLESS') == '1':
+            options.add_argument("--headless=new")
         
         # ChromeDriverManagerを使わずに直接Chromeを起動
         driver = webdriver.Chrome(options=options)
@@ -640,11 +651,11 @@ def integrated_google_search(google_url):
         all_urls = list(dict.fromkeys(direct_urls + related_article_urls))
 
         # 出力: 設定形式でURLを保存
+        # ファイル書き込み前にもう一度除外チェック（念のため）
+        saved_urls = [url for url in all_urls if not is_excluded_url(url)]
         with open(output_file_path, 'w', encoding='utf-8') as f:
-            for url in all_urls:
-                # ファイル書き込み前にもう一度除外チェック（念のため）
-                if not is_excluded_url(url):
-                     f.write(f"{url}\n")
+            for url in saved_urls:
+                f.write(f"{url}\n")
             
         
         print(f"\n合計 {len(all_urls)} 件のユニークなURLを {output_file_path} に保存しました")
@@ -673,6 +684,8 @@ def integrated_google_search(google_url):
             print("ブラウザを閉じています...")
             driver.quit()
 
+    return saved_urls
+
 if __name__ == "__main__":
     # コマンドライン引数のパーサーを作成
     parser = argparse.ArgumentParser(description='Google検索結果ページからURLを抽出します。')
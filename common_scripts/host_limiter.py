@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+全ワークスペース・全プロセスで共有するホストごとのリクエスト制限
+
+各ワークスペースの抽出ワーカーは互いに調整せずに同じホストへリクエストを送るため、
+同じサイト（Yahoo知恵袋、Wikipedia など）へのリンクが多いと同時リクエストが集中して
+429 やブロックの原因になります。ここでは共有状態ディレクトリのSQLiteに
+ホストごとのトークンバケットと処理中のリクエスト（リース）を記録し、
+全プロセスで1秒あたりのリクエスト数と同時リクエスト数を制限します。
+429 (Retry-After) を受けたホストへは指定の時間（max_penalty 秒まで）だけリクエストを控え、
+空きを max_wait 秒以上待つ必要がある場合は待たずに HostBlockedError で失敗させます。
+"""
+
+import contextlib
+import os
+import sqlite3
+import threading
+import time
+from urllib.parse import urlparse
+
+import requests
+
+import shared_state
+
+# 制限のデータベースファイル名（共有状態ディレクトリ内）
+LIMITER_DB_NAME = 'host_limiter.sqlite3'
+
+# config.ini のセクション名と既定値
+CONFIG_SECTION = 'HOST_LIMITS'
+OVERRIDES_SECTION = 'HOST_LIMIT_OVERRIDES'
+DEFAULT_RATE = 2.0          # ホストごとの1秒あたりのリクエスト数
+DEFAULT_BURST = 4           # 連続して送れるリクエスト数（バケットの容量）
+DEFAULT_MAX_IN_FLIGHT = 4   # ホストごとの同時リクエスト数
+DEFAULT_MAX_PENALTY = 300   # 429 でリクエストを控える最大の秒数（これより長い Retry-After は切り詰める）
+DEFAULT_MAX_WAIT = 60       # リクエスト枠の空きを待つ最大の秒数（0で無制限）
+
+# 終了処理をせずに落ちたプロセスのリースを無効とみなすまでの秒数
+LEASE_TTL = 300
+# 429 に Retry-After がない場合にリクエストを控える秒数
+DEFAULT_PENALTY = 30
+# 空きを待つときの最大の待機間隔（秒）
+MAX_POLL_INTERVAL = 0.5
+
+# プロセスごとの制限 (fork後の子プロセスでは作り直す)
+_limiter = None
+
+
+def read_config(config):
+    """
+    config.ini の [HOST_LIMITS] と [HOST_LIMIT_OVERRIDES] から制限の設定を読み込む
+
+    [HOST_LIMIT_OVERRIDES] には「ホスト名 = 1秒あたりのリクエスト数, 同時リクエスト数」の形式で
+    ホストごとの値を指定できる。
+
+    Parameters:
+    config (ConfigParser): 読み込み済みの設定
+
+    Returns:
+    dict: 制限の設定（get_limiter に渡す）
+    """
+    settings = {
+        'enabled': True,
+        'rate': DEFAULT_RATE,
+        'burst': DEFAULT_BURST,
+        'max_in_flight': DEFAULT_MAX_IN_FLIGHT,
+        'max_penalty': DEFAULT_MAX_PENALTY,
+        'max_wait': DEFAULT_MAX_WAIT,
+        'overrides': {},
+    }
+    if config.has_section(CONFIG_SECTION):
+        settings['enabled'] = config.getboolean(CONFIG_SECTION, 'enabled', fallback=True)
+        settings['rate'] = config.getfloat(CONFIG_SECTION, 'rate', fallback=DEFAULT_RATE)
+        settings['burst'] = config.getint(CONFIG_SECTION, 'burst', fallback=DEFAULT_BURST)
+        settings['max_in_flight'] = config.getint(CONFIG_SECTION, 'max_in_flight', fallback=DEFAULT_MAX_IN_FLIGHT)
+        settings['max_penalty'] = config.getfloat(CONFIG_SECTION, 'max_penalty', fallback=DEFAULT_MAX_PENALTY)
+        settings['max_wait'] = config.getfloat(CONFIG_SECTION, 'max_wait', fallback=DEFAULT_MAX_WAIT)
+    if config.has_section(OVERRIDES_SECTION):
+        for host, value in config.items(OVERRIDES_SECTION):
+            try:
+                rate, max_in_flight = [part.strip() for part in value.split(',')]
+                settings['overrides'][host.lower()] = (float(rate), int(max_in_flight))
+            except ValueError:
+                print(f"警告: [{OVERRIDES_SECTION}] の {host} の値 '{value}' が無効です。既定の制限を使用します。")
+    return settings
+
+
+def host_of(url):
+    """URLのホスト名（小文字）を返す"""
+    return (urlparse(url).hostname or '').lower()
+
+
+def retry_after_seconds(headers):
+    """Retry-After ヘッダーの秒数を返す（ない場合・日時形式の場合は DEFAULT_PENALTY）"""
+    try:
+        return max(1.0, float(headers.get('Retry-After')))
+    except (TypeError, ValueError):
+        return DEFAULT_PENALTY
+
+
+class HostBlockedError(requests.exceptions.RequestException):
+    """リクエスト枠の空きを待つ時間が max_wait を超える（取得エラーとして扱い、タイムアウトとは区別する）"""
+
+
+class HostLimiter:
+    """SQLiteで全プロセスのリクエストを調整するホストごとの制限"""
+
+    def __init__(self, settings, db_path=LIMITER_DB_NAME):
+        """
+        初期化メソッド
+
+        Parameters:
+        settings (dict): read_config() が返した設定
+        db_path (str): データベースファイル（共有状態ディレクトリからの相対パス、または絶対パス）
+        """
+        self.settings = settings
+        self.db_path = db_path
+        self.pid = os.getpid()
+        self._local = threading.local()  # スレッドごとの接続
+        self.waited = 0.0  # このプロセスで空きを待った秒数の累計
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = shared_state.connect(self.db_path, timeout=10.0)
+            conn.executescript('''
+                CREATE TABLE IF NOT EXISTS buckets (
+                    host TEXT PRIMARY KEY,
+                    tokens REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    blocked_until REAL NOT NULL DEFAULT 0
+                );
+                CREATE TABLE IF NOT EXISTS leases (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    host TEXT NOT NULL,
+                    pid INTEGER NOT NULL,
+                    expires_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS leases_host ON leases (host);
+            ''')
+            self._local.conn = conn
+        return conn
+
+    def limits_for(self, host):
+        """ホストの (1秒あたりのリクエスト数, バケットの容量, 同時リクエスト数) を返す"""
+        rate, max_in_flight = self.settings['overrides'].get(
+            host, (self.settings['rate'], self.settings['max_in_flight']))
+        return rate, max(1, self.settings['burst']), max(1, max_in_flight)
+
+    def try_acquire(self, host):
+        """
+        ホストへのリクエスト枠を取得する（待たない）
+
+        Returns:
+        tuple: (リースID, 0) または 取得できない場合は (None, 次に試すまでの秒数)
+        """
+        rate, burst, max_in_flight = self.limits_for(host)
+        now = time.time()
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute('DELETE FROM leases WHERE host = ? AND expires_at < ?', (host, now))
+            row = conn.execute('SELECT tokens, updated_at, blocked_until FROM buckets WHERE host = ?', (host,)).fetchone()
+            if row is None:
+                tokens, blocked_until = float(burst), 0.0
+            else:
+                tokens = min(float(burst), row['tokens'] + (now - row['updated_at']) * rate)
+                blocked_until = row['blocked_until']
+            in_flight = conn.execute('SELECT COUNT(*) FROM leases WHERE host = ?', (host,)).fetchone()[0]
+
+            lease_id = None
+            wait = 0.0
+            if blocked_until > now:
+                wait = blocked_until - now
+            elif in_flight >= max_in_flight:
+                wait = MAX_POLL_INTERVAL
+            elif tokens < 1:
+                wait = (1 - tokens) / rate if rate > 0 else MAX_POLL_INTERVAL
+            else:
+                tokens -= 1
+                lease_id = conn.execute('INSERT INTO leases (host, pid, expires_at) VALUES (?, ?, ?)',
+                                        (host, os.getpid(), now + LEASE_TTL)).lastrowid
+            conn.execute('''
+                INSERT INTO buckets (host, tokens, updated_at, blocked_until) VALUES (?, ?, ?, ?)
+                ON CONFLICT(host) DO UPDATE SET tokens = excluded.tokens, updated_at = excluded.updated_at
+            ''', (host, tokens, now, blocked_until))
+            conn.execute('COMMIT')
+        except BaseException:
+            # (処理時間の上限による中断を含め、トランザクションを残さない)
+            conn.execute('ROLLBACK')
+            raise
+        return lease_id, wait
+
+    def check_wait(self, host, started, wait):
+        """
+        空きを待ち始めた時刻 started からさらに wait 秒待つと max_wait を超える場合は HostBlockedError を送出する
+
+        (429 で長く控えているホストを待ち続けず、ほかの抽出方法に進めるようにする)
+        """
+        max_wait = self.settings.get('max_wait', DEFAULT_MAX_WAIT)
+        if max_wait > 0 and time.time() + wait - started > max_wait:
+            raise HostBlockedError(f"{host} へのリクエスト枠の空きを待つ時間が上限 ({max_wait:g}秒) を超えるため中止しました")
+
+    def acquire(self, host):
+        """
+        ホストへのリクエスト枠が空くまで待って取得する（リースIDを返す）
+
+        Raises:
+        HostBlockedError: 待つ時間が max_wait を超える場合
+        """
+        started = time.time()
+        while True:
+            lease_id, wait = self.try_acquire(host)
+            if lease_id is not None:
+                return lease_id
+            self.check_wait(host, started, wait)
+            wait = min(wait, MAX_POLL_INTERVAL)
+            self.waited += wait
+            time.sleep(wait)
+
+    def release(self, lease_id):
+        """取得したリクエスト枠を返す"""
+        if lease_id is not None:
+            try:
+                self._conn().execute('DELETE FROM leases WHERE id = ?', (lease_id,))
+            except sqlite3.Error as e:
+                print(f"リクエスト枠を返却できませんでした (期限切れで自動的に解放されます): {e}")
+
+    def penalize(self, host, seconds):
+        """429 などを受けたホストへのリクエストを seconds 秒間（max_penalty 秒まで）控える"""
+        seconds = min(seconds, self.settings.get('max_penalty', DEFAULT_MAX_PENALTY))
+        until = time.time() + seconds
+        try:
+            self._conn().execute('''
+                INSERT INTO buckets (host, tokens, updated_at, blocked_until) VALUES (?, 0, ?, ?)
+                ON CONFLICT(host) DO UPDATE SET blocked_until = MAX(buckets.blocked_until, excluded.blocked_until)
+            ''', (host, time.time(), until))
+        except sqlite3.Error as e:
+            print(f"リクエストの一時停止を記録できませんでした ({host}): {e}")
+            return
+        print(f"{host} から 429 (Too Many Requests) を受けたため、{seconds:g}秒間リクエストを控えます。")
+
+    @contextlib.contextmanager
+    def limit(self, url):
+        """with ブロックの間、URLのホストへのリクエスト枠を1つ使う"""
+        host = host_of(url)
+        lease_id = None
+        try:
+            lease_id = self.acquire(host) if host else None
+        except sqlite3.Error as e:
+            # 共有状態が使えなくてもリクエスト自体は続行する
+            print(f"ホストごとのリクエスト制限を確認できませんでした ({host}): {e}")
+        try:
+            yield
+        finally:
+            self.release(lease_id)
+
+
+def get_limiter(settings):
+    """
+    現在のプロセスの制限を返す（無効の場合はNone）
+
+    Parameters:
+    settings (dict): read_config() が返した設定
+    """
+    global _limiter
+    if not settings or not settings.get('enabled'):
+        return None
+    if _limiter is None or _limiter.pid != os.getpid() or _limiter.settings != settings:
+        _limiter = HostLimiter(settings)
+    return _limiter
+
+
+def limit(url, settings):
+    """
+    URLのホストへのリクエスト枠を使う with ブロック（制限が無効なら何もしない）
+
+    使用例:
+        with host_limiter.limit(url, settings):
+            response = session.get(url)
+    """
+    limiter = get_limiter(settings)
+    if limiter is None:
+        return contextlib.nullcontext()
+    return limiter.limit(url)
+
+
+def penalize(url, headers, settings):
+    """429 を返したURLのホストへのリクエストを Retry-After の間控える（制限が無効なら何もしない）"""
+    limiter = get_limiter(settings)
+    if limiter is not None and host_of(url):
+        limiter.penalize(host_of(url), retry_after_seconds(headers))
@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ETag / Last-Modified による再検証付きのHTTP応答キャッシュ
+
+キーワードを毎日実行し直すと、ほとんど変わっていないページも毎回すべて
+ダウンロードし直します。ここでは通常抽出 (Requests) のGETの応答のうち、
+検証子 (ETag / Last-Modified) を持つものの本文を共有状態ディレクトリのSQLiteに保存し、
+次回は If-None-Match / If-Modified-Since を付けて問い合わせます。304 Not Modified なら
+保存した本文を使い、その本文からの抽出結果も保存してあれば解析も省略します。
+Cache-Control の max-age 内であれば問い合わせ自体を省略し、no-store の応答は保存しません。
+"""
+
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+import shared_state
+
+# キャッシュのデータベースファイル名（共有状態ディレクトリ内）
+HTTP_CACHE_DB_NAME = 'http_cache.sqlite3'
+
+# config.ini のセクション名と既定値
+CONFIG_SECTION = 'HTTP_CACHE'
+DEFAULT_MAX_MB = 2048       # 合計サイズの上限（MB）
+DEFAULT_MAX_BODY_MB = 10    # 保存する本文の最大サイズ（MB）
+
+# 保存しない応答ヘッダー (本文は展開済みで保存するため、圧縮・長さに関するものも除く)
+_SKIPPED_HEADERS = {'connection', 'keep-alive', 'transfer-encoding', 'content-encoding', 'content-length',
+                    'set-cookie', 'date', 'age'}
+
+# 追加がこの件数に達するごとにサイズの確認を行う
+EVICT_CHECK_INTERVAL = 100
+# サイズの上限を超えたときに1回で削除する最大件数
+EVICT_BATCH = 200
+
+# プロセスごとのキャッシュ (fork後の子プロセスでは作り直す)
+_cache = None
+
+
+def read_config(config):
+    """
+    config.ini の [HTTP_CACHE] から設定を読み込む
+
+    Parameters:
+    config (ConfigParser): 読み込み済みの設定
+
+    Returns:
+    dict: 設定（get_cache に渡す）
+    """
+    settings = {'enabled': True, 'max_mb': DEFAULT_MAX_MB, 'max_body_mb': DEFAULT_MAX_BODY_MB}
+    if config.has_section(CONFIG_SECTION):
+        settings['enabled'] = config.getboolean(CONFIG_SECTION, 'enabled', fallback=True)
+        settings['max_mb'] = config.getfloat(CONFIG_SECTION, 'max_mb', fallback=DEFAULT_MAX_MB)
+        settings['max_body_mb'] = config.getfloat(CONFIG_SECTION, 'max_body_mb', fallback=DEFAULT_MAX_BODY_MB)
+    return settings
+
+
+def _cache_control(headers):
+    """Cache-Control ヘッダーを 指示子 -> 値 の辞書にする (headers のキーは小文字)"""
+    directives = {}
+    for part in (headers.get('cache-control') or '').split(','):
+        name, _, value = part.strip().partition('=')
+        if name:
+            directives[name.lower()] = value.strip('"')
+    return directives
+
+
+def _fresh_until(headers, now):
+    """max-age の間は問い合わせずに使える。その期限（no-cache や max-age がなければ0）"""
+    directives = _cache_control(headers)
+    if 'no-cache' in directives:
+        return 0.0
+    match = re.match(r'\d+', directives.get('max-age', ''))
+    return now + int(match.group(0)) if match else 0.0
+
+
+class HttpCache:
+    """検証子付きのHTTP応答を保存するSQLiteキャッシュ"""
+
+    def __init__(self, settings, db_path=HTTP_CACHE_DB_NAME):
+        """
+        初期化メソッド
+
+        Parameters:
+        settings (dict): read_config() が返した設定
+        db_path (str): データベースファイル（共有状態ディレクトリからの相対パス、または絶対パス）
+        """
+        self.settings = settings
+        self.db_path = db_path
+        self.max_bytes = int(settings['max_mb'] * 1024 * 1024)
+        self.max_body_bytes = int(settings['max_body_mb'] * 1024 * 1024)
+        self.pid = os.getpid()
+        self._puts = 0
+        self._local = threading.local()  # スレッドごとの接続 (ヘッジでは別スレッドから取得する)
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = shared_state.connect(self.db_path, timeout=10.0)
+            conn.executescript('''
+                CREATE TABLE IF NOT EXISTS responses (
+                    url TEXT PRIMARY KEY,
+                    final_url TEXT,
+                    etag TEXT,
+                    last_modified TEXT,
+                    headers TEXT NOT NULL,
+                    body BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    fresh_until REAL NOT NULL,
+                    extracted_text TEXT,
+                    extracted_tier TEXT,
+                    stored_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at);
+            ''')
+            self._local.conn = conn
+        return conn
+
+    def get(self, url):
+        """
+        保存した応答を返す
+
+        Returns:
+        dict: {'url', 'final_url', 'etag', 'last_modified', 'headers', 'body', 'fresh',
+               'extraction'（(抽出テキスト, 抽出方法) またはNone）}（ない場合はNone）
+        """
+        row = self._conn().execute('SELECT * FROM responses WHERE url = ?', (url,)).fetchone()
+        if row is None:
+            return None
+        return {
+            'url': row['url'],
+            'final_url': row['final_url'],
+            'etag': row['etag'],
+            'last_modified': row['last_modified'],
+            'headers': json.loads(row['headers']),
+            'body': bytes(row['body']),
+            'fresh': row['fresh_until'] > time.time(),
+            'extraction': (row['extracted_text'], row['extracted_tier']) if row['extracted_text'] else None,
+        }
+
+    def put(self, url, final_url, headers, body):
+        """
+        200応答を保存する（検証子がない・no-store・本文が大きすぎる場合は保存しない）
+
+        Returns:
+        bool: 保存した場合True
+        """
+        headers = {key.lower(): value for key, value in headers.items()}
+        etag = headers.get('etag')
+        last_modified = headers.get('last-modified')
+        if not (etag or last_modified) or 'no-store' in _cache_control(headers) or len(body) > self.max_body_bytes:
+            return False
+        now = time.time()
+        stored_headers = {key: value for key, value in headers.items() if key not in _SKIPPED_HEADERS}
+        self._conn().execute('''
+            INSERT OR REPLACE INTO responses
+                (url, final_url, etag, last_modified, headers, body, size, fresh_until,
+                 extracted_text, extracted_tier, stored_at, accessed_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, NULL, NULL, ?, ?)
+        ''', (url, final_url, etag, last_modified, json.dumps(stored_headers), sqlite3.Binary(body), len(body),
+              _fresh_until(headers, now), now, now))
+        self._puts += 1
+        if self._puts % EVICT_CHECK_INTERVAL == 1:
+            self.evict()
+        return True
+
+    def refresh(self, url, headers):
+        """304応答を受けた応答の鮮度を更新する"""
+        headers = {key.lower(): value for key, value in headers.items()}
+        now = time.time()
+        self._conn().execute('UPDATE responses SET fresh_until = ?, accessed_at = ? WHERE url = ?',
+                          (_fresh_until(headers, now), now, url))
+
+    def touch(self, url):
+        """問い合わせずに使った応答の最終使用時刻を更新する"""
+        self._conn().execute('UPDATE responses SET accessed_at = ? WHERE url = ?', (time.time(), url))
+
+    def put_extraction(self, url, text, tier):
+        """保存した応答の本文から抽出した結果を記録する（応答を保存していなければ何もしない）"""
+        self._conn().execute('UPDATE responses SET extracted_text = ?, extracted_tier = ? WHERE url = ?',
+                          (text, tier, url))
+
+    def evict(self):
+        """合計サイズが上限を超えていれば、最も長く使われていない応答から削除する"""
+        while True:
+            count, total = self._conn().execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses').fetchone()
+            if total <= self.max_bytes:
+                break
+            batch = min(EVICT_BATCH, count * (total - self.max_bytes) // total + 1)
+            deleted = self._conn().execute('''
+                DELETE FROM responses WHERE url IN (SELECT url FROM responses ORDER BY accessed_at LIMIT ?)
+            ''', (batch,)).rowcount
+            if not deleted:
+                break
+
+
+def get_cache(settings):
+    """
+    現在のプロセスのキャッシュを返す（無効の場合はNone）
+
+    Parameters:
+    settings (dict): read_config() が返した設定
+    """
+    global _cache
+    if not settings or not settings.get('enabled'):
+        return None
+    if _cache is None or _cache.pid != os.getpid() or _cache.settings != settings:
+        _cache = HttpCache(settings)
+    return _cache
+
+
+def conditional_headers(entry):
+    """保存した応答の検証子から条件付きリクエストのヘッダーを作成する"""
+    headers = {}
+    if entry.get('etag'):
+        headers['If-None-Match'] = entry['etag']
+    if entry.get('last_modified'):
+        headers['If-Modified-Since'] = entry['last_modified']
+    return headers
+
+
+def lookup(url, settings):
+    """保存した応答を返す（ない場合・無効の場合はNone）"""
+    cache = get_cache(settings)
+    if cache is None:
+        return None
+    try:
+        return cache.get(url)
+    except sqlite3.Error as e:
+        print(f"HTTPキャッシュを読み込めませんでした: {url} - {e}")
+        return None
+
+
+def _update(method, url, settings, *args):
+    """キャッシュの method を呼び出す（無効の場合・エラーの場合はNone）"""
+    cache = get_cache(settings)
+    if cache is None:
+        return None
+    try:
+        return getattr(cache, method)(url, *args)
+    except sqlite3.Error as e:
+        print(f"HTTPキャッシュを更新できませんでした: {url} - {e}")
+        return None
+
+
+def store(url, final_url, headers, body, settings):
+    """200応答をキャッシュに保存する（保存した場合True、無効の場合・保存できない場合は何もしない）"""
+    return bool(_update('put', url, settings, final_url, headers, body))
+
+
+def refresh(url, headers, settings):
+    """304応答を受けた応答の鮮度を 304 のヘッダーで更新する"""
+    _update('refresh', url, settings, headers)
+
+
+def touch(url, settings):
+    """問い合わせずに使った応答の最終使用時刻を更新する"""
+    _update('touch', url, settings)
+
+
+def store_extraction(url, text, tier, settings):
+    """保存した応答の本文からの抽出結果を記録する（応答を保存していなければ何もしない）"""
+    _update('put_extraction', url, settings, text, tier)
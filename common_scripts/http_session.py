@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+抽出ワーカープロセスごとに使い回す requests のセッション
+
+モジュール関数の requests.get / requests.head はリクエストごとに新しいTCP/TLS接続を
+開きます。ここではプロセスごとに1つの Session を作成し、ホストごとの接続プールで
+keep-alive の接続を再利用します。作成した接続数と送信したリクエスト数を数えて
+接続の再利用率を報告できるようにしています。
+"""
+
+import os
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util import make_headers
+
+# 接続プールを保持するホスト数と、1ホストあたりの最大接続数
+POOL_HOSTS = 100
+POOL_MAXSIZE_PER_HOST = 4
+
+# 抽出器が送信するUser-Agent
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/125.0.0.0 Safari/537.36'
+
+# このプロセスで作成した接続数と送信したリクエスト数
+_stats = {'connections': 0, 'requests': 0}
+
+# プロセスごとのセッション (fork後の子プロセスでは作り直す)
+_session = None
+_session_pid = None
+
+
+class _CountingHTTPConnectionPool(HTTPConnectionPool):
+    def _new_conn(self):
+        _stats['connections'] += 1
+        return super()._new_conn()
+
+    def _make_request(self, *args, **kwargs):
+        _stats['requests'] += 1
+        return super()._make_request(*args, **kwargs)
+
+
+class _CountingHTTPSConnectionPool(HTTPSConnectionPool):
+    def _new_conn(self):
+        _stats['connections'] += 1
+        return super()._new_conn()
+
+    def _make_request(self, *args, **kwargs):
+        _stats['requests'] += 1
+        return super()._make_request(*args, **kwargs)
+
+
+class CountingHTTPAdapter(HTTPAdapter):
+    """接続数とリクエスト数を数える接続プールを使うアダプター"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _CountingHTTPConnectionPool,
+            'https': _CountingHTTPSConnectionPool,
+        }
+
+
+def create_session():
+    """keep-alive・圧縮転送に対応したセッションを作成する"""
+    session = requests.Session()
+    adapter = CountingHTTPAdapter(pool_connections=POOL_HOSTS, pool_maxsize=POOL_MAXSIZE_PER_HOST)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    # gzip/deflate (brotli などがインストールされていればそれも) を受け付ける
+    session.headers.update(make_headers(keep_alive=True, accept_encoding=True))
+    session.headers['User-Agent'] = USER_AGENT
+    return session
+
+
+def get_session():
+    """現在のプロセスのセッションを返す（なければ作成する）"""
+    global _session, _session_pid
+    if _session_pid != os.getpid():
+        # fork元のプロセスの統計を引き継がない
+        _stats['connections'] = 0
+        _stats['requests'] = 0
+    if _session is None or _session_pid != os.getpid():
+        _session = create_session()
+        _session_pid = os.getpid()
+    return _session
+
+
+def reset_session():
+    """セッションを閉じる（処理を中断した接続を再利用しないよう、次回の get_session で作り直す）"""
+    global _session
+    if _session is not None and _session_pid == os.getpid():
+        _session.close()
+    _session = None
+
+
+def get_stats():
+    """このプロセスの接続数・リクエスト数の累計を返す"""
+    return dict(_stats)
+
+
+def stats_delta(before, after):
+    """get_stats() の2つの値の差を返す"""
+    return {key: after[key] - before[key] for key in _stats}
+
+
+def reuse_rate(stats):
+    """接続の再利用率 (新しい接続を開かずに済んだリクエストの割合)。リクエストがなければNone"""
+    if not stats.get('requests'):
+        return None
+    return max(0.0, 1 - stats['connections'] / stats['requests'])
@@ -1,12 +1,23 @@
 import os
 import re
 
-def combine_files():
-    # ファイルパスを定義
-    google_file = os.path.join("outputs", "google_urls_extracted.txt")
-    yahoo_file = os.path.join("outputs", "yahoo_urls_extracted.txt")
-    output_file = os.path.join("Integrated_Text", "Integrated_Text.txt")
-    
+# 既定のファイルパス（作業フォルダーからの相対パス）
+DEFAULT_GOOGLE_FILE = os.path.join("outputs", "google_urls_extracted.txt")
+DEFAULT_YAHOO_FILE = os.path.join("outputs", "yahoo_urls_extracted.txt")
+DEFAULT_OUTPUT_FILE = os.path.join("Integrated_Text", "Integrated_Text.txt")
+
+def combine_files(google_file=DEFAULT_GOOGLE_FILE, yahoo_file=DEFAULT_YAHOO_FILE, output_file=DEFAULT_OUTPUT_FILE):
+    """
+    Google・Yahooの抽出結果を1つのテキストファイルに統合する
+
+    Parameters:
+    google_file (str): Googleの抽出結果ファイル
+    yahoo_file (str): Yahooの抽出結果ファイル
+    output_file (str): 統合結果の出力先
+
+    Returns:
+    str: 出力したファイルのパス
+    """
     # Googleファイルの内容を読み込み
     with open(google_file, 'r', encoding='utf-8') as f:
         google_content = f.read()
@@ -62,6 +73,8 @@ def combine_files():
     else:
         print("ファイルの統合が完了しました！")
 
+    return output_file
+
 # 関数を実行
 if __name__ == "__main__":
     combine_files()
\ No newline at end of file
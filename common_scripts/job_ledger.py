@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+キーワード処理の進捗を記録するジョブ台帳
+
+キーワードごと・処理段階（Google検索、Yahoo検索、URLファイルごとの抽出、統合、納品）ごとの
+状態をSQLiteに記録し、クラッシュや再起動の後に完了済みの段階から処理を再開できるようにします。
+"""
+
+import json
+import time
+
+import shared_state
+
+# 台帳のデータベースファイル名（共有状態ディレクトリ内）
+LEDGER_DB_NAME = 'job_ledger.sqlite3'
+
+# 処理段階
+STAGE_GOOGLE_SERP = 'google_serp'
+STAGE_YAHOO_SERP = 'yahoo_serp'
+STAGE_EXTRACT_PREFIX = 'extract:'  # 例: extract:google_urls.txt
+STAGE_INTEGRATE = 'integrate'
+STAGE_DELIVER = 'deliver'
+
+# ジョブの状態
+JOB_RUNNING = 'running'
+JOB_DONE = 'done'
+JOB_FAILED = 'failed'
+
+# 段階の状態
+STAGE_RUNNING = 'running'
+STAGE_DONE = 'done'
+STAGE_FAILED = 'failed'
+
+
+def extract_stage(url_file_name):
+    """URLファイルごとの抽出段階名を返す"""
+    return f"{STAGE_EXTRACT_PREFIX}{url_file_name}"
+
+
+class JobLedger:
+    """キーワードと処理段階の状態を記録するSQLite台帳"""
+
+    def __init__(self, db_path=LEDGER_DB_NAME):
+        """
+        初期化メソッド
+
+        Parameters:
+        db_path (str): データベースファイル（共有状態ディレクトリからの相対パス、または絶対パス）
+        """
+        # 電源断などでも完了記録が失われないよう synchronous=FULL で接続
+        self.conn = shared_state.connect(db_path, synchronous='FULL')
+        self._create_tables()
+
+    def _create_tables(self):
+        """テーブルがなければ作成する"""
+        self.conn.executescript('''
+            CREATE TABLE IF NOT EXISTS jobs (
+                keyword TEXT PRIMARY KEY,
+                state TEXT NOT NULL,
+                workspace TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS stages (
+                keyword TEXT NOT NULL,
+                stage TEXT NOT NULL,
+                state TEXT NOT NULL,
+                started_at REAL,
+                finished_at REAL,
+                detail TEXT,
+                PRIMARY KEY (keyword, stage)
+            );
+        ''')
+
+    def close(self):
+        """接続を閉じる"""
+        self.conn.close()
+
+    def start_job(self, keyword, workspace):
+        """
+        ジョブの開始（または再開）を記録する
+
+        同じ作業フォルダーで中断したほかのキーワードのジョブは、このジョブがファイルを
+        置き換えるため、作業フォルダーの記録を消して再開の対象から外す（次回は最初からやり直す）。
+        """
+        now = time.time()
+        if workspace:
+            self.conn.execute('''
+                UPDATE jobs SET workspace = NULL, updated_at = ?
+                WHERE workspace = ? AND keyword != ? AND state != ?
+            ''', (now, workspace, keyword, JOB_DONE))
+        self.conn.execute('''
+            INSERT INTO jobs (keyword, state, workspace, attempts, created_at, updated_at)
+            VALUES (?, ?, ?, 1, ?, ?)
+            ON CONFLICT(keyword) DO UPDATE SET
+                state = excluded.state,
+                workspace = excluded.workspace,
+                attempts = jobs.attempts + 1,
+                updated_at = excluded.updated_at
+        ''', (keyword, JOB_RUNNING, workspace, now, now))
+
+    def finish_job(self, keyword, state=JOB_DONE):
+        """ジョブの終了状態を記録する"""
+        self.conn.execute('UPDATE jobs SET state = ?, updated_at = ? WHERE keyword = ?',
+                          (state, time.time(), keyword))
+
+    def reset_job(self, keyword):
+        """段階の記録を削除し、ジョブを最初からやり直せるようにする"""
+        self.conn.execute('DELETE FROM stages WHERE keyword = ?', (keyword,))
+
+    def get_job(self, keyword):
+        """ジョブの記録を辞書で返す（なければNone）"""
+        row = self.conn.execute('SELECT * FROM jobs WHERE keyword = ?', (keyword,)).fetchone()
+        return dict(row) if row else None
+
+    def get_stages(self, keyword):
+        """段階名 -> 記録（辞書）の対応を返す"""
+        rows = self.conn.execute('SELECT * FROM stages WHERE keyword = ?', (keyword,)).fetchall()
+        stages = {}
+        for row in rows:
+            stage = dict(row)
+            stage['detail'] = json.loads(stage['detail']) if stage['detail'] else None
+            stages[stage['stage']] = stage
+        return stages
+
+    def is_stage_done(self, keyword, stage):
+        """段階が完了済みかどうか"""
+        row = self.conn.execute('SELECT state FROM stages WHERE keyword = ? AND stage = ?',
+                                (keyword, stage)).fetchone()
+        return row is not None and row['state'] == STAGE_DONE
+
+    def mark_stage_started(self, keyword, stage):
+        """段階の開始を記録する"""
+        self.conn.execute('''
+            INSERT INTO stages (keyword, stage, state, started_at, finished_at, detail)
+            VALUES (?, ?, ?, ?, NULL, NULL)
+            ON CONFLICT(keyword, stage) DO UPDATE SET
+                state = excluded.state,
+                started_at = excluded.started_at,
+                finished_at = NULL,
+                detail = NULL
+        ''', (keyword, stage, STAGE_RUNNING, time.time()))
+        self._touch_job(keyword)
+
+    def mark_stage_done(self, keyword, stage, detail=None):
+        """段階の完了を記録する（detailは任意のJSON化可能な値）"""
+        self._finish_stage(keyword, stage, STAGE_DONE, detail)
+
+    def mark_stage_failed(self, keyword, stage, error=None):
+        """段階の失敗を記録する"""
+        self._finish_stage(keyword, stage, STAGE_FAILED, {'error': error} if error else None)
+
+    def _finish_stage(self, keyword, stage, state, detail):
+        """段階の終了状態を記録する"""
+        now = time.time()
+        detail_json = json.dumps(detail, ensure_ascii=False) if detail is not None else None
+        self.conn.execute('''
+            INSERT INTO stages (keyword, stage, state, started_at, finished_at, detail)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(keyword, stage) DO UPDATE SET
+                state = excluded.state,
+                finished_at = excluded.finished_at,
+                detail = excluded.detail
+        ''', (keyword, stage, state, now, now, detail_json))
+        self._touch_job(keyword)
+
+    def _touch_job(self, keyword):
+        """ジョブの更新時刻を更新する"""
+        self.conn.execute('UPDATE jobs SET updated_at = ? WHERE keyword = ?', (time.time(), keyword))
+
+    def get_finished_stages(self, since=None):
+        """
+        完了した段階の記録を返す（テレメトリ用）
+
+        Parameters:
+        since (float): この時刻以降に終了した段階のみ返す（Noneの場合は全件）
+
+        Returns:
+        list: [{'keyword', 'stage', 'started_at', 'finished_at', 'detail'}, ...]（終了時刻順）
+        """
+        rows = self.conn.execute('''
+            SELECT keyword, stage, started_at, finished_at, detail FROM stages
+            WHERE state = ? AND finished_at IS NOT NULL AND finished_at >= ?
+            ORDER BY finished_at
+        ''', (STAGE_DONE, since or 0)).fetchall()
+        stages = []
+        for row in rows:
+            stage = dict(row)
+            stage['detail'] = json.loads(stage['detail']) if stage['detail'] else None
+            stages.append(stage)
+        return stages
+
+    def get_jobs(self, state=None, since=None):
+        """
+        ジョブの記録を返す
+
+        Parameters:
+        state (str): この状態のジョブのみ返す（Noneの場合は全状態）
+        since (float): この時刻以降に更新されたジョブのみ返す
+
+        Returns:
+        list: ジョブの記録（辞書）のリスト（更新時刻順）
+        """
+        rows = self.conn.execute('''
+            SELECT * FROM jobs WHERE (? IS NULL OR state = ?) AND updated_at >= ?
+            ORDER BY updated_at
+        ''', (state, state, since or 0)).fetchall()
+        return [dict(row) for row in rows]
+
+    def get_resumable_jobs(self):
+        """
+        途中まで完了している未完了ジョブを返す
+
+        Returns:
+        list: [{'keyword': ..., 'workspace': ..., 'done_stages': [...]}, ...]
+        """
+        rows = self.conn.execute('''
+            SELECT j.keyword, j.workspace, GROUP_CONCAT(s.stage) AS done_stages
+            FROM jobs j JOIN stages s ON s.keyword = j.keyword AND s.state = ?
+            WHERE j.state != ?
+            GROUP BY j.keyword
+            ORDER BY j.keyword
+        ''', (STAGE_DONE, JOB_DONE)).fetchall()
+        return [{
+            'keyword': row['keyword'],
+            'workspace': row['workspace'],
+            'done_stages': row['done_stages'].split(',') if row['done_stages'] else [],
+        } for row in rows]
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+delivery_folder の未処理キーワードを管理するインデックス付きキュー
+
+delivery_folder と completed_folder の内容をSQLiteのテーブルに同期し、
+「次の未処理キーワード」を (状態, キーワード) のインデックスで取得します。
+フォルダーの更新時刻が変わらない限り再走査しないため、キーワードファイルが
+数万件あっても空きスロットの確認ごとにフォルダー全体を読む必要がありません。
+"""
+
+import os
+import time
+
+import shared_state
+
+# キューのデータベースファイル名（共有状態ディレクトリ内）
+QUEUE_DB_NAME = 'keyword_queue.sqlite3'
+
+# キーワードの状態
+STATE_PENDING = 'pending'        # 未処理
+STATE_DISPATCHED = 'dispatched'  # 今回の実行で割り当て済み
+STATE_COMPLETED = 'completed'    # completed_folder に移動済み
+
+# 更新時刻の変化を見逃した場合に備えて全体を再走査する間隔（秒）
+FULL_SYNC_INTERVAL = 60.0
+
+
+def _list_keywords(folder):
+    """フォルダー内の .txt ファイル名（拡張子なし）の集合を返す"""
+    try:
+        with os.scandir(folder) as entries:
+            return set(entry.name[:-4] for entry in entries if entry.name.endswith('.txt') and entry.is_file())
+    except FileNotFoundError:
+        return set()
+
+
+def _mtime_ns(folder):
+    """フォルダーの更新時刻（存在しなければNone）"""
+    try:
+        return os.stat(folder).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+class KeywordQueue:
+    """delivery_folder と同期するキーワードのキュー"""
+
+    def __init__(self, delivery_folder, db_path=QUEUE_DB_NAME):
+        """
+        初期化メソッド
+
+        Parameters:
+        delivery_folder (str): 納品フォルダー
+        db_path (str): データベースファイル（共有状態ディレクトリからの相対パス、または絶対パス）
+        """
+        self.delivery_folder = os.path.realpath(delivery_folder)
+        self.completed_folder = os.path.join(self.delivery_folder, 'completed_folder')
+        self.conn = shared_state.connect(db_path)
+        self.conn.executescript('''
+            CREATE TABLE IF NOT EXISTS keyword_queue (
+                folder TEXT NOT NULL,
+                keyword TEXT NOT NULL,
+                state TEXT NOT NULL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (folder, keyword)
+            );
+            CREATE INDEX IF NOT EXISTS keyword_queue_state ON keyword_queue (folder, state, keyword);
+        ''')
+        self._stamp = None
+        self._last_full_sync = 0.0
+
+    def close(self):
+        """接続を閉じる"""
+        self.conn.close()
+
+    def sync(self, force=False):
+        """
+        フォルダーの内容をテーブルに反映する
+
+        delivery_folder と completed_folder の更新時刻が前回から変わっていなければ何もしない。
+
+        Returns:
+        bool: 再走査した場合True
+        """
+        stamp = (_mtime_ns(self.delivery_folder), _mtime_ns(self.completed_folder))
+        now = time.monotonic()
+        if not force and stamp == self._stamp and now - self._last_full_sync < FULL_SYNC_INTERVAL:
+            return False
+
+        delivered = _list_keywords(self.delivery_folder)
+        completed = _list_keywords(self.completed_folder)
+        pending = delivered - completed
+        known = dict(self.conn.execute('SELECT keyword, state FROM keyword_queue WHERE folder = ?',
+                                       (self.delivery_folder,)).fetchall())
+        updated_at = time.time()
+
+        inserts = [(self.delivery_folder, keyword, STATE_PENDING, updated_at)
+                   for keyword in pending if keyword not in known]
+        inserts += [(self.delivery_folder, keyword, STATE_COMPLETED, updated_at)
+                    for keyword in completed if keyword not in known]
+        to_completed = [(STATE_COMPLETED, updated_at, self.delivery_folder, keyword)
+                        for keyword, state in known.items() if keyword in completed and state != STATE_COMPLETED]
+        to_pending = [(STATE_PENDING, updated_at, self.delivery_folder, keyword)
+                      for keyword, state in known.items() if keyword in pending and state == STATE_COMPLETED]
+        removed = [(self.delivery_folder, keyword)
+                   for keyword in known if keyword not in pending and keyword not in completed]
+
+        self.conn.execute('BEGIN')
+        try:
+            self.conn.executemany('INSERT INTO keyword_queue (folder, keyword, state, updated_at) VALUES (?, ?, ?, ?)',
+                                  inserts)
+            self.conn.executemany('UPDATE keyword_queue SET state = ?, updated_at = ? WHERE folder = ? AND keyword = ?',
+                                  to_completed + to_pending)
+            self.conn.executemany('DELETE FROM keyword_queue WHERE folder = ? AND keyword = ?', removed)
+            self.conn.execute('COMMIT')
+        except Exception:
+            self.conn.execute('ROLLBACK')
+            raise
+
+        self._stamp = stamp
+        self._last_full_sync = now
+        return True
+
+    def pending(self, limit=None):
+        """
+        未処理（未割り当て）のキーワードをキーワード順に返す
+
+        Parameters:
+        limit (int): 返す最大件数（Noneの場合は全件）
+        """
+        rows = self.conn.execute('''
+            SELECT keyword FROM keyword_queue WHERE folder = ? AND state = ?
+            ORDER BY keyword LIMIT ?
+        ''', (self.delivery_folder, STATE_PENDING, -1 if limit is None else limit)).fetchall()
+        return [row['keyword'] for row in rows]
+
+    def next_pending(self):
+        """次の未処理キーワードを返す（なければNone）"""
+        keywords = self.pending(limit=1)
+        return keywords[0] if keywords else None
+
+    def is_pending(self, keyword):
+        """キーワードが未処理（未割り当て）かどうか"""
+        row = self.conn.execute('SELECT state FROM keyword_queue WHERE folder = ? AND keyword = ?',
+                                (self.delivery_folder, keyword)).fetchone()
+        return row is not None and row['state'] == STATE_PENDING
+
+    def count(self, state=STATE_PENDING):
+        """指定した状態のキーワード数を返す"""
+        row = self.conn.execute('SELECT COUNT(*) AS n FROM keyword_queue WHERE folder = ? AND state = ?',
+                                (self.delivery_folder, state)).fetchone()
+        return row['n']
+
+    def _set_state(self, keyword, state):
+        self.conn.execute('UPDATE keyword_queue SET state = ?, updated_at = ? WHERE folder = ? AND keyword = ?',
+                          (state, time.time(), self.delivery_folder, keyword))
+
+    def mark_dispatched(self, keyword):
+        """キーワードを割り当て済みにする（pending() で返されなくなる）"""
+        self._set_state(keyword, STATE_DISPATCHED)
+
+    def mark_completed(self, keyword):
+        """キーワードを完了済みにする"""
+        self._set_state(keyword, STATE_COMPLETED)
+
+    def reset_dispatched(self):
+        """前回の実行で割り当て済みのまま残ったキーワードを未処理に戻す"""
+        self.conn.execute('UPDATE keyword_queue SET state = ?, updated_at = ? WHERE folder = ? AND state = ?',
+                          (STATE_PENDING, time.time(), self.delivery_folder, STATE_DISPATCHED))
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+コーディネーターからキーワードを受け取って処理するワーカーノード
+
+コーディネーター (coordinator.py) からキーワードをリースし、作業フォルダーとローカルの
+納品フォルダーを作成して start.py を実行します。処理中はハートビートでリースを延長し、
+完了したら統合テキストをコーディネーターへ返します。
+"""
+
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import cpu_affinity
+import shared_state
+import workspace_manager
+
+# コーディネーターに接続できない場合の再試行間隔（秒）
+CONNECT_RETRY_INTERVAL = 5
+# HTTPリクエストのタイムアウト（秒）
+REQUEST_TIMEOUT = 30
+# ワーカー内のローカル納品フォルダー名（作業フォルダー内に作成）
+LOCAL_DELIVERY_DIR = 'delivery_folder'
+
+
+class LeaseLostError(Exception):
+    """リースが失効していた（他のワーカーに再配布された可能性がある）"""
+
+
+def post_json(coordinator_url, path, payload):
+    """
+    コーディネーターへJSONをPOSTし、応答のJSONを返す
+
+    Returns:
+    dict: 応答のJSON
+
+    Raises:
+    LeaseLostError: リースが失効していた場合 (HTTP 409/410)
+    urllib.error.URLError: 接続できなかった場合
+    """
+    data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+    request = urllib.request.Request(coordinator_url.rstrip('/') + path, data=data,
+                                     headers={'Content-Type': 'application/json; charset=utf-8'})
+    try:
+        with urllib.request.urlopen(request, timeout=REQUEST_TIMEOUT) as response:
+            return json.loads(response.read().decode('utf-8'))
+    except urllib.error.HTTPError as e:
+        if e.code in (409, 410):
+            raise LeaseLostError(path) from e
+        raise
+
+
+def default_worker_name():
+    """ホスト名とプロセスIDからワーカー名を作る"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _heartbeat_loop(coordinator_url, lease, process, stop_event):
+    """処理中のリースを定期的に延長し、失効していたら start.py を停止する"""
+    interval = max(1.0, lease['lease_timeout'] / 3)
+    while not stop_event.wait(interval):
+        try:
+            post_json(coordinator_url, '/heartbeat', {'lease_id': lease['lease_id']})
+        except LeaseLostError:
+            print(f"警告: '{lease['keyword']}' のリースが失効しました。処理を中止します。")
+            process.terminate()
+            return
+        except (urllib.error.URLError, OSError) as e:
+            # 一時的な通信エラーでは処理を止めない (期限までに再接続できなければ再配布される)
+            print(f"警告: ハートビートの送信に失敗しました: {e}")
+
+
+def process_lease(lease, slot_name, args):
+    """
+    リースしたキーワードを作業フォルダーで処理する
+
+    Returns:
+    str: 統合テキスト（失敗した場合はNone）
+    """
+    keyword = lease['keyword']
+    workspace = workspace_manager.create_workspace(keyword, args.scratch_root, args.template_config)
+    try:
+        # ローカルの納品フォルダーにキーワードのファイル（検索URL）を置く
+        delivery_folder = os.path.join(workspace, LOCAL_DELIVERY_DIR)
+        os.makedirs(delivery_folder, exist_ok=True)
+        with open(os.path.join(delivery_folder, f"{keyword}.txt"), 'w', encoding='utf-8') as f:
+            f.write(lease['content'])
+
+        env = os.environ.copy()
+        env[shared_state.DELIVERY_FOLDER_ENV] = delivery_folder
+        env['PYTHONUNBUFFERED'] = '1'
+        env['PYTHONIOENCODING'] = 'utf-8'
+        env['WEBTEXT_HEADLESS'] = '1'
+        if args.slot_cpus.get(slot_name):
+            env[cpu_affinity.CPU_SET_ENV] = cpu_affinity.format_cpu_list(args.slot_cpus[slot_name])
+
+        command = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'start.py'), keyword]
+        if args.in_process:
+            command.append('--in-process')
+        os.makedirs(args.log_dir, exist_ok=True)
+        log_path = os.path.join(args.log_dir, f"{time.strftime('%Y%m%d_%H%M%S')}_{slot_name}_{keyword}.log")
+        print(f"[{slot_name}] '{keyword}' の処理を開始します (ログ: {log_path})")
+
+        popen_kwargs = {}
+        if os.name == 'posix':
+            # 端末からのSIGINTが子プロセスへ直接届かないように別セッションで起動
+            popen_kwargs['start_new_session'] = True
+        with open(log_path, 'w', encoding='utf-8') as log_file:
+            process = subprocess.Popen(command, cwd=workspace, stdin=subprocess.DEVNULL,
+                                       stdout=log_file, stderr=subprocess.STDOUT, env=env, **popen_kwargs)
+            stop_event = threading.Event()
+            heartbeat = threading.Thread(target=_heartbeat_loop,
+                                         args=(args.coordinator_url, lease, process, stop_event), daemon=True)
+            heartbeat.start()
+            try:
+                returncode = process.wait()
+            finally:
+                stop_event.set()
+                heartbeat.join()
+
+        delivered_path = os.path.join(delivery_folder, 'completed_folder', f"{keyword}.txt")
+        if returncode != 0 or not os.path.isfile(delivered_path):
+            print(f"[{slot_name}] '{keyword}' の処理に失敗しました (終了コード: {returncode})")
+            return None
+        with open(delivered_path, 'r', encoding='utf-8-sig') as f:
+            return f.read()
+    finally:
+        workspace_manager.remove_workspace(workspace, args.scratch_root)
+
+
+def worker_loop(slot_name, args, should_stop):
+    """1スロット分のワーカー: キーワードのリース・処理・結果の返却を繰り返す"""
+    worker_name = f"{args.worker_name}/{slot_name}"
+    while not should_stop():
+        try:
+            lease = post_json(args.coordinator_url, '/lease', {'worker': worker_name})
+        except (urllib.error.URLError, OSError, ValueError) as e:
+            print(f"[{slot_name}] コーディネーターに接続できません: {e}。{CONNECT_RETRY_INTERVAL}秒後に再試行します。")
+            time.sleep(CONNECT_RETRY_INTERVAL)
+            continue
+
+        if not lease.get('keyword'):
+            if lease.get('finished'):
+                print(f"[{slot_name}] 処理するキーワードがなくなりました。")
+                return
+            time.sleep(lease.get('retry_after', CONNECT_RETRY_INTERVAL))
+            continue
+
+        try:
+            text = process_lease(lease, slot_name, args)
+        except OSError as e:
+            print(f"[{slot_name}] '{lease['keyword']}' の作業フォルダーの準備に失敗しました: {e}")
+            text = None
+
+        try:
+            if text is None:
+                post_json(args.coordinator_url, '/fail', {'lease_id': lease['lease_id'], 'error': 'start.py failed'})
+            else:
+                post_json(args.coordinator_url, '/complete',
+                          {'lease_id': lease['lease_id'], 'keyword': lease['keyword'], 'text': text})
+                print(f"[{slot_name}] '{lease['keyword']}' の結果をコーディネーターに送信しました。")
+        except LeaseLostError:
+            print(f"[{slot_name}] '{lease['keyword']}' のリースは既に失効していたため、結果は受け付けられませんでした。")
+        except (urllib.error.URLError, OSError) as e:
+            # 送信できなかったキーワードはリースの期限切れ後に再配布される
+            print(f"[{slot_name}] '{lease['keyword']}' の結果を送信できませんでした: {e}")
+
+
+def run_worker(args, should_stop=lambda: False):
+    """
+    args.concurrency 個のスロットでコーディネーターのキーワードを処理する
+
+    Parameters:
+    args (Namespace): coordinator_url, worker_name, concurrency, scratch_root, template_config,
+                      log_dir, cpu_layout, in_process を持つ引数
+    should_stop (callable): Trueを返したら新しいキーワードのリースをやめる関数
+    """
+    slot_names = [f"slot{i + 1}" for i in range(args.concurrency)]
+    args.slot_cpus = dict(zip(slot_names, cpu_affinity.partition_cpus(len(slot_names), args.cpu_layout)))
+    print(f"ワーカー '{args.worker_name}' を開始します (コーディネーター: {args.coordinator_url}, スロット数: {args.concurrency})")
+
+    threads = [threading.Thread(target=worker_loop, args=(slot_name, args, should_stop), name=slot_name)
+               for slot_name in slot_names]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        # シグナルを受け付けられるようにタイムアウト付きで待つ
+        while thread.is_alive():
+            thread.join(timeout=1.0)
+    print(f"ワーカー '{args.worker_name}' を終了します。")
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+抽出結果のジャーナル（途中で落ちても完了したURLの結果を失わないための追記ファイル）
+
+URLファイルの抽出結果は、すべてのURLが終わってから *_extracted.txt に書き出されるため、
+途中でプロセスが落ちると完了していたURLの結果もすべて失われます。ここでは完了したURLの
+結果を1件ずつJSON Lines形式で出力ファイルの隣のジャーナルに追記してディスクに書き込み (fsync)、
+再実行時にはジャーナルにあるURLを抽出し直さずに使います。メモリにはURLごとの位置だけを持ち、
+出力ファイルを書くときにURLリストの順にジャーナルから読み出します。
+"""
+
+import json
+import os
+
+
+class ResultJournal:
+    """1つのURLファイルの抽出結果のジャーナル"""
+
+    def __init__(self, path, source, urls):
+        """
+        初期化メソッド
+
+        Parameters:
+        path (str): ジャーナルファイルのパス
+        source (str): 処理元のURLファイルのパス（別のURLファイルのジャーナルは使わない）
+        urls (list): URLファイルのURL（出力の順序）
+        """
+        self.path = path
+        self.source = source
+        self.urls = urls
+        self._offsets = {}   # URL -> ジャーナル内の行の開始位置
+        self._tiers = {}     # URL -> 抽出方法
+        self._file = None
+
+    def open(self):
+        """
+        前回の実行で残ったジャーナルを読み込む（書き込み途中で切れた最後の行は切り詰める）
+
+        Returns:
+        dict: 前回完了していたURL -> 抽出方法（URLファイルの URL のみ）
+        """
+        if not os.path.exists(self.path):
+            return {}
+        wanted = set(self.urls)
+        valid_end = 0
+        with open(self.path, 'rb') as f:
+            header = f.readline()
+            try:
+                if json.loads(header.decode('utf-8')).get('source') != self.source:
+                    raise ValueError
+            except ValueError:
+                print(f"別の処理のジャーナルのため破棄します: {self.path}")
+                f.close()
+                os.remove(self.path)
+                return {}
+            valid_end = f.tell()
+            while True:
+                offset = f.tell()
+                line = f.readline()
+                if not line:
+                    break
+                try:
+                    if not line.endswith(b'\n'):
+                        raise ValueError
+                    entry = json.loads(line.decode('utf-8'))
+                except ValueError:
+                    print(f"ジャーナルの最後の書き込み途中の行を切り詰めます: {self.path}")
+                    break
+                valid_end = f.tell()
+                if entry['url'] in wanted and entry['url'] not in self._offsets:
+                    self._offsets[entry['url']] = offset
+                    self._tiers[entry['url']] = entry['tier']
+        if valid_end < os.path.getsize(self.path):
+            with open(self.path, 'r+b') as f:
+                f.truncate(valid_end)
+        if self._offsets:
+            print(f"前回の実行で完了していた {len(self._offsets)} 件の結果をジャーナルから再開します: {self.path}")
+        return dict(self._tiers)
+
+    def __contains__(self, url):
+        return url in self._offsets
+
+    def __len__(self):
+        """出力に含めるURL（URLファイルのURLで結果があるもの）の数"""
+        return sum(1 for url in self.urls if url in self._offsets)
+
+    def append(self, url, text, tier):
+        """完了したURLの結果を追記し、ディスクに書き込む（同じURLの2件目以降は無視する）"""
+        if url in self._offsets:
+            return
+        if self._file is None:
+            new = not os.path.exists(self.path)
+            self._file = open(self.path, 'ab')
+            if new:
+                self._write({'source': self.source})
+        self._offsets[url] = self._file.tell()
+        self._tiers[url] = tier
+        self._write({'url': url, 'tier': tier, 'text': text})
+
+    def _write(self, entry):
+        self._file.write((json.dumps(entry, ensure_ascii=False) + '\n').encode('utf-8'))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def __iter__(self):
+        """URLファイルの順に (URL, 抽出テキスト) を返す（ジャーナルから1件ずつ読み出す）"""
+        if not self._offsets:
+            return
+        with open(self.path, 'rb') as f:
+            for url in self.urls:
+                offset = self._offsets.get(url)
+                if offset is None:
+                    continue
+                f.seek(offset)
+                yield url, json.loads(f.readline().decode('utf-8'))['text']
+
+    def close(self):
+        """追記用のファイルを閉じる"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def remove(self):
+        """出力ファイルに書き出したジャーナルを削除する"""
+        self.close()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+共有状態ファイルの配置とSQLite接続の共通処理
+
+各ワークスペース・各プロセスから同じ状態ファイルを参照できるように、
+保存先ディレクトリの決定とSQLite接続の設定（WAL、ビジータイムアウト）をまとめています。
+"""
+
+import os
+import sqlite3
+
+# 共有状態ディレクトリ (環境変数で上書き可能)
+STATE_DIR_ENV = 'WEBTEXT_STATE_DIR'
+# 納品フォルダー (環境変数で上書き可能。分散実行のワーカーはローカルの納品フォルダーを使う)
+DELIVERY_FOLDER_ENV = 'WEBTEXT_DELIVERY_FOLDER'
+
+
+def get_root_dir():
+    """プロジェクトのルートディレクトリ（common_scriptsの1つ上の階層）を返す"""
+    return os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def get_delivery_folder():
+    """納品フォルダー（既定はルートディレクトリの delivery_folder）のパスを返す"""
+    return os.environ.get(DELIVERY_FOLDER_ENV) or os.path.join(get_root_dir(), 'delivery_folder')
+
+
+def get_state_dir():
+    """共有状態ディレクトリのパスを返す（存在しなければ作成する）"""
+    state_dir = os.environ.get(STATE_DIR_ENV) or os.path.join(get_root_dir(), 'state')
+    os.makedirs(state_dir, exist_ok=True)
+    return state_dir
+
+
+def get_state_path(name):
+    """共有状態ディレクトリ内のファイルパスを返す（絶対パスはそのまま返す）"""
+    if os.path.isabs(name):
+        os.makedirs(os.path.dirname(name), exist_ok=True)
+        return name
+    return os.path.join(get_state_dir(), name)
+
+
+def connect(db_name, timeout=30.0, synchronous='NORMAL'):
+    """
+    共有状態用のSQLiteデータベースに接続する
+
+    Parameters:
+    db_name (str): データベースファイル名（状態ディレクトリからの相対パス、または絶対パス）
+    timeout (float): ロック待ちの最大秒数
+    synchronous (str): PRAGMA synchronous の値（クラッシュ耐性が必要な場合は 'FULL'）
+
+    Returns:
+    sqlite3.Connection: 自動コミットモードの接続（トランザクションは明示的に BEGIN する）
+    """
+    conn = sqlite3.connect(get_state_path(db_name), timeout=timeout, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute(f'PRAGMA synchronous={synchronous}')
+    conn.execute(f'PRAGMA busy_timeout={int(timeout * 1000)}')
+    return conn
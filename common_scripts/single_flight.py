@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+同じURLの同時抽出をまとめる (シングルフライト)
+
+関連するキーワードを処理する複数のワークスペースは、同じURLの抽出を数秒違いで始めることが
+よくあります。ここでは共有状態ディレクトリにURLごとのリースファイルを作成し、最初に作成できた
+ワーカーだけが抽出を行い、ほかのワーカーはその結果ファイルが書き出されるのを待って同じ結果を
+使います。リースを持ったまま落ちたプロセス（同じマシンで存在しないプロセス、または
+stale_seconds を過ぎたリース）は無効とみなし、待っていたワーカーが引き継ぎます。
+"""
+
+import hashlib
+import json
+import os
+import socket
+import threading
+import time
+
+import shared_state
+from extraction_cache import normalize_url
+
+# リースファイルと結果ファイルを置くディレクトリ（共有状態ディレクトリ内）
+INFLIGHT_DIR_NAME = 'inflight'
+
+# config.ini のセクション名と既定値
+CONFIG_SECTION = 'SINGLE_FLIGHT'
+DEFAULT_STALE_SECONDS = 600   # これより古いリースは無効とみなす（URLごとの処理時間の上限より長くする）
+DEFAULT_POLL_INTERVAL = 0.5   # 結果を待つときの確認間隔（秒）
+
+# 結果ファイルを待っているワーカーが使う、結果ファイルの最大の経過秒数
+RESULT_TTL = 60
+# 取得がこの件数に達するごとに古い結果ファイルを削除する
+SWEEP_INTERVAL = 100
+
+# このプロセスでリースを作成した回数
+_claims = 0
+
+
+def read_config(config):
+    """
+    config.ini の [SINGLE_FLIGHT] から設定を読み込む
+
+    Parameters:
+    config (ConfigParser): 読み込み済みの設定
+
+    Returns:
+    dict: 設定（acquire に渡す）
+    """
+    settings = {'enabled': True, 'stale_seconds': DEFAULT_STALE_SECONDS, 'poll_interval': DEFAULT_POLL_INTERVAL}
+    if config.has_section(CONFIG_SECTION):
+        settings['enabled'] = config.getboolean(CONFIG_SECTION, 'enabled', fallback=True)
+        settings['stale_seconds'] = config.getfloat(CONFIG_SECTION, 'stale_seconds', fallback=DEFAULT_STALE_SECONDS)
+        settings['poll_interval'] = config.getfloat(CONFIG_SECTION, 'poll_interval', fallback=DEFAULT_POLL_INTERVAL)
+    return settings
+
+
+def _inflight_dir():
+    path = os.path.join(shared_state.get_state_dir(), INFLIGHT_DIR_NAME)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _paths(url):
+    """正規化したURLのリースファイルと結果ファイルのパスを返す"""
+    key = hashlib.sha1(normalize_url(url).encode('utf-8')).hexdigest()
+    base = os.path.join(_inflight_dir(), key)
+    return f"{base}.lease", f"{base}.result"
+
+
+def _pid_alive(pid):
+    """同じマシンのプロセスが存在するか (POSIX以外では確認できないため常にTrue)"""
+    if os.name != 'posix':
+        # (Windows の os.kill はシグナル0でもプロセスを終了させるため使わない)
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _is_stale(lease_path, stale_seconds):
+    """リースが無効か（作成したプロセスが落ちた、または stale_seconds を過ぎた）"""
+    try:
+        with open(lease_path, encoding='utf-8') as f:
+            lease = json.load(f)
+    except FileNotFoundError:
+        return False
+    except (OSError, ValueError):
+        # 書き込み途中のリースは作成時刻で判断する
+        try:
+            return time.time() - os.path.getmtime(lease_path) > stale_seconds
+        except OSError:
+            return False
+    if time.time() - lease.get('started', 0) > stale_seconds:
+        return True
+    return lease.get('hostname') == socket.gethostname() and not _pid_alive(lease.get('pid', 0))
+
+
+def _take_over(lease_path, stale_seconds):
+    """
+    無効なリースを引き継ぐ（引き継げた場合True）
+
+    無効と判定してから削除するまでの間に、先に引き継いだ別のワーカーが新しいリースを作成していることがある。
+    リースを一意な名前に変更し（変更できるのは1つのワーカーだけ）、変更したファイルで改めて判定する。
+    """
+    taken_path = f"{lease_path}.{socket.gethostname()}.{os.getpid()}.{threading.get_ident()}.stale"
+    try:
+        os.rename(lease_path, taken_path)
+    except FileNotFoundError:
+        # ほかのワーカーが先に引き継いだ、または抽出が終わって解放された
+        return False
+    if _is_stale(taken_path, stale_seconds):
+        os.remove(taken_path)
+        return True
+    # 先に引き継いだワーカーの新しいリースだったので戻す（その間に作成されたリースは上書きしない）
+    try:
+        os.link(taken_path, lease_path)
+    except FileExistsError:
+        pass
+    os.remove(taken_path)
+    return False
+
+
+def _try_claim(lease_path, result_path):
+    """リースファイルを作成する（作成できなければFalse）"""
+    global _claims
+    try:
+        fd = os.open(lease_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        return False
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump({'pid': os.getpid(), 'hostname': socket.gethostname(), 'started': time.time()}, f)
+    # 前回の結果ファイルを待っているワーカーが使わないよう削除する
+    try:
+        os.remove(result_path)
+    except FileNotFoundError:
+        pass
+    _claims += 1
+    if _claims % SWEEP_INTERVAL == 1:
+        sweep()
+    return True
+
+
+def _read_result(result_path):
+    """結果ファイル (抽出テキスト, 抽出方法) を返す（ない場合・古い場合はNone）"""
+    try:
+        if time.time() - os.path.getmtime(result_path) > RESULT_TTL:
+            return None
+        with open(result_path, encoding='utf-8') as f:
+            result = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return result['text'], result['tier']
+
+
+class Lease:
+    """URLの抽出を担当するリース（release で結果を公開して解放する）"""
+
+    def __init__(self, url, lease_path, result_path):
+        self.url = url
+        self.lease_path = lease_path
+        self.result_path = result_path
+
+    def release(self, result=None):
+        """
+        結果ファイルを書き出してからリースを解放する
+
+        Parameters:
+        result (tuple): 待っているワーカーに渡す (抽出テキスト, 抽出方法)（Noneの場合は渡さず、待っている側が抽出する）
+        """
+        try:
+            if result is not None:
+                tmp_path = f"{self.result_path}.{os.getpid()}.tmp"
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump({'url': self.url, 'text': result[0], 'tier': result[1]}, f, ensure_ascii=False)
+                os.replace(tmp_path, self.result_path)
+            os.remove(self.lease_path)
+        except OSError as e:
+            print(f"同時抽出のリースを解放できませんでした (期限切れで自動的に解放されます): {self.url} - {e}")
+
+
+def acquire(url, settings):
+    """
+    URLの抽出を担当するか、ほかのワーカーが抽出中ならその結果を待つ
+
+    Parameters:
+    url (str): 抽出するURL
+    settings (dict): read_config() が返した設定
+
+    Returns:
+    tuple: (Lease, None) 担当する場合（無効の場合・リースを作成できない場合は (None, None)）
+           (None, (抽出テキスト, 抽出方法)) ほかのワーカーの結果を使う場合
+    """
+    if not settings or not settings.get('enabled'):
+        return None, None
+    try:
+        lease_path, result_path = _paths(url)
+        announced = False
+        while True:
+            if _try_claim(lease_path, result_path):
+                return Lease(url, lease_path, result_path), None
+            if not announced:
+                print(f"ほかのワーカーが抽出中のため、結果を待ちます: {url}")
+                announced = True
+            while os.path.exists(lease_path):
+                if _is_stale(lease_path, settings['stale_seconds']):
+                    if _take_over(lease_path, settings['stale_seconds']):
+                        print(f"抽出中のワーカーが応答しないため、リースを引き継ぎます: {url}")
+                    # (引き継げなかった場合は、新しいリースを作成したワーカーの結果を待つ)
+                    break
+                time.sleep(settings['poll_interval'])
+            else:
+                result = _read_result(result_path)
+                if result is not None:
+                    return None, result
+                # 担当していたワーカーが結果を渡さずに終わった場合は自分で抽出する
+    except OSError as e:
+        print(f"同時抽出のリースを確認できませんでした。そのまま抽出します: {url} - {e}")
+        return None, None
+
+
+def release(lease, result=None):
+    """acquire で取得したリースを解放する（Noneなら何もしない）"""
+    if lease is not None:
+        lease.release(result)
+
+
+def sweep():
+    """古い結果ファイルと書き込み途中のまま残ったファイルを削除する"""
+    now = time.time()
+    directory = _inflight_dir()
+    for name in os.listdir(directory):
+        if name.endswith(('.lease', '.stale')):
+            # (引き継ぎ中のリースは作成時刻が古くても削除しない)
+            continue
+        path = os.path.join(directory, name)
+        try:
+            if now - os.path.getmtime(path) > RESULT_TTL:
+                os.remove(path)
+        except OSError:
+            pass
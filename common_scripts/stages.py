@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+キーワード処理の各段階を関数として呼び出すためのAPI
+
+start.py はこれまで段階ごとに新しいPythonプロセスを起動していましたが、
+ここでは各段階（検索・抽出・統合・納品）を関数として公開し、1つのプロセス内で
+続けて実行できるようにします。selenium などの重いモジュールは最初の呼び出し時に
+1度だけ読み込まれます。従来の各スクリプトはCLIラッパーとしてそのまま使えます。
+"""
+
+import json
+import os
+
+import shared_state
+
+# 各段階の成果物（作業フォルダーからの相対パス）
+GOOGLE_URLS_FILE = os.path.join('urls', 'google_urls.txt')
+YAHOO_URLS_FILE = os.path.join('urls', 'yahoo_urls.txt')
+GOOGLE_EXTRACTED_FILE = os.path.join('outputs', 'google_urls_extracted.txt')
+YAHOO_EXTRACTED_FILE = os.path.join('outputs', 'yahoo_urls_extracted.txt')
+INTEGRATED_TEXT_FILE = os.path.join('Integrated_Text', 'Integrated_Text.txt')
+
+# 抽出結果ファイルの隣に保存する抽出統計 (URL数・所要時間・抽出方法ごとの件数) の拡張子
+EXTRACTION_STATS_SUFFIX = '.stats.json'
+# 抽出結果ファイルの隣に置く、完了したURLの結果のジャーナル（出力ファイルを書き出したら削除する）
+EXTRACTION_JOURNAL_SUFFIX = '.journal.jsonl'
+
+# 抽出器はプロセス内で使い回す (設定ごとに1つ)
+_extractors = {}
+
+
+def extraction_stats_path(output_path):
+    """抽出結果ファイルに対応する抽出統計ファイルのパスを返す"""
+    return os.path.splitext(output_path)[0] + EXTRACTION_STATS_SUFFIX
+
+
+def extraction_journal_path(output_path):
+    """抽出結果ファイルに対応するジャーナルファイルのパスを返す"""
+    return os.path.splitext(output_path)[0] + EXTRACTION_JOURNAL_SUFFIX
+
+
+def write_extraction_stats(output_path, stats):
+    """抽出統計を抽出結果ファイルの隣に保存する"""
+    with open(extraction_stats_path(output_path), 'w', encoding='utf-8') as f:
+        json.dump(stats, f, ensure_ascii=False)
+
+
+def read_extraction_stats(output_path):
+    """抽出統計を読み込む（ファイルがない・壊れている場合はNone）"""
+    try:
+        with open(extraction_stats_path(output_path), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def search_google(google_url):
+    """
+    Google検索結果ページからURLを収集する（urls/google_urls.txt にも保存される）
+
+    Returns:
+    list: 収集したURLのリスト（エラー時はNone）
+    """
+    from google_url_serch import integrated_google_search
+    return integrated_google_search(google_url)
+
+
+def search_yahoo(yahoo_url):
+    """
+    Yahoo検索結果ページからURLを収集する（urls/yahoo_urls.txt にも保存される）
+
+    Returns:
+    list: 収集したURLのリスト（エラー時はNone）
+    """
+    from yahoo_url_search import integrated_yahoo_search
+    return integrated_yahoo_search(yahoo_url)
+
+
+def get_extractor(output_dir='outputs', num_workers=None, cpu_ratio=None):
+    """
+    設定ごとに1つの WebTextExtractor を作成して使い回す
+
+    Returns:
+    WebTextExtractor: 抽出器
+    """
+    key = (output_dir, num_workers, cpu_ratio)
+    if key not in _extractors:
+        from web_text_extractor import WebTextExtractor
+        _extractors[key] = WebTextExtractor(output_dir=output_dir, num_workers=num_workers, cpu_ratio=cpu_ratio)
+    return _extractors[key]
+
+
+def extract(urls, num_workers=None, cpu_ratio=None):
+    """
+    URLのリストからテキストを抽出する
+
+    Parameters:
+    urls (list): 抽出するURLのリスト
+    num_workers (int): 並列処理数（Noneの場合はcpu_ratioから決定）
+    cpu_ratio (float): CPUコア数に対する使用率
+
+    Returns:
+    list: (URL, 抽出テキスト) のリスト（入力順）
+    """
+    return get_extractor(num_workers=num_workers, cpu_ratio=cpu_ratio).extract_texts(list(urls))
+
+
+def extract_files(url_files, output_dir='outputs', num_workers=None, cpu_ratio=None):
+    """
+    URLファイルごとにテキストを抽出し、outputs/*_extracted.txt に保存する
+
+    Returns:
+    tuple: (出力ファイルパスのリスト, 処理したURLの合計数)
+    """
+    from web_text_extractor import process_url_files
+    extractor = get_extractor(output_dir=output_dir, num_workers=num_workers, cpu_ratio=cpu_ratio)
+    return process_url_files(extractor, url_files)
+
+
+def integrate(google_file=GOOGLE_EXTRACTED_FILE, yahoo_file=YAHOO_EXTRACTED_FILE, output_file=INTEGRATED_TEXT_FILE):
+    """
+    Google・Yahooの抽出結果を統合する
+
+    Returns:
+    str: 統合テキストファイルのパス
+    """
+    from integrated import combine_files
+    return combine_files(google_file, yahoo_file, output_file)
+
+
+def deliver(keyword, integrated_text_path=INTEGRATED_TEXT_FILE, delivery_folder=None):
+    """
+    統合テキストをキーワードの納品ファイルに書き込み、completed_folder に移動する
+
+    Parameters:
+    keyword (str): delivery_folder 内のファイル名（拡張子なし）
+    integrated_text_path (str): 統合テキストファイル
+    delivery_folder (str): 納品フォルダー（Noneの場合は既定の delivery_folder）
+
+    Returns:
+    str: 移動後の納品ファイルのパス
+    """
+    from update_delivery_file import deliver as deliver_file
+    delivery_folder = delivery_folder or shared_state.get_delivery_folder()
+    target_filepath = os.path.join(delivery_folder, f"{keyword}.txt")
+    if not os.path.isfile(target_filepath):
+        raise FileNotFoundError(target_filepath)
+    return deliver_file(target_filepath, os.path.abspath(integrated_text_path), delivery_folder)
+
+
+def run_keyword(keyword, google_url, yahoo_url, cpu_ratio=None, delivery_folder=None):
+    """
+    1つのキーワードの全段階を現在のプロセス内で実行する（作業フォルダーで実行すること）
+
+    Returns:
+    str: 納品ファイルのパス（途中で失敗した場合はNone）
+    """
+    if search_google(google_url) is None:
+        print("エラー: Google検索の段階に失敗しました。")
+        return None
+    if search_yahoo(yahoo_url) is None:
+        print("エラー: Yahoo検索の段階に失敗しました。")
+        return None
+    extract_files([GOOGLE_URLS_FILE, YAHOO_URLS_FILE], cpu_ratio=cpu_ratio)
+    integrated_text_path = integrate()
+    return deliver(keyword, integrated_text_path, delivery_folder)
@@ -3,6 +3,24 @@ import configparser
 import subprocess
 import sys
 import glob
+import time
+import argparse
+
+import cpu_affinity
+import job_ledger
+import shared_state
+import stages
+from stages import GOOGLE_URLS_FILE, YAHOO_URLS_FILE, INTEGRATED_TEXT_FILE
+
+# 抽出段階で処理するURLファイル
+EXTRACT_URL_FILES = [GOOGLE_URLS_FILE, YAHOO_URLS_FILE]
+# テキスト抽出スクリプト
+EXTRACTOR_SCRIPT_NAME = 'web_text_extractor.py'
+
+# --stages で指定できる段階のまとまり
+STAGES_ALL = 'all'
+STAGES_SEARCH = 'search'  # Google/Yahoo検索 (ブラウザ・CAPTCHAの影響を受ける段階)
+STAGES_EXTRACT = 'extract'  # テキスト抽出・統合・納品 (ネットワーク中心の段階)
 
 # Check if psutil is installed, if not use fallback mode
 try:
@@ -41,11 +59,9 @@ def find_urls_in_file(filepath):
         print(f"エラー: ファイル '{filepath}' の読み込み中にエラーが発生しました: {e}", file=sys.stderr)
         return None, None
 
-def get_urls_from_keyword_in_delivery_folder():
+def get_urls_from_keyword_in_delivery_folder(received_keyword=None):
     """ユーザーから検索キーワードを取得し、delivery_folderから対応するファイルのURLを取得する"""
-    received_keyword = None
-    if len(sys.argv) > 1:
-        received_keyword = sys.argv[1]
+    if received_keyword:
         print(f"コマンドライン引数からキーワード '{received_keyword}' を受け取りました。")
 
     if received_keyword:
@@ -57,21 +73,22 @@ def get_urls_from_keyword_in_delivery_folder():
         print("エラー: キーワードが入力されていません。", file=sys.stderr)
         sys.exit(1)
 
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    # start.pyから見て1つ上の階層のdelivery_folderを指定
-    delivery_folder = os.path.join(script_dir, "..", "delivery_folder")
+    # start.pyから見て1つ上の階層のdelivery_folderを指定 (環境変数で上書き可能)
+    delivery_folder = shared_state.get_delivery_folder()
 
     if not os.path.isdir(delivery_folder):
         print(f"エラー: '{delivery_folder}' フォルダが見つかりません。スクリプトと同じ階層に作成してください。", file=sys.stderr)
         sys.exit(1)
 
-    found_file_path = None
-
-    for filename in os.listdir(delivery_folder):
-        name_without_ext, ext = os.path.splitext(filename)
-        if keyword == name_without_ext and ext.lower() == ".txt":
-            found_file_path = os.path.join(delivery_folder, filename)
-            break
+    # キーワードのファイルを直接開く (フォルダー全体の走査は拡張子が大文字の場合のみ)
+    found_file_path = os.path.join(delivery_folder, f"{keyword}.txt")
+    if not os.path.isfile(found_file_path):
+        found_file_path = None
+        for filename in os.listdir(delivery_folder):
+            name_without_ext, ext = os.path.splitext(filename)
+            if keyword == name_without_ext and ext.lower() == ".txt":
+                found_file_path = os.path.join(delivery_folder, filename)
+                break
     
     if not found_file_path:
         print(f"エラー: キーワード '{keyword}' に一致するテキストファイルが '{delivery_folder}' フォルダ内に見つかりません。", file=sys.stderr)
@@ -187,8 +204,8 @@ def run_yahoo_search_script(config):
     return run_script('yahoo_url_search.py', yahoo_url)
 
 def run_extractor_script():
-    """web_text_extractor_ver1.5.pyを実行する"""
-    return run_script('web_text_extractor_ver1.5.py')
+    """web_text_extractor.pyを実行する"""
+    return run_script(EXTRACTOR_SCRIPT_NAME)
 
 def run_integrated_script():
     """integrated.pyを実行する"""
@@ -201,6 +218,38 @@ def run_update_delivery_script(keyword):
         return False
     return run_script('update_delivery_file.py', keyword)
 
+def run_in_process(stage_name, func, *func_args):
+    """
+    段階の関数を現在のプロセス内で実行する（--in-process 用）
+
+    Parameters:
+    stage_name (str): 表示用の段階名
+    func (callable): stages モジュールの段階関数（失敗時はNoneを返すか例外を送出する）
+    func_args: 段階関数に渡す引数
+
+    Returns:
+    bool: 成功した場合True
+    """
+    print(f"\n--- {stage_name} をプロセス内で実行します ---")
+    try:
+        result = func(*func_args)
+    except Exception as e:
+        print(f"エラー: {stage_name} の実行中にエラーが発生しました: {e}", file=sys.stderr)
+        return False
+    if result is None:
+        print(f"エラー: {stage_name} が結果を返しませんでした。", file=sys.stderr)
+        return False
+    print(f"\n--- {stage_name} の実行が完了しました ---")
+    return True
+
+def get_config_url(config, option):
+    """config.ini の [URLs] からURLを読み込む（見つからなければNone）"""
+    try:
+        return config.get('URLs', option)
+    except (configparser.NoSectionError, configparser.NoOptionError):
+        print(f"エラー: config.ini に [URLs] セクションまたは {option} が見つかりません。", file=sys.stderr)
+        return None
+
 def cleanup_previous_files():
     """前回の処理で残った出力ファイルをクリーンアップする"""
     cleanup_folders = ['outputs', 'urls', 'Integrated_Text']
@@ -213,8 +262,9 @@ def cleanup_previous_files():
             print(f"  フォルダー '{folder}' が存在しないため、スキップします。")
             continue
             
-        # フォルダー内の.txtファイルを検索
-        txt_files = glob.glob(os.path.join(folder, "*.txt"))
+        # フォルダー内の.txtファイル（と抽出統計ファイル・抽出結果のジャーナル）を検索
+        txt_files = (glob.glob(os.path.join(folder, "*.txt")) + glob.glob(os.path.join(folder, "*" + stages.EXTRACTION_STATS_SUFFIX))
+                     + glob.glob(os.path.join(folder, "*" + stages.EXTRACTION_JOURNAL_SUFFIX)))
         
         if not txt_files:
             print(f"  フォルダー '{folder}' 内に.txtファイルが見つかりません。")
@@ -236,13 +286,58 @@ def cleanup_previous_files():
     print(f"クリーンアップ完了: 合計 {total_deleted} 個のファイルを削除しました。")
     return True
 
-def run_script_with_cpu_limit(script_name, cpu_percent_ratio):
+def get_limited_cpu_list(cpu_percent_ratio):
+    """
+    CPU割合から使用するCPUのリストを決める
+
+    run_all_starts.py から環境変数 WEBTEXT_CPU_SET でコアが割り当てられている場合は、
+    その集合に対して割合を適用する（同時実行中の他の作業フォルダーとコアが重ならない）。
+
+    Returns:
+    tuple: (CPUアフィニティのリスト, 対象のCPU数)。決定できない場合は (None, None)
+    """
+    allotted_cpus = cpu_affinity.cpu_set_from_env()
+    if allotted_cpus:
+        print(f"割り当てられたCPU: {cpu_affinity.format_cpu_list(allotted_cpus)} ({cpu_affinity.CPU_SET_ENV})")
+        base_cpus = allotted_cpus
+    else:
+        # Calculate number of CPUs to use
+        num_cpus_total = psutil.cpu_count(logical=True)
+        if not num_cpus_total:
+            return None, None
+        base_cpus = list(range(num_cpus_total))
+
+    cpus_to_use_calculated = max(1, int(len(base_cpus) * cpu_percent_ratio))
+    # Create CPU affinity list (which CPUs to use)
+    return base_cpus[:cpus_to_use_calculated], len(base_cpus)
+
+def limit_current_process_cpu(cpu_percent_ratio):
+    """
+    現在のプロセスにCPUアフィニティを設定する（--in-process 用）
+
+    抽出のワーカープロセスは親プロセスのアフィニティを引き継ぎます。
+    """
+    if not PSUTIL_AVAILABLE:
+        print("psutilが利用できないため、CPU制限なしで抽出を実行します。")
+        return
+    cpu_list, num_cpus_total = get_limited_cpu_list(cpu_percent_ratio)
+    if not cpu_list:
+        print("警告: 使用するCPUを決定できませんでした。CPU制限なしで抽出を実行します。", file=sys.stderr)
+        return
+    try:
+        psutil.Process().cpu_affinity(cpu_list)
+        print(f"抽出を {len(cpu_list)}/{num_cpus_total} CPU(s) に制限して実行します (CPU: {cpu_affinity.format_cpu_list(cpu_list)}, 指定CPU割合: {cpu_percent_ratio*100:.0f}%)")
+    except (psutil.AccessDenied, AttributeError, OSError) as e:
+        print(f"警告: CPUアフィニティの設定に失敗しました: {e}。CPU制限は適用されません。", file=sys.stderr)
+
+def run_script_with_cpu_limit(script_name, cpu_percent_ratio, *script_args):
     """
     Run a Python script with limited CPU usage.
     
     Args:
         script_name: Name of the Python script to run (in common_scripts)
         cpu_percent_ratio: Percentage of CPU cores to use (0.0 to 1.0)
+        script_args: Extra command line arguments passed to the script
     """
     # 共通スクリプトのパスを取得
     script_dir = os.path.dirname(os.path.abspath(__file__))
@@ -256,32 +351,21 @@ def run_script_with_cpu_limit(script_name, cpu_percent_ratio):
     # If psutil is not available, use regular run_script
     if not PSUTIL_AVAILABLE:
         print(f"psutilが利用できないため、CPU制限なしで {script_name} を実行します。")
-        return run_script(script_name)
+        return run_script(script_name, *script_args)
     
-    # Calculate number of CPUs to use
-    num_cpus_total = psutil.cpu_count(logical=True)
-    if num_cpus_total is None:
-        print("警告: 利用可能なCPU数を取得できませんでした。CPU制限なしでスクリプトを実行します。", file=sys.stderr)
-        return run_script(script_path)
-
-
-    cpus_to_use_calculated = max(1, int(num_cpus_total * cpu_percent_ratio))
-    
-    # Create CPU affinity list (which CPUs to use)
-    cpu_list = list(range(min(cpus_to_use_calculated, num_cpus_total)))
-
-    if not cpu_list: # Should not happen if num_cpus_total is valid and > 0
-        print("警告: CPUリストが空のため、CPU制限なしで実行します。", file=sys.stderr)
-        return run_script(script_name)
+    cpu_list, num_cpus_total = get_limited_cpu_list(cpu_percent_ratio)
+    if not cpu_list:
+        print("警告: 使用するCPUを決定できませんでした。CPU制限なしでスクリプトを実行します。", file=sys.stderr)
+        return run_script(script_name, *script_args)
     
-    print(f"実行中: {script_name} を {len(cpu_list)}/{num_cpus_total} CPU(s) を使用して実行 (指定CPU割合: {cpu_percent_ratio*100:.0f}%)")
+    print(f"実行中: {script_name} を {len(cpu_list)}/{num_cpus_total} CPU(s) を使用して実行 (CPU: {cpu_affinity.format_cpu_list(cpu_list)}, 指定CPU割合: {cpu_percent_ratio*100:.0f}%)")
     
     process = None
     try:
         # Start the process
         # 現在のワーキングディレクトリ（各WebText_extractionフォルダ）で実行
         current_cwd = os.getcwd()
-        process = subprocess.Popen([sys.executable, script_path], cwd=current_cwd)
+        process = subprocess.Popen([sys.executable, script_path] + list(script_args), cwd=current_cwd)
         
         # Get process handle and set affinity
         try:
@@ -310,16 +394,138 @@ def run_script_with_cpu_limit(script_name, cpu_percent_ratio):
         print(f"プロセス {pid_info} の実行または待機中に予期せぬエラーが発生しました: {e_popen}", file=sys.stderr)
         return False
 
-def main():
+def run_stage(ledger, keyword, stage, func, artifacts=()):
+    """
+    ジョブ台帳で完了済みの段階はスキップし、それ以外は実行して結果を台帳に記録する
+
+    Parameters:
+    ledger (JobLedger): ジョブ台帳
+    keyword (str): 処理中のキーワード
+    stage (str): 段階名
+    func (callable): 段階の処理（成功時にTrueを返す）
+    artifacts (tuple): 段階の成果物ファイル。再開時に1つでも欠けていれば段階を再実行する
+
+    Returns:
+    bool: 段階が成功（またはスキップ）した場合True
+    """
+    if ledger.is_stage_done(keyword, stage) and all(os.path.exists(path) for path in artifacts):
+        print(f"--- {stage} は前回の実行で完了済みのためスキップします ---")
+        return True
+
+    ledger.mark_stage_started(keyword, stage)
+    started = time.time()
+    success = func()
+    if success:
+        detail = {'seconds': round(time.time() - started, 3)}
+        ledger.mark_stage_done(keyword, stage, detail)
+    else:
+        ledger.mark_stage_failed(keyword, stage, f"{stage} の実行に失敗しました")
+    return success
+
+def count_lines(filepath):
+    """ファイル内の空でない行数を返す（ファイルがなければ0）"""
+    if not os.path.exists(filepath):
+        return 0
+    with open(filepath, 'r', encoding='utf-8') as f:
+        return sum(1 for line in f if line.strip())
+
+def run_extraction_stages(ledger, keyword, cpu_ratio, in_process=False):
+    """
+    URLファイルごとの抽出段階のうち未完了のものだけを抽出スクリプトに渡して実行する
+
+    Parameters:
+    in_process (bool): Trueの場合は抽出スクリプトを起動せず、現在のプロセス内で抽出する
+
+    Returns:
+    bool: 抽出スクリプトが成功した（または全て完了済みの）場合True
+    """
+    pending = []
+    for url_file in EXTRACT_URL_FILES:
+        stage = job_ledger.extract_stage(os.path.basename(url_file))
+        output_file = extracted_output_path(url_file)
+        if ledger.is_stage_done(keyword, stage) and os.path.exists(output_file):
+            print(f"--- {stage} は前回の実行で完了済みのためスキップします ---")
+            continue
+        pending.append(url_file)
+
+    if not pending:
+        return True
+
+    for url_file in pending:
+        ledger.mark_stage_started(keyword, job_ledger.extract_stage(os.path.basename(url_file)))
+
+    started = time.time()
+    if in_process:
+        limit_current_process_cpu(cpu_ratio)
+        success = run_in_process('テキスト抽出', stages.extract_files, pending, 'outputs', None, cpu_ratio)
+    else:
+        print(f"\n--- {EXTRACTOR_SCRIPT_NAME} をCPU制限付きで実行します ---")
+        success = run_script_with_cpu_limit(EXTRACTOR_SCRIPT_NAME, cpu_ratio, '--urls', *pending)
+    elapsed = round(time.time() - started, 3)
+
+    # 出力ファイルが作成されたURLファイルのみ完了として記録
+    for url_file in pending:
+        stage = job_ledger.extract_stage(os.path.basename(url_file))
+        output_file = extracted_output_path(url_file)
+        if success and os.path.exists(output_file):
+            # 抽出器が保存した統計 (抽出方法ごとの件数など) を台帳に記録する
+            detail = {'seconds': elapsed, 'urls': count_lines(url_file)}
+            detail.update(stages.read_extraction_stats(output_file) or {})
+            ledger.mark_stage_done(keyword, stage, detail)
+        else:
+            ledger.mark_stage_failed(keyword, stage, f"{url_file} の抽出結果が作成されませんでした")
+    return success
+
+def extracted_output_path(url_file):
+    """URLファイルに対応する抽出結果ファイルのパスを返す"""
+    return os.path.join('outputs', os.path.basename(url_file).replace('.txt', '_extracted.txt'))
+
+def parse_args(argv=None):
+    """コマンドライン引数を解析する（argvがNoneの場合は sys.argv を使用）"""
+    parser = argparse.ArgumentParser(description='キーワードのURL取得からテキスト抽出・納品までを実行します。')
+    parser.add_argument('keyword', nargs='?', default=None, help='delivery_folder 内のファイル名（拡張子なし）')
+    parser.add_argument('--fresh', action='store_true', help='ジョブ台帳の記録を無視して最初から処理する')
+    parser.add_argument('--stages', choices=[STAGES_ALL, STAGES_SEARCH, STAGES_EXTRACT], default=STAGES_ALL,
+                        help='実行する段階: all=全段階, search=Google/Yahoo検索のみ, extract=抽出・統合・納品のみ')
+    parser.add_argument('--in-process', action='store_true',
+                        help='段階ごとにスクリプトを起動せず、1つのプロセス内で全段階を実行する')
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    """
+    キーワードを処理する（run_all_starts.py の常駐ワーカーからは argv を渡して呼び出す）
+
+    Parameters:
+    argv (list): コマンドライン引数（Noneの場合は sys.argv を使用）
+    """
+    args = parse_args(argv)
+
     # 1. CPU使用率を1.0に固定
     cpu_ratio = 1.0
     print(f"CPU使用率を {cpu_ratio*100:.0f}% に設定します。")
     
     # 2. キーワードからURLを取得
-    google_url, yahoo_url, keyword = get_urls_from_keyword_in_delivery_folder()
-
-    # 2.5. 前回の処理ファイルをクリーンアップ
-    cleanup_previous_files()
+    google_url, yahoo_url, keyword = get_urls_from_keyword_in_delivery_folder(args.keyword)
+
+    # 2.5. ジョブ台帳を確認し、同じ作業フォルダーで途中まで完了していれば再開する
+    ledger = job_ledger.JobLedger()
+    workspace = os.path.realpath(os.getcwd())
+    job = ledger.get_job(keyword)
+    resume = (not args.fresh and job is not None and job['state'] != job_ledger.JOB_DONE
+              and job['workspace'] == workspace and ledger.get_stages(keyword))
+    if resume:
+        print(f"ジョブ台帳の記録から '{keyword}' の処理を再開します (前回までの試行回数: {job['attempts']})。")
+    elif args.stages == STAGES_EXTRACT:
+        # 抽出段階のみの実行には、この作業フォルダーで検索段階が完了している必要がある
+        print(f"エラー: '{keyword}' の検索段階がこの作業フォルダー ({workspace}) で完了していません。", file=sys.stderr)
+        sys.exit(1)
+    else:
+        ledger.reset_job(keyword)
+    # (ファイルを消す前に作業フォルダーを記録し、このフォルダーで中断したほかのキーワードを再開の対象から外す)
+    ledger.start_job(keyword, workspace)
+    if not resume:
+        # 前回の処理ファイルをクリーンアップ
+        cleanup_previous_files()
 
     # 3. config.ini を作成/更新
     create_config_ini(cpu_ratio, google_url, yahoo_url)
@@ -331,9 +537,10 @@ def main():
         config.read('config.ini', encoding='utf-8')
     except configparser.Error as e:
         print(f"エラー: config.ini の読み込みに失敗しました: {e}", file=sys.stderr)
+        ledger.finish_job(keyword, job_ledger.JOB_FAILED)
         sys.exit(1)
     
-    # web_text_extractor_ver1.5.py をCPU制限付きで実行するための準備
+    # web_text_extractor.py をCPU制限付きで実行するための準備
     try:
         cpu_limit_ratio_for_extractor = config.getfloat('Settings', 'cpu_ratio')
     except (configparser.NoSectionError, configparser.NoOptionError, ValueError) as e:
@@ -341,40 +548,66 @@ def main():
         cpu_limit_ratio_for_extractor = cpu_ratio # Fallback to the hardcoded cpu_ratio
 
 
-    # スクリプト実行のシーケンス
-    print("="*50)
-    if not run_google_search_script(config):
-        print(f"エラー: Google検索スクリプトの実行に失敗しました。処理を中断します。", file=sys.stderr)
-        sys.exit(1)
-    print("="*50 + "\n")
+    # 各段階の処理: --in-process の場合は stages モジュールの関数を直接呼び出す
+    if args.in_process:
+        google_url_config = get_config_url(config, 'google_search_url')
+        yahoo_url_config = get_config_url(config, 'yahoo_search_url')
+        google_search = lambda: google_url_config is not None and run_in_process('Google検索', stages.search_google, google_url_config)
+        yahoo_search = lambda: yahoo_url_config is not None and run_in_process('Yahoo検索', stages.search_yahoo, yahoo_url_config)
+        integrate = lambda: run_in_process('統合', stages.integrate)
+        deliver = lambda: run_in_process('納品', stages.deliver, keyword)
+    else:
+        google_search = lambda: run_google_search_script(config)
+        yahoo_search = lambda: run_yahoo_search_script(config)
+        integrate = run_integrated_script # integrated.py takes no arguments
+        deliver = lambda: run_update_delivery_script(keyword)
 
-    print("="*50)
-    if not run_yahoo_search_script(config):
-        print(f"エラー: Yahoo検索スクリプトの実行に失敗しました。処理を中断します。", file=sys.stderr)
-        sys.exit(1)
-    print("="*50 + "\n")
+    # スクリプト実行のシーケンス
+    if args.stages in (STAGES_ALL, STAGES_SEARCH):
+        print("="*50)
+        if not run_stage(ledger, keyword, job_ledger.STAGE_GOOGLE_SERP,
+                         google_search, artifacts=(GOOGLE_URLS_FILE,)):
+            print(f"エラー: Google検索スクリプトの実行に失敗しました。処理を中断します。", file=sys.stderr)
+            ledger.finish_job(keyword, job_ledger.JOB_FAILED)
+            sys.exit(1)
+        print("="*50 + "\n")
+
+        print("="*50)
+        if not run_stage(ledger, keyword, job_ledger.STAGE_YAHOO_SERP,
+                         yahoo_search, artifacts=(YAHOO_URLS_FILE,)):
+            print(f"エラー: Yahoo検索スクリプトの実行に失敗しました。処理を中断します。", file=sys.stderr)
+            ledger.finish_job(keyword, job_ledger.JOB_FAILED)
+            sys.exit(1)
+        print("="*50 + "\n")
+
+        if args.stages == STAGES_SEARCH:
+            print("\n検索段階の処理が完了しました。抽出段階は --stages extract で実行してください。")
+            return
 
     print("="*50)
-    extractor_script_name = 'web_text_extractor_ver1.5.py'
-    print(f"\n--- {extractor_script_name} をCPU制限付きで実行します ---")
-    if not run_script_with_cpu_limit(extractor_script_name, cpu_limit_ratio_for_extractor):
-        print(f"エラー: {extractor_script_name} の実行に失敗しました。処理を中断します。", file=sys.stderr)
+    if not run_extraction_stages(ledger, keyword, cpu_limit_ratio_for_extractor, in_process=args.in_process):
+        print(f"エラー: テキスト抽出の実行に失敗しました。処理を中断します。", file=sys.stderr)
+        ledger.finish_job(keyword, job_ledger.JOB_FAILED)
         sys.exit(1)
     # Completion message is in run_script_with_cpu_limit
     print("="*50 + "\n")
 
     print("="*50)
-    if not run_integrated_script(): # integrated.py takes no arguments
+    if not run_stage(ledger, keyword, job_ledger.STAGE_INTEGRATE,
+                     integrate, artifacts=(INTEGRATED_TEXT_FILE,)):
         print(f"エラー: 統合スクリプトの実行に失敗しました。処理を中断します。", file=sys.stderr)
+        ledger.finish_job(keyword, job_ledger.JOB_FAILED)
         sys.exit(1)
     print("="*50 + "\n")
 
     print("="*50)
-    print(f"\n--- update_delivery_file.py を実行します ---")
-    if not run_update_delivery_script(keyword):
-        print(f"エラー: update_delivery_file.py の実行に失敗しました。", file=sys.stderr)
+    print(f"\n--- 納品処理を実行します ---")
+    if not run_stage(ledger, keyword, job_ledger.STAGE_DELIVER, deliver):
+        print(f"エラー: 納品処理に失敗しました。", file=sys.stderr)
+        ledger.finish_job(keyword, job_ledger.JOB_FAILED)
     else:
-        print(f"--- update_delivery_file.py の実行が完了しました ---")
+        print(f"--- 納品処理が完了しました ---")
+        ledger.finish_job(keyword, job_ledger.JOB_DONE)
     print("="*50 + "\n")
 
     print("\n全ての処理が正常に完了しました。")
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+処理状況のテレメトリ（スループット・段階ごとの所要時間・抽出方法ごとの成功率・ETA）
+
+ジョブ台帳に記録された段階の開始・終了時刻と抽出統計から指標を計算し、
+定期的に状態ファイル (JSON) へ書き出してコンソールに要約を表示します。
+"""
+
+import json
+import math
+import os
+import sqlite3
+import time
+
+import job_ledger
+import shared_state
+
+# 状態ファイル名（共有状態ディレクトリ内）
+STATUS_FILE_NAME = 'status.json'
+# 状態ファイルとコンソール要約の更新間隔（秒）
+DEFAULT_INTERVAL = 60
+# 状態ファイルに含める直近のキーワード数
+RECENT_KEYWORDS = 20
+# 抽出に失敗したことを示す抽出方法
+# ('negative' は以前の失敗の記録により抽出を省略したもの)
+FAILED_TIERS = ('failed', 'timeout', 'error', 'negative')
+
+
+def percentile(values, pct):
+    """値のリストのパーセンタイル（最近傍順位法）を返す（空の場合はNone）"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = math.ceil(pct / 100 * len(ordered))
+    return ordered[max(0, min(len(ordered), rank) - 1)]
+
+
+def stage_group(stage):
+    """URLファイルごとの抽出段階 (extract:xxx) を 'extract' にまとめる"""
+    if stage.startswith(job_ledger.STAGE_EXTRACT_PREFIX):
+        return 'extract'
+    return stage
+
+
+def _stage_seconds(stage):
+    """段階の所要時間（抽出段階は抽出器が計測したファイルごとの時間を優先）"""
+    detail = stage['detail'] or {}
+    if 'seconds' in detail:
+        return float(detail['seconds'])
+    return max(0.0, stage['finished_at'] - stage['started_at'])
+
+
+def collect_metrics(ledger, started_at, remaining, running, concurrency):
+    """
+    ジョブ台帳から今回の実行の指標を計算する
+
+    Parameters:
+    ledger (JobLedger): ジョブ台帳
+    started_at (float): 今回の実行の開始時刻 (time.time())
+    remaining (int): 未完了のキーワード数（実行中を含む）
+    running (int): 実行中のキーワード数
+    concurrency (int): 同時実行スロット数（完了実績がない場合のETA計算に使用）
+
+    Returns:
+    dict: 指標
+    """
+    now = time.time()
+    elapsed = max(now - started_at, 1e-6)
+
+    durations = {}
+    keywords = {}
+    tier_counts = {}
+    total_urls = 0
+    for stage in ledger.get_finished_stages(since=started_at):
+        group = stage_group(stage['stage'])
+        seconds = _stage_seconds(stage)
+        durations.setdefault(group, []).append(seconds)
+
+        record = keywords.setdefault(stage['keyword'], {'keyword': stage['keyword'], 'stages': {}, 'urls': 0})
+        record['stages'][group] = round(record['stages'].get(group, 0.0) + seconds, 3)
+        if group == 'extract':
+            detail = stage['detail'] or {}
+            record['urls'] += detail.get('urls', 0)
+            total_urls += detail.get('urls', 0)
+            for tier, count in (detail.get('tiers') or {}).items():
+                tier_counts[tier] = tier_counts.get(tier, 0) + count
+
+    done_jobs = ledger.get_jobs(job_ledger.JOB_DONE, since=started_at)
+    done_keywords = set(job['keyword'] for job in done_jobs)
+
+    stage_stats = {}
+    for group, values in durations.items():
+        stage_stats[group] = {
+            'count': len(values),
+            'p50': round(percentile(values, 50), 3),
+            'p95': round(percentile(values, 95), 3),
+            'mean': round(sum(values) / len(values), 3),
+        }
+
+    tier_total = sum(tier_counts.values())
+    tiers = {tier: {'urls': count, 'share': round(count / tier_total, 4)} for tier, count in sorted(tier_counts.items())}
+    succeeded = sum(count for tier, count in tier_counts.items() if tier not in FAILED_TIERS)
+
+    # ETA: 今回の完了実績があればその速度、なければ段階ごとの平均所要時間から見積もる
+    eta_seconds = None
+    if done_jobs:
+        eta_seconds = remaining / (len(done_jobs) / elapsed)
+    elif stage_stats and concurrency:
+        per_keyword = sum(stats['mean'] for stats in stage_stats.values())
+        eta_seconds = remaining * per_keyword / concurrency
+
+    recent = [dict(keywords[k], total_seconds=round(sum(keywords[k]['stages'].values()), 3))
+              for k in [job['keyword'] for job in done_jobs][-RECENT_KEYWORDS:] if k in keywords]
+
+    return {
+        'updated_at': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(now)),
+        'elapsed_seconds': round(elapsed, 1),
+        'completed': len(done_keywords),
+        'running': running,
+        'remaining': remaining,
+        'keywords_per_hour': round(len(done_jobs) / (elapsed / 3600), 2),
+        'urls_per_minute': round(total_urls / (elapsed / 60), 2),
+        'stages': stage_stats,
+        'extraction': {
+            'urls': tier_total,
+            'success_rate': round(succeeded / tier_total, 4) if tier_total else None,
+            'tiers': tiers,
+        },
+        'eta_seconds': round(eta_seconds, 1) if eta_seconds is not None else None,
+        'recent_keywords': recent,
+    }
+
+
+def write_status_file(metrics, path=None):
+    """指標を状態ファイルに書き出す（読み取り側が途中の内容を読まないよう置き換えで更新）"""
+    path = path or shared_state.get_state_path(STATUS_FILE_NAME)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(metrics, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+    return path
+
+
+def format_duration(seconds):
+    """秒数を「1時間02分03秒」形式にする"""
+    if seconds is None:
+        return '不明'
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, secs = divmod(rest, 60)
+    if hours:
+        return f"{hours}時間{minutes:02d}分{secs:02d}秒"
+    if minutes:
+        return f"{minutes}分{secs:02d}秒"
+    return f"{secs}秒"
+
+
+def print_summary(metrics):
+    """指標の要約をコンソールに表示する"""
+    print("\n----- 処理状況 -----")
+    print(f"完了: {metrics['completed']}件 / 実行中: {metrics['running']}件 / 残り: {metrics['remaining']}件"
+          f"  (経過: {format_duration(metrics['elapsed_seconds'])}, ETA: {format_duration(metrics['eta_seconds'])})")
+    print(f"スループット: {metrics['keywords_per_hour']:.1f} キーワード/時  {metrics['urls_per_minute']:.1f} URL/分")
+    for group, stats in metrics['stages'].items():
+        print(f"  {group:<12} 件数: {stats['count']:>4}  p50: {stats['p50']:>8.1f}秒  p95: {stats['p95']:>8.1f}秒")
+    extraction = metrics['extraction']
+    if extraction['urls']:
+        tiers = ', '.join(f"{tier} {info['share'] * 100:.1f}%" for tier, info in extraction['tiers'].items())
+        print(f"  抽出成功率: {extraction['success_rate'] * 100:.1f}% ({extraction['urls']} URL: {tiers})")
+
+
+class StatusReporter:
+    """一定間隔で指標を計算し、状態ファイルとコンソールに出力する"""
+
+    def __init__(self, ledger, concurrency, interval=DEFAULT_INTERVAL, status_path=None):
+        """
+        初期化メソッド
+
+        Parameters:
+        ledger (JobLedger): ジョブ台帳
+        concurrency (int): 同時実行スロット数
+        interval (float): 出力間隔（秒）。0以下の場合は最終出力のみ
+        status_path (str): 状態ファイルのパス（Noneの場合は共有状態ディレクトリの status.json）
+        """
+        self.ledger = ledger
+        self.concurrency = concurrency
+        self.interval = interval
+        self.status_path = status_path
+        self.started_at = time.time()
+        self.last_report = self.started_at
+
+    def maybe_report(self, remaining, running, force=False):
+        """前回の出力から interval 秒以上経過していれば（または force の場合）出力する"""
+        now = time.time()
+        if not force and (self.interval <= 0 or now - self.last_report < self.interval):
+            return None
+        self.last_report = now
+        try:
+            metrics = collect_metrics(self.ledger, self.started_at, remaining, running, self.concurrency)
+            write_status_file(metrics, self.status_path)
+        except (OSError, ValueError, sqlite3.Error) as e:
+            print(f"警告: 処理状況の集計に失敗しました: {e}")
+            return None
+        print_summary(metrics)
+        return metrics
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ドメインごとの実績に基づく抽出方法の順序の決定
+
+抽出器は Requests -> Selenium -> Jina AI Reader の順に試しますが、Requests では
+十分なテキストが取れないドメインでも毎回HTTP取得とSeleniumの起動を経てから
+Jina にたどり着きます。ここではドメインごと・抽出方法ごとの試行回数、成功回数、
+処理時間、テキストの長さを共有状態ディレクトリのSQLiteに記録し、
+「成功1回あたりの処理時間」が短い方法から試し、ほとんど成功しない方法は省略します。
+一定の割合で既定の順序をそのまま試し (探索)、実績を新しく保ちます。
+
+ヘッジ (競争実行) を有効にすると、最初の方法がドメインの処理時間の上位パーセンタイル
+（既定は p90）を過ぎても終わらない場合に次の方法を並行して始めます。そのために
+ドメインごと・方法ごとに直近の処理時間も記録します。
+"""
+
+import os
+import random
+import sqlite3
+import time
+from urllib.parse import urlparse
+
+import shared_state
+
+# 実績のデータベースファイル名（共有状態ディレクトリ内）
+PLANNER_DB_NAME = 'tier_stats.sqlite3'
+
+# 順序を決める抽出方法（既定の順序）
+TIER_REQUESTS = 'requests'
+TIER_SELENIUM = 'selenium'
+TIER_JINA = 'jina'
+DEFAULT_ORDER = [TIER_REQUESTS, TIER_SELENIUM, TIER_JINA]
+
+# 実績がないときに見込む処理時間（秒）。既定の順序と同じ並びになる値にしている
+PRIOR_SECONDS = {TIER_REQUESTS: 2.0, TIER_SELENIUM: 10.0, TIER_JINA: 15.0}
+
+# config.ini のセクション名と既定値
+CONFIG_SECTION = 'TIER_PLANNER'
+DEFAULT_EPSILON = 0.1       # 既定の順序で全方法を試す (探索する) 割合
+DEFAULT_MIN_ATTEMPTS = 5    # 省略を判断するのに必要な試行回数
+DEFAULT_DEAD_RATE = 0.1     # この成功率未満の方法は省略する
+DEFAULT_HEDGE_QUANTILE = 0.9  # ヘッジを始めるまでの待ち時間に使う処理時間のパーセンタイル
+DEFAULT_HEDGE_DELAY = 5.0     # 処理時間の記録が少ない場合のヘッジまでの待ち時間（秒）
+
+# ヘッジの待ち時間の計算に使う直近の処理時間の件数と、計算に必要な最小件数
+LATENCY_SAMPLES = 20
+MIN_LATENCY_SAMPLES = 5
+
+# 1つの方法の試行回数がこれを超えたら実績を半分にし、古い実績の影響を減らす
+MAX_HISTORY = 50
+
+# プロセスごとの実績ストア (fork後の子プロセスでは作り直す)
+_planner = None
+
+
+def read_config(config):
+    """
+    config.ini の [TIER_PLANNER] から設定を読み込む
+
+    Parameters:
+    config (ConfigParser): 読み込み済みの設定
+
+    Returns:
+    dict: 設定（get_planner に渡す）
+    """
+    settings = {
+        'enabled': True,
+        'epsilon': DEFAULT_EPSILON,
+        'min_attempts': DEFAULT_MIN_ATTEMPTS,
+        'dead_rate': DEFAULT_DEAD_RATE,
+        'hedge': False,
+        'hedge_delay': 0.0,
+        'hedge_quantile': DEFAULT_HEDGE_QUANTILE,
+    }
+    if config.has_section(CONFIG_SECTION):
+        settings['enabled'] = config.getboolean(CONFIG_SECTION, 'enabled', fallback=True)
+        settings['epsilon'] = config.getfloat(CONFIG_SECTION, 'epsilon', fallback=DEFAULT_EPSILON)
+        settings['min_attempts'] = config.getint(CONFIG_SECTION, 'min_attempts', fallback=DEFAULT_MIN_ATTEMPTS)
+        settings['dead_rate'] = config.getfloat(CONFIG_SECTION, 'dead_rate', fallback=DEFAULT_DEAD_RATE)
+        settings['hedge'] = config.getboolean(CONFIG_SECTION, 'hedge', fallback=False)
+        settings['hedge_delay'] = config.getfloat(CONFIG_SECTION, 'hedge_delay', fallback=0.0)
+        settings['hedge_quantile'] = config.getfloat(CONFIG_SECTION, 'hedge_quantile', fallback=DEFAULT_HEDGE_QUANTILE)
+    return settings
+
+
+def domain_of(url):
+    """実績を集計するドメイン（小文字、先頭の www. を除く）を返す"""
+    host = (urlparse(url).hostname or '').lower()
+    return host[4:] if host.startswith('www.') else host
+
+
+class TierPlanner:
+    """ドメインごとの抽出方法の実績を記録し、試す順序を決める"""
+
+    def __init__(self, settings, db_path=PLANNER_DB_NAME):
+        """
+        初期化メソッド
+
+        Parameters:
+        settings (dict): read_config() が返した設定
+        db_path (str): データベースファイル（共有状態ディレクトリからの相対パス、または絶対パス）
+        """
+        self.settings = settings
+        self.pid = os.getpid()
+        self.conn = shared_state.connect(db_path, timeout=10.0)
+        self.conn.executescript('''
+            CREATE TABLE IF NOT EXISTS tier_stats (
+                domain TEXT NOT NULL,
+                tier TEXT NOT NULL,
+                attempts REAL NOT NULL,
+                successes REAL NOT NULL,
+                total_seconds REAL NOT NULL,
+                total_chars REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (domain, tier)
+            );
+            CREATE TABLE IF NOT EXISTS tier_latency (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                domain TEXT NOT NULL,
+                tier TEXT NOT NULL,
+                seconds REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS tier_latency_domain ON tier_latency (domain, tier);
+        ''')
+
+    def get_stats(self, domain):
+        """ドメインの実績を 抽出方法 -> {'attempts', 'successes', 'total_seconds', 'total_chars'} で返す"""
+        rows = self.conn.execute('SELECT * FROM tier_stats WHERE domain = ?', (domain,)).fetchall()
+        return {row['tier']: dict(row) for row in rows}
+
+    def plan(self, url):
+        """
+        URLのドメインで抽出方法を試す順序を決める
+
+        Returns:
+        tuple: (試す順の抽出方法のリスト, 省略する抽出方法のリスト)
+        """
+        if random.random() < self.settings['epsilon']:
+            return list(DEFAULT_ORDER), []
+        stats = self.get_stats(domain_of(url))
+        min_attempts = self.settings['min_attempts']
+
+        def is_dead(tier):
+            row = stats.get(tier)
+            return (row is not None and row['attempts'] >= min_attempts
+                    and row['successes'] / row['attempts'] < self.settings['dead_rate'])
+
+        def expected_cost(tier):
+            # 成功1回あたりの見込み処理時間 (実績の少ない方法は事前の見込みに近い値になる)
+            row = stats.get(tier) or {'attempts': 0, 'successes': 0, 'total_seconds': 0}
+            success_rate = (row['successes'] + 1) / (row['attempts'] + 2)
+            mean_seconds = (row['total_seconds'] + PRIOR_SECONDS[tier]) / (row['attempts'] + 1)
+            return mean_seconds / success_rate
+
+        skipped = [tier for tier in DEFAULT_ORDER if is_dead(tier)]
+        planned = [tier for tier in DEFAULT_ORDER if tier not in skipped]
+        if not planned:
+            return list(DEFAULT_ORDER), []
+        planned.sort(key=expected_cost)
+        return planned, skipped
+
+    def record(self, url, tier, success, seconds, chars):
+        """
+        抽出方法を1回試した結果を記録する
+
+        Parameters:
+        url (str): 抽出したURL
+        tier (str): 抽出方法
+        success (bool): 十分な長さのテキストを取得できた場合True
+        seconds (float): 処理時間（秒）
+        chars (int): 取得したテキストの文字数
+        """
+        domain = domain_of(url)
+        if not domain:
+            return
+        self.conn.execute('''
+            INSERT INTO tier_stats (domain, tier, attempts, successes, total_seconds, total_chars, updated_at)
+            VALUES (?, ?, 1, ?, ?, ?, ?)
+            ON CONFLICT(domain, tier) DO UPDATE SET
+                attempts = tier_stats.attempts + 1,
+                successes = tier_stats.successes + excluded.successes,
+                total_seconds = tier_stats.total_seconds + excluded.total_seconds,
+                total_chars = tier_stats.total_chars + excluded.total_chars,
+                updated_at = excluded.updated_at
+        ''', (domain, tier, 1 if success else 0, seconds, chars, time.time()))
+        self.conn.execute('''
+            UPDATE tier_stats SET attempts = attempts / 2, successes = successes / 2,
+                total_seconds = total_seconds / 2, total_chars = total_chars / 2
+            WHERE domain = ? AND tier = ? AND attempts > ?
+        ''', (domain, tier, MAX_HISTORY))
+        # 直近 LATENCY_SAMPLES 件の処理時間だけを残す
+        self.conn.execute('INSERT INTO tier_latency (domain, tier, seconds) VALUES (?, ?, ?)', (domain, tier, seconds))
+        self.conn.execute('''
+            DELETE FROM tier_latency WHERE domain = ? AND tier = ? AND id NOT IN (
+                SELECT id FROM tier_latency WHERE domain = ? AND tier = ? ORDER BY id DESC LIMIT ?)
+        ''', (domain, tier, domain, tier, LATENCY_SAMPLES))
+
+    def latency_quantile(self, url, tier, quantile):
+        """ドメインでの抽出方法の直近の処理時間のパーセンタイル（記録が少なければNone）"""
+        rows = self.conn.execute('SELECT seconds FROM tier_latency WHERE domain = ? AND tier = ? ORDER BY seconds',
+                                 (domain_of(url), tier)).fetchall()
+        if len(rows) < MIN_LATENCY_SAMPLES:
+            return None
+        return rows[min(len(rows) - 1, int(quantile * len(rows)))]['seconds']
+
+
+def get_planner(settings):
+    """
+    現在のプロセスの実績ストアを返す（無効の場合・データベースを開けない場合はNone）
+
+    Parameters:
+    settings (dict): read_config() が返した設定
+    """
+    global _planner
+    if not settings or not settings.get('enabled'):
+        return None
+    if _planner is None or _planner.pid != os.getpid() or _planner.settings != settings:
+        try:
+            _planner = TierPlanner(settings)
+        except sqlite3.Error as e:
+            print(f"抽出方法の実績を開けませんでした。既定の順序で抽出します: {e}")
+            return None
+    return _planner
+
+
+def plan(url, settings):
+    """
+    URLで抽出方法を試す順序を返す（無効の場合・実績を読めない場合は既定の順序）
+
+    Returns:
+    tuple: (試す順の抽出方法のリスト, 省略する抽出方法のリスト)
+    """
+    planner = get_planner(settings)
+    if planner is not None:
+        try:
+            return planner.plan(url)
+        except sqlite3.Error as e:
+            print(f"抽出方法の実績を読み込めませんでした。既定の順序で抽出します: {e}")
+    return list(DEFAULT_ORDER), []
+
+
+def record(url, tier, success, seconds, chars, settings):
+    """抽出方法を1回試した結果を記録する（無効の場合・記録できない場合は何もしない）"""
+    planner = get_planner(settings)
+    if planner is not None:
+        try:
+            planner.record(url, tier, success, seconds, chars)
+        except sqlite3.Error as e:
+            print(f"抽出方法の実績を記録できませんでした: {e}")
+
+
+def hedge_delay(url, tier, settings):
+    """
+    最初の抽出方法 tier を始めてから次の方法を並行して始めるまでの待ち時間（秒）
+
+    config.ini の hedge_delay が正の値ならその値、0ならドメインでの tier の処理時間の
+    hedge_quantile パーセンタイル（記録が少なければ DEFAULT_HEDGE_DELAY）を返す。
+    """
+    if settings.get('hedge_delay', 0) > 0:
+        return settings['hedge_delay']
+    planner = get_planner(settings)
+    if planner is not None:
+        try:
+            delay = planner.latency_quantile(url, tier, settings.get('hedge_quantile', DEFAULT_HEDGE_QUANTILE))
+            if delay is not None:
+                return delay
+        except sqlite3.Error as e:
+            print(f"抽出方法の処理時間を読み込めませんでした: {e}")
+    return DEFAULT_HEDGE_DELAY
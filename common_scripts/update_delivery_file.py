@@ -2,6 +2,8 @@ import os
 import sys
 import shutil
 
+import shared_state
+
 def get_keyword_and_filepath():
     """ユーザーから検索キーワードを取得し、対応するファイルのパスを構築する"""
     received_keyword = None
@@ -18,9 +20,8 @@ def get_keyword_and_filepath():
         print("エラー: キーワードが入力されていません。", file=sys.stderr)
         sys.exit(1)
 
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    # update_delivery_file.py から見て1つ上の階層の delivery_folder を指定
-    delivery_folder = os.path.join(script_dir, "..", "delivery_folder")
+    # update_delivery_file.py から見て1つ上の階層の delivery_folder を指定 (環境変数で上書き可能)
+    delivery_folder = shared_state.get_delivery_folder()
     
     # 現在の作業ディレクトリ（各WebText_extractionフォルダー）内のIntegrated_Text.txtへのパス
     integrated_text_path = os.path.join(os.getcwd(), "Integrated_Text", "Integrated_Text.txt")
@@ -45,44 +46,73 @@ def get_keyword_and_filepath():
         
     return target_filepath, integrated_text_path, delivery_folder
 
+def deliver(target_filepath, integrated_text_path, delivery_folder):
+    """
+    統合テキストを納品ファイルに書き込み、completed_folder に移動する
+
+    Parameters:
+    target_filepath (str): delivery_folder 内のキーワード名のファイル
+    integrated_text_path (str): 統合テキストファイル
+    delivery_folder (str): 納品フォルダー
+
+    Returns:
+    str: 移動後のファイルパス
+    """
+    # 1. Integrated_Text.txt にあるテキストを読み込む
+    print(f"'{integrated_text_path}' からテキストを読み込んでいます...")
+    with open(integrated_text_path, 'r', encoding='utf-8') as f_source:
+        content_to_copy = f_source.read()
+    print(f"'{integrated_text_path}' からテキストを読み込みました。")
+
+    destination_filepath = deliver_text(target_filepath, content_to_copy, delivery_folder)
+    print(f"\n処理が正常に完了しました。'{os.path.basename(target_filepath)}' は '{integrated_text_path}' の内容で更新され、'{os.path.dirname(destination_filepath)}' に移動されました。")
+    return destination_filepath
+
+def deliver_text(target_filepath, content_to_copy, delivery_folder):
+    """
+    テキストを納品ファイルに書き込み、completed_folder に移動する
+
+    Parameters:
+    target_filepath (str): delivery_folder 内のキーワード名のファイル
+    content_to_copy (str): 書き込むテキスト（統合テキストの内容）
+    delivery_folder (str): 納品フォルダー
+
+    Returns:
+    str: 移動後のファイルパス
+    """
+    # 2. 同じファイル名のテキストを全消去 (ファイルを開いてすぐに閉じることで空にする)
+    print(f"'{target_filepath}' の内容をクリアしています...")
+    with open(target_filepath, 'w', encoding='utf-8') as f_target:
+        pass # ファイルを 'w' モードで開くだけで内容はクリアされる
+    print(f"'{target_filepath}' の内容をクリアしました。")
+
+    # 3. テキストをキーワードと同じファイル名のテキストファイルに書き込む
+    print(f"'{target_filepath}' にテキストを書き込んでいます...")
+    with open(target_filepath, 'w', encoding='utf-8-sig') as f_target:
+        f_target.write(content_to_copy)
+    print(f"'{target_filepath}' にテキストを書き込みました。")
+    
+    # 4. 処理済みファイルを completed_folder に移動
+    completed_folder_path = os.path.join(delivery_folder, "completed_folder")
+    if not os.path.exists(completed_folder_path):
+        os.makedirs(completed_folder_path)
+        print(f"'{completed_folder_path}' を作成しました。")
+
+    destination_filepath = os.path.join(completed_folder_path, os.path.basename(target_filepath))
+    
+    # 移動先に同名ファイルが存在する場合の処理（上書きなど）をここに追加することも可能
+    # 今回はshutil.moveが上書きするので、特に処理は追加しない
+    shutil.move(target_filepath, destination_filepath)
+    print(f"'{target_filepath}' を '{destination_filepath}' に移動しました。")
+    return destination_filepath
+
 def main():
     target_filepath, integrated_text_path, delivery_folder = get_keyword_and_filepath()
     print(f"対象ファイル: {target_filepath}")
     print(f"統合テキストファイル: {integrated_text_path}")
 
     try:
-        # 1. 同じファイル名のテキストを全消去 (ファイルを開いてすぐに閉じることで空にする)
-        print(f"'{target_filepath}' の内容をクリアしています...")
-        with open(target_filepath, 'w', encoding='utf-8') as f_target:
-            pass # ファイルを 'w' モードで開くだけで内容はクリアされる
-        print(f"'{target_filepath}' の内容をクリアしました。")
-
-        # 2. Integrated_Text.txt にあるテキストを読み込む
-        print(f"'{integrated_text_path}' からテキストを読み込んでいます...")
-        with open(integrated_text_path, 'r', encoding='utf-8') as f_source:
-            content_to_copy = f_source.read()
-        print(f"'{integrated_text_path}' からテキストを読み込みました。")
-
-        # 3. 読み込んだテキストをキーワードと同じファイル名のテキストファイルに書き込む
-        print(f"'{target_filepath}' にテキストを書き込んでいます...")
-        with open(target_filepath, 'w', encoding='utf-8-sig') as f_target:
-            f_target.write(content_to_copy)
-        print(f"'{target_filepath}' にテキストを書き込みました。")
-        
-        # 4. 処理済みファイルを completed_folder に移動
-        completed_folder_path = os.path.join(delivery_folder, "completed_folder")
-        if not os.path.exists(completed_folder_path):
-            os.makedirs(completed_folder_path)
-            print(f"'{completed_folder_path}' を作成しました。")
-
-        destination_filepath = os.path.join(completed_folder_path, os.path.basename(target_filepath))
-        
-        # 移動先に同名ファイルが存在する場合の処理（上書きなど）をここに追加することも可能
-        # 今回はshutil.moveが上書きするので、特に処理は追加しない
-        shutil.move(target_filepath, destination_filepath)
-        print(f"'{target_filepath}' を '{destination_filepath}' に移動しました。")
-        
-        print(f"\n処理が正常に完了しました。'{os.path.basename(target_filepath)}' は '{integrated_text_path}' の内容で更新され、'{completed_folder_path}' に移動されました。")
+        deliver(target_filepath, integrated_text_path, delivery_folder)
 
     except FileNotFoundError as e:
         print(f"エラー: ファイルが見つかりません: {e}", file=sys.stderr)
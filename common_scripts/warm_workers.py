@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+キーワード間で使い回す常駐ワーカープロセス
+
+スロットごとに1つのワーカープロセスを起動したままにし、キーワードごとに
+start.py を新しく起動する代わりに start.main() をワーカー内で呼び出します。
+selenium などの読み込みは起動時の1回だけで済みます。スケジューラからは
+subprocess.Popen と同じ poll() / terminate() / kill() を持つジョブとして扱えます。
+"""
+
+import atexit
+import multiprocessing
+import os
+import sys
+import traceback
+
+# ワーカー起動時に読み込んでおくモジュール (読み込みに失敗してもジョブ実行時に改めてエラーになる)
+PRELOAD_MODULES = ['start', 'web_text_extractor', 'google_url_serch', 'yahoo_url_search']
+
+
+def _preload():
+    """重いモジュールを事前に読み込む"""
+    for module_name in PRELOAD_MODULES:
+        try:
+            __import__(module_name)
+        except Exception as e:
+            print(f"警告: {module_name} の事前読み込みに失敗しました: {e}")
+
+
+def _run_job(job):
+    """
+    1つのキーワードをワーカー内で処理する
+
+    Returns:
+    int: start.py を実行した場合と同じ終了コード
+    """
+    log_file = open(job['log_path'], 'w', encoding='utf-8')
+    sys.stdout.flush()
+    sys.stderr.flush()
+    # ジョブの出力 (抽出ワーカーの子プロセスを含む) をジョブごとのログファイルに書き出す
+    os.dup2(log_file.fileno(), 1)
+    os.dup2(log_file.fileno(), 2)
+    try:
+        # 前のジョブの環境変数 (CPU割り当てなど) が残らないよう置き換える
+        os.environ.clear()
+        os.environ.update(job['env'])
+        os.chdir(job['dir'])
+        import start
+        start.main(job['argv'])
+        return 0
+    except SystemExit as e:
+        if e.code is None:
+            return 0
+        return e.code if isinstance(e.code, int) else 1
+    except Exception:
+        traceback.print_exc()
+        return 1
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        log_file.close()
+
+
+def _worker_main(conn, env):
+    """ワーカープロセスの本体: ジョブを受け取って終了コードを返すことを繰り返す"""
+    if os.name == 'posix':
+        # 端末からのSIGINTがワーカーへ直接届かないように別セッションにする
+        os.setsid()
+    os.environ.update(env)
+    _preload()
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            break
+        if job is None:
+            break
+        conn.send(_run_job(job))
+
+
+class WarmJob:
+    """常駐ワーカーで実行中のジョブ (subprocess.Popen 互換の一部のメソッドを持つ)"""
+
+    def __init__(self, worker, log_path):
+        self.worker = worker
+        self.log_path = log_path
+        self.pid = worker.process.pid
+        self.returncode = None
+
+    def poll(self):
+        """終了していれば終了コード、実行中ならNoneを返す"""
+        if self.returncode is not None:
+            return self.returncode
+        if self.worker.conn.poll():
+            try:
+                self.returncode = self.worker.conn.recv()
+            except EOFError:
+                self.returncode = self.worker.process.exitcode or 1
+            self.worker.busy = False
+        elif not self.worker.process.is_alive():
+            # ワーカー自体が異常終了した (次のジョブでは新しいワーカーを起動する)
+            self.returncode = self.worker.process.exitcode or 1
+            self.worker.busy = False
+        return self.returncode
+
+    def wait(self, timeout=None):
+        """ジョブの終了を待つ"""
+        if self.returncode is None:
+            self.worker.conn.poll(timeout)
+        return self.poll()
+
+    def terminate(self):
+        """ワーカーごと終了させる"""
+        self.worker.process.terminate()
+
+    def kill(self):
+        """ワーカーごと強制終了させる"""
+        self.worker.process.kill()
+
+
+class WarmWorker:
+    """1スロット分の常駐ワーカープロセス"""
+
+    def __init__(self, name, env):
+        context = multiprocessing.get_context('spawn')
+        self.name = name
+        self.conn, child_conn = context.Pipe()
+        # 抽出段階はワーカー内で ProcessPoolExecutor を作成するため、デーモンにはしない
+        # (デーモンプロセスは子プロセスを作成できない)。終了は WarmWorkerPool.shutdown で行う
+        self.process = context.Process(target=_worker_main, args=(child_conn, env), name=f"warm-{name}", daemon=False)
+        self.process.start()
+        child_conn.close()
+        self.busy = False
+
+    def is_alive(self):
+        return self.process.is_alive()
+
+    def submit(self, job):
+        """ジョブを送信し、WarmJob を返す"""
+        self.busy = True
+        self.conn.send(job)
+        return WarmJob(self, job['log_path'])
+
+    def stop(self, timeout=10):
+        """ワーカーを終了させる"""
+        if self.process.is_alive():
+            try:
+                self.conn.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+            self.process.join(timeout)
+            if self.process.is_alive():
+                self.process.terminate()
+                self.process.join(timeout)
+        self.conn.close()
+
+
+class WarmWorkerPool:
+    """スロット名ごとに常駐ワーカーを管理する"""
+
+    def __init__(self, env=None):
+        """
+        Parameters:
+        env (dict): 全ワーカーに設定する環境変数
+        """
+        self.env = dict(env or {})
+        self.workers = {}
+        self._atexit_registered = False
+
+    def launch(self, slot_name, argv, workspace, log_path, env=None):
+        """
+        スロットのワーカーでキーワードを処理する（ワーカーが停止していれば起動し直す）
+
+        Parameters:
+        slot_name (str): スロット名
+        argv (list): start.main() に渡す引数
+        workspace (str): 作業フォルダー
+        log_path (str): ジョブのログファイル
+        env (dict): ジョブの環境変数（os.environ を置き換える）
+
+        Returns:
+        WarmJob: 実行中のジョブ
+        """
+        worker = self.workers.get(slot_name)
+        if worker is not None and (not worker.is_alive() or worker.busy):
+            worker.stop(timeout=1)
+            worker = None
+        if worker is None:
+            worker = WarmWorker(slot_name, self.env)
+            self.workers[slot_name] = worker
+            if not self._atexit_registered:
+                # 例外で終了した場合も、デーモンでないワーカーの終了待ちで止まらないよう停止させる
+                # (multiprocessing の終了処理より先に実行されるよう、最初のワーカーの起動後に登録する)
+                atexit.register(self.shutdown)
+                self._atexit_registered = True
+            print(f"{slot_name} の常駐ワーカーを起動しました (PID: {worker.process.pid})")
+        job_env = dict(self.env)
+        job_env.update(env or {})
+        return worker.submit({'argv': list(argv), 'dir': workspace, 'log_path': log_path, 'env': job_env})
+
+    def shutdown(self):
+        """全ワーカーを終了させる"""
+        for worker in self.workers.values():
+            worker.stop()
+        self.workers.clear()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ジョブごとの一時作業フォルダー（ワークスペース）管理
+
+固定の WebText_extraction フォルダーの代わりに、キーワードごとにスクラッチ領域
+（利用可能なら tmpfs の /dev/shm）へ作業フォルダーを作成し、納品後に削除します。
+"""
+
+import os
+import re
+import shutil
+import tempfile
+
+try:
+    import psutil
+    PSUTIL_AVAILABLE = True
+except ImportError:
+    PSUTIL_AVAILABLE = False
+
+# 作業フォルダー名の接頭辞（この接頭辞を持つフォルダーのみ削除対象にする）
+WORKSPACE_PREFIX = 'ws_'
+# 作業フォルダー内に作成するサブフォルダー
+WORKSPACE_SUBDIRS = ['outputs', 'urls', 'Integrated_Text']
+# スクラッチ領域内のディレクトリ名
+SCRATCH_DIR_NAME = 'webtext_workspaces'
+
+# 1キーワードあたりのリソース見積もり (Chrome + 抽出ワーカー)
+CORES_PER_KEYWORD = 1.6
+MEMORY_PER_KEYWORD = int(1.5 * 1024 ** 3)
+
+
+def default_scratch_root():
+    """作業フォルダーの作成先を返す（/dev/shm が書き込み可能ならtmpfsを使用）"""
+    shm_dir = '/dev/shm'
+    if os.path.isdir(shm_dir) and os.access(shm_dir, os.W_OK):
+        base_dir = shm_dir
+    else:
+        base_dir = tempfile.gettempdir()
+    return os.path.join(base_dir, SCRATCH_DIR_NAME)
+
+
+def default_concurrency():
+    """マシンのCPU数と空きメモリから同時実行数を決める"""
+    cpu_count = os.cpu_count() or 1
+    concurrency = max(1, int(cpu_count / CORES_PER_KEYWORD))
+    if PSUTIL_AVAILABLE:
+        memory_limit = max(1, int(psutil.virtual_memory().available // MEMORY_PER_KEYWORD))
+        concurrency = min(concurrency, memory_limit)
+    return concurrency
+
+
+def _safe_name(keyword):
+    """キーワードをフォルダー名に使える形に変換する"""
+    name = re.sub(r'[<>:"/\\|?*\s]', '_', keyword)
+    return name[:40]
+
+
+def create_workspace(keyword, scratch_root, template_config=None):
+    """
+    キーワード用の作業フォルダーを作成する
+
+    Parameters:
+    keyword (str): 処理するキーワード
+    scratch_root (str): 作業フォルダーの作成先
+    template_config (str): 作業フォルダーにコピーする config.ini のテンプレート
+
+    Returns:
+    str: 作成した作業フォルダーの絶対パス
+    """
+    os.makedirs(scratch_root, exist_ok=True)
+    workspace = os.path.realpath(tempfile.mkdtemp(prefix=f"{WORKSPACE_PREFIX}{_safe_name(keyword)}_", dir=scratch_root))
+    for subdir in WORKSPACE_SUBDIRS:
+        os.makedirs(os.path.join(workspace, subdir), exist_ok=True)
+    if template_config and os.path.isfile(template_config):
+        shutil.copy2(template_config, os.path.join(workspace, 'config.ini'))
+    return workspace
+
+
+def is_managed_workspace(path, scratch_root):
+    """スクラッチ領域内で作成した作業フォルダーかどうか"""
+    path = os.path.realpath(path)
+    root = os.path.realpath(scratch_root)
+    return (os.path.dirname(path) == root
+            and os.path.basename(path).startswith(WORKSPACE_PREFIX))
+
+
+def remove_workspace(path, scratch_root):
+    """作業フォルダーを削除する（スクラッチ領域外のフォルダーは削除しない）"""
+    if not is_managed_workspace(path, scratch_root):
+        print(f"警告: 管理対象外のフォルダーのため削除しません: {path}")
+        return False
+    try:
+        shutil.rmtree(path)
+        return True
+    except OSError as e:
+        print(f"警告: 作業フォルダー {path} の削除に失敗しました: {e}")
+        return False
+
+
+def collect_garbage(scratch_root, keep_paths=()):
+    """
+    再開に必要なもの以外の古い作業フォルダーを削除する
+
+    Parameters:
+    scratch_root (str): 作業フォルダーの作成先
+    keep_paths (iterable): 削除しない作業フォルダー
+
+    Returns:
+    int: 削除したフォルダー数
+    """
+    if not os.path.isdir(scratch_root):
+        return 0
+    keep = set(os.path.realpath(path) for path in keep_paths)
+    removed = 0
+    for entry in os.scandir(scratch_root):
+        if not entry.is_dir() or not entry.name.startswith(WORKSPACE_PREFIX):
+            continue
+        if os.path.realpath(entry.path) in keep:
+            continue
+        if remove_workspace(entry.path, scratch_root):
+            removed += 1
+    return removed
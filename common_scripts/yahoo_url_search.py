@@ -434,7 +434,14 @@ def extract_top_urls_from_search_url(driver, search_url, num_urls=3):
     return urls[:num_urls]
 
 def integrated_yahoo_search(yahoo_url):
+    """
+    Yahoo検索結果ページと関連検索からURLを収集し、urls/yahoo_urls.txt に保存する
+
+    Returns:
+    list: 保存したURLのリスト（エラー時はNone）
+    """
     driver = None # driver変数を初期化
+    saved_urls = None
     try:
         # ディレクトリの確認
         base_dir = ensure_directories_exist()
@@ -453,6 +460,10 @@ def integrated_yahoo_search(yahoo_url):
         
         # ウィンドウサイズを設定
         options.add_argument("--start-maximized")
+
+        # run_all_starts.py の headlessモードから起動された場合は画面なしで起動
+        if os.environ.get('WEBTEXT_HEADLESS') == '1':
+            options.add_argument("--headless=new")
         
         # ChromeDriverManagerを使わずに直接Chromeを起動
         driver = webdriver.Chrome(options=options)
@@ -514,6 +525,7 @@ def integrated_yahoo_search(yahoo_url):
             filtered_urls_for_file = [url for url in all_urls if not is_excluded_url(url)]
             for url in filtered_urls_for_file:
                  f.write(f"{url}\n")
+        saved_urls = filtered_urls_for_file
         
         print(f"\n合計 {len(filtered_urls_for_file)} 件のユニークなURLを {output_file_path} に保存しました") # 保存件数をfiltered_urls_for_fileの長さに合わせる
         print("処理が完了しました。") # メッセージ変更
@@ -541,6 +553,8 @@ def integrated_yahoo_search(yahoo_url):
             print("ブラウザを閉じています...")
             driver.quit()
 
+    return saved_urls
+
 if __name__ == "__main__":
     # コマンドライン引数のパーサーを作成
     parser = argparse.ArgumentParser(description='Yahoo検索結果ページからURLを抽出します。')
@@ -2,9 +2,25 @@ import subprocess
 import os
 import time
 import sys
-import math
+import signal
+import argparse
+import collections
 
-# 処理対象のWebText_extractionフォルダーのリスト
+# スクリプト自身のディレクトリを取得
+script_directory = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(script_directory, "common_scripts"))
+
+import coordinator
+import cpu_affinity
+import job_ledger
+import keyword_queue
+import node_worker
+import shared_state
+import telemetry
+import warm_workers
+import workspace_manager
+
+# 固定フォルダーモード (--fixed-workspaces) で使用するWebText_extractionフォルダーのリスト
 work_directories = [
     "WebText_extraction",
     "WebText_extraction2",
@@ -26,9 +42,9 @@ def get_remaining_txt_files(delivery_folder_path):
         
         # completed_folder内のファイルを取得（処理済みファイル）
         completed_folder_path = os.path.join(delivery_folder_path, "completed_folder")
-        completed_files = []
+        completed_files = set()
         if os.path.exists(completed_folder_path):
-            completed_files = [f for f in os.listdir(completed_folder_path) if f.endswith(".txt")]
+            completed_files = set(f for f in os.listdir(completed_folder_path) if f.endswith(".txt"))
         
         # 処理されていないファイルのみを返す
         remaining_files = [f for f in all_txt_files if f not in completed_files]
@@ -41,150 +57,629 @@ def get_remaining_txt_files(delivery_folder_path):
         print(f"エラー: delivery_folder の読み取り中に問題が発生しました: {e}")
         return []
 
-def process_batch(txt_files, batch_number, total_files, processed_files):
-    """バッチ処理を実行する"""
-    batch_size = len(txt_files)
-    remaining_files = total_files - processed_files
-    
-    print(f"\n===== バッチ {batch_number} を処理中 =====")
-    print(f"総ファイル数: {total_files}")
-    print(f"処理済み: {processed_files}")
-    print(f"今回処理: {batch_size}")
-    print(f"残り: {remaining_files - batch_size}")
-    print("=" * 50)
-    
-    # キーワードリストを作成 (ファイル名から拡張子を除いたもの)
-    keywords = [os.path.splitext(f)[0] for f in txt_files]
-    
-    # work_directoriesをキーワードの数に合わせて調整
-    current_work_directories = work_directories[:len(keywords)]
-    
-    processes = []
-    commands_to_run = []
-    
-    print("delivery_folder からキーワードを自動取得し、フォルダーに割り当てます...")
-    
+# 子プロセスの終了確認間隔（秒）
+POLL_INTERVAL = 1.0
+
+# headlessモードの子プロセスに設定する環境変数
+HEADLESS_ENV = {
+    'PYTHONUNBUFFERED': '1',
+    'PYTHONIOENCODING': 'utf-8',
+    'WEBTEXT_HEADLESS': '1',  # 検索スクリプトのChromeもheadlessで起動する
+}
+
+# 停止要求の状態 (SIGTERM/SIGINT の受信回数)
+shutdown_state = {'requests': 0}
+
+
+def handle_shutdown_signal(signum, frame):
+    """SIGTERM/SIGINT を受け取ったら新規起動を止め、2回目で子プロセスを終了させる"""
+    shutdown_state['requests'] += 1
+    if shutdown_state['requests'] == 1:
+        print(f"\n停止シグナル ({signum}) を受信しました。新規起動を停止し、実行中のプロセスの完了を待ちます...")
+        print("もう一度シグナルを送ると実行中のプロセスを終了します。")
+    else:
+        print(f"\n停止シグナル ({signum}) を再受信しました。実行中のプロセスを終了します...")
+
+
+def use_console_windows(args):
+    """子プロセスを別コンソールで起動するかどうか (Windowsかつheadless指定なしの場合のみ)"""
+    return not args.headless and hasattr(subprocess, 'CREATE_NEW_CONSOLE')
+
+
+def job_log_path(command_info, args, attempt):
+    """headlessモードで子プロセスの出力を保存するログファイルのパスを返す"""
+    os.makedirs(args.log_dir, exist_ok=True)
+    timestamp = time.strftime('%Y%m%d_%H%M%S')
+    return os.path.join(args.log_dir, f"{timestamp}_{command_info['work_dir_name']}_{command_info['keyword']}_{attempt}.log")
+
+
+def launch_keyword(command_info, args, attempt=1):
+    """キーワードを割り当てたフォルダーで共通start.pyを起動する"""
+    command = [sys.executable, command_info['script_path'], command_info['keyword']]
+    if command_info.get('stages', PHASE_ALL) != PHASE_ALL:
+        command += ['--stages', command_info['stages']]
+    if args.in_process:
+        command.append('--in-process')
+    log_file = None
+    env = os.environ.copy()
+    if command_info.get('cpus'):
+        # スロットに割り当てたコアを start.py に渡す (cpu_ratio はこの集合に対して適用される)
+        env[cpu_affinity.CPU_SET_ENV] = cpu_affinity.format_cpu_list(command_info['cpus'])
+    try:
+        if use_console_windows(args):
+            process = subprocess.Popen(
+                command,
+                cwd=command_info['dir'],
+                env=env,
+                creationflags=subprocess.CREATE_NEW_CONSOLE
+            )
+        elif args.warm_pool is not None:
+            # 常駐ワーカー: スロットのワーカープロセス内で start.main() を呼び出す
+            log_path = job_log_path(command_info, args, attempt)
+            env.update(HEADLESS_ENV)
+            process = args.warm_pool.launch(command_info['work_dir_name'], command[2:], command_info['dir'], log_path, env)
+            print(f"  ログ: {log_path} (常駐ワーカー PID: {process.pid})")
+        else:
+            # headlessモード: 出力を子プロセスごとのログファイルへ書き出す
+            log_path = job_log_path(command_info, args, attempt)
+            log_file = open(log_path, 'w', encoding='utf-8')
+            env.update(HEADLESS_ENV)
+
+            popen_kwargs = {}
+            if os.name == 'posix':
+                # 端末からのSIGINTが子プロセスへ直接届かないように別セッションで起動
+                popen_kwargs['start_new_session'] = True
+            process = subprocess.Popen(
+                command,
+                cwd=command_info['dir'],
+                stdin=subprocess.DEVNULL,
+                stdout=log_file,
+                stderr=subprocess.STDOUT,
+                env=env,
+                **popen_kwargs
+            )
+            process.log_path = log_path
+            # ファイルハンドルは子プロセスが保持するため親側では閉じる
+            log_file.close()
+            print(f"  ログ: {log_path}")
+        print(f"{command_info['work_dir_name']} フォルダーで共通start.pyをキーワード '{command_info['keyword']}' で起動しました。(試行 {attempt})")
+        if command_info.get('cpus'):
+            print(f"  CPUアフィニティ: {env[cpu_affinity.CPU_SET_ENV]}")
+        return process
+    except FileNotFoundError:
+        print(f"エラー: Pythonインタープリタが見つからないか、{command_info['script_path']} (作業ディレクトリ: {command_info['dir']}) の実行に失敗しました。")
+    except Exception as e:
+        print(f"エラー: {command_info['work_dir_name']} での起動中に問題が発生しました: {e}")
+    if log_file and not log_file.closed:
+        log_file.close()
+    return None
+
+
+def terminate_processes(running):
+    """実行中の子プロセスを終了させる"""
+    for slot_name, job in running.items():
+        process = job['process']
+        if process.poll() is not None:
+            continue
+        print(f"{slot_name} のプロセス (PID: {process.pid}, キーワード: '{job['keyword']}') を終了します...")
+        try:
+            process.terminate()
+        except OSError as e:
+            print(f"警告: プロセス {process.pid} の終了に失敗しました: {e}")
+
+
+def print_exit_codes(exit_codes):
+    """キーワードごとの終了コードを表示する"""
+    print("\n----- 終了コード -----")
+    for keyword, codes in exit_codes.items():
+        print(f"{keyword}: {', '.join(str(code) for code in codes)}")
+
+
+def print_slot_utilization(slot_stats, makespan):
+    """スロットごとの稼働率を表示する"""
+    print("\n----- スロット稼働率 -----")
+    if makespan <= 0:
+        print("計測時間が0秒のため、稼働率を計算できません。")
+        return
+
+    total_busy = 0.0
+    for work_dir_name, stats in slot_stats.items():
+        total_busy += stats['busy_seconds']
+        utilization = stats['busy_seconds'] / makespan * 100
+        print(f"{work_dir_name:<22} 処理数: {stats['jobs']:>4}  稼働時間: {stats['busy_seconds']:>9.1f}秒  稼働率: {utilization:5.1f}%")
+
+    overall = total_busy / (makespan * len(slot_stats)) * 100 if slot_stats else 0.0
+    print(f"全体稼働率: {overall:.1f}%  (総所要時間: {makespan:.1f}秒)")
+
+
+# スロットが担当する段階 (start.py の --stages に対応)
+PHASE_ALL = 'all'
+PHASE_SEARCH = 'search'
+PHASE_EXTRACT = 'extract'
+
+# 検索段階の完了を示すジョブ台帳の段階
+SEARCH_STAGES = (job_ledger.STAGE_GOOGLE_SERP, job_ledger.STAGE_YAHOO_SERP)
+
+
+def build_slots(args):
+    """
+    同時実行スロットを作成する
+
+    固定フォルダーモードでは既存の WebText_extraction フォルダーを1スロットずつ割り当て、
+    それ以外では args.concurrency 個のスロットを作り、ジョブごとに作業フォルダーを作成する。
+    パイプラインモードでは検索段階用と抽出段階用のスロットを別々に作成する。
+
+    Returns:
+    list: [{'name': スロット名, 'phase': 担当段階, 'workspace': 固定の作業フォルダー (一時作業フォルダーの場合None),
+            'cpus': 割り当てたCPU番号のリスト (割り当てなしの場合None)}, ...]
+    """
+    if args.pipeline:
+        slots = [{'name': f"search{i + 1}", 'phase': PHASE_SEARCH, 'workspace': None} for i in range(args.search_slots)]
+        slots += [{'name': f"extract{i + 1}", 'phase': PHASE_EXTRACT, 'workspace': None} for i in range(args.extract_slots)]
+    elif not args.fixed_workspaces:
+        slots = [{'name': f"slot{i + 1}", 'phase': PHASE_ALL, 'workspace': None} for i in range(args.concurrency)]
+    else:
+        # 存在する作業フォルダーのみをスロットとして使用
+        slots = []
+        for work_dir_name in work_directories:
+            work_dir_abs_path = os.path.realpath(os.path.join(script_directory, work_dir_name))
+            if not os.path.exists(work_dir_abs_path):
+                print(f"エラー: {work_dir_abs_path} が見つかりません。スキップします。")
+                continue
+            slots.append({'name': work_dir_name, 'phase': PHASE_ALL, 'workspace': work_dir_abs_path})
+
+    assign_cpu_sets(slots, args.cpu_layout)
+    return slots
+
+
+def assign_cpu_sets(slots, layout):
+    """
+    抽出処理を行うスロットに重ならないCPUの集合を割り当てる
+
+    検索段階のみのスロットはCPU制限付きの抽出を行わないため割り当ての対象外とする。
+    """
+    for slot in slots:
+        slot['cpus'] = None
+    target_slots = [slot for slot in slots if slot['phase'] != PHASE_SEARCH]
+    cpu_sets = cpu_affinity.partition_cpus(len(target_slots), layout)
+    for slot, cpus in zip(target_slots, cpu_sets):
+        slot['cpus'] = cpus
+    if layout != cpu_affinity.LAYOUT_SHARED and target_slots:
+        print(f"CPU割り当て ({layout}):")
+        for slot in target_slots:
+            print(f"  {slot['name']}: {cpu_affinity.format_cpu_list(slot['cpus'])}")
+
+
+def run_scheduler(total_files, args, queue):
+    """
+    空いたスロットへ次の未処理キーワードを即座に割り当てる連続スケジューラ
+
+    バッチ単位で全プロセスの終了を待つのではなく、いずれかのプロセスが終了した時点で
+    delivery_folder の次の未処理キーワードを起動する。異常終了したプロセスは
+    args.max_restarts 回まで同じスロットで再起動する。
+
+    パイプラインモードでは検索段階を終えたキーワードを抽出待ちキューへ移し、
+    抽出スロットが空き次第、同じ作業フォルダーで抽出段階を起動する。これにより
+    あるキーワードの抽出中に次のキーワードの検索を並行して進められる。
+
+    未処理キーワードは queue (KeywordQueue) から取得する。delivery_folder は
+    更新時刻が変わったときだけ再走査される。
+
+    監視モード (args.watch) ではキューが空になっても終了せず、delivery_folder に
+    追加されたキーワードを処理し続ける。停止シグナルを受けると実行中のキーワードの
+    完了を待って終了する。
+
+    Returns:
+    dict: 実行結果の集計 (completed, failed, exit_codes, slot_stats, makespan)
+    """
     # 共通のstart.pyのパス
     common_start_script = os.path.join(script_directory, "common_scripts", "start.py")
-    
+
     if not os.path.exists(common_start_script):
         print(f"エラー: 共通のstart.pyが見つかりません: {common_start_script}")
-        return False
-    
-    for i, work_dir_name in enumerate(current_work_directories):
-        # 作業ディレクトリの絶対パス
-        work_dir_abs_path = os.path.join(script_directory, work_dir_name)
-        
-        if not os.path.exists(work_dir_abs_path):
-            print(f"エラー: {work_dir_abs_path} が見つかりません。スキップします。")
-            continue
-        
-        keyword = keywords[i]
-        commands_to_run.append({
-            'dir': work_dir_abs_path, 
-            'script_path': common_start_script, 
-            'keyword': keyword, 
-            'work_dir_name': work_dir_name
-        })
-        print(f"'{work_dir_name}' フォルダーにキーワード '{keyword}' を割り当てました。")
-    
-    print("\nキーワードの割り当てが完了しました。スクリプトを起動します...")
-    
-    # プロセス起動
-    for command_info in commands_to_run:
+        return None
+
+    slots = build_slots(args)
+    if not slots:
+        print("エラー: 使用可能な作業フォルダーがありません。")
+        return None
+
+    # ジョブ台帳から途中まで完了しているキーワードを取得し、前回と同じ作業フォルダーで再開する
+    # (別のキーワードを起動すると作業フォルダーの中間ファイルが削除されるため)
+    resumable = find_resumable_jobs(slots, args, queue)
+    reserved = {job['workspace']: keyword for keyword, job in resumable.items()}
+    if not args.fixed_workspaces:
+        removed = workspace_manager.collect_garbage(
+            args.scratch_root, keep_paths=[job['workspace'] for job in resumable.values()])
+        if removed:
+            print(f"不要になった作業フォルダーを {removed} 個削除しました。")
+
+    running = {}  # スロット名 -> {'process', 'keyword', 'phase', 'started_at', 'attempt', 'command_info'}
+    dispatched = set()  # 今回の実行で起動済みのキーワード
+    extract_queue = collections.deque()  # パイプラインモードで抽出段階を待つキーワード
+    job_workspaces = {}  # キーワード -> 作業フォルダー
+    completed = []
+    failed = []
+    exit_codes = {}  # keyword -> [終了コード, ...]
+    slot_stats = {slot['name']: {'jobs': 0, 'busy_seconds': 0.0} for slot in slots}
+    last_launch = 0.0
+    terminated = False
+    scheduler_start = time.monotonic()
+    ledger = job_ledger.JobLedger()
+    reporter = telemetry.StatusReporter(
+        ledger, concurrency=len([slot for slot in slots if slot['phase'] != PHASE_SEARCH]),
+        interval=args.status_interval, status_path=args.status_file)
+    if args.watch and not use_console_windows(args):
+        # 監視モードではスロットごとのワーカープロセスを常駐させ、キーワードごとの起動コストを省く
+        args.warm_pool = warm_workers.WarmWorkerPool()
+
+    # パイプラインモードでは検索段階まで完了しているキーワードを直接抽出待ちにする
+    if args.pipeline:
+        for keyword, job in resumable.items():
+            if all(stage in job['done_stages'] for stage in SEARCH_STAGES):
+                extract_queue.append(keyword)
+                job_workspaces[keyword] = job['workspace']
+                dispatched.add(keyword)
+                queue.mark_dispatched(keyword)
+
+    while True:
+        # 2回目の停止シグナルで実行中のプロセスを終了させる
+        if shutdown_state['requests'] >= 2 and not terminated:
+            terminate_processes(running)
+            terminated = True
+
+        # 終了したプロセスを回収
+        for slot_name in list(running):
+            job = running[slot_name]
+            returncode = job['process'].poll()
+            if returncode is None:
+                continue
+
+            elapsed = time.monotonic() - job['started_at']
+            slot_stats[slot_name]['busy_seconds'] += elapsed
+            del running[slot_name]
+            exit_codes.setdefault(job['keyword'], []).append(returncode)
+            workspace = job['command_info']['dir']
+
+            # completed_folder に移動されていれば成功とみなす
+            completed_path = os.path.join(delivery_folder_path, "completed_folder", f"{job['keyword']}.txt")
+            if returncode == 0 and job['phase'] == PHASE_SEARCH:
+                # 検索段階が完了したキーワードを抽出待ちキューへ
+                extract_queue.append(job['keyword'])
+                print(f"'{job['keyword']}' の検索段階が完了しました - {slot_name} ({elapsed:.1f}秒)。抽出待ち: {len(extract_queue)}件")
+                continue
+            elif returncode == 0 and os.path.exists(completed_path):
+                completed.append(job['keyword'])
+                queue.mark_completed(job['keyword'])
+                status = "完了"
+                # 納品済みの一時作業フォルダーは削除する
+                if not args.fixed_workspaces:
+                    workspace_manager.remove_workspace(workspace, args.scratch_root)
+            elif returncode != 0 and job['attempt'] <= args.max_restarts and not shutdown_state['requests']:
+                # 異常終了したプロセスを同じスロットで再起動
+                print(f"'{job['keyword']}' が異常終了しました (終了コード: {returncode})。再起動します ({job['attempt']}/{args.max_restarts})...")
+                process = launch_keyword(job['command_info'], args, attempt=job['attempt'] + 1)
+                if process is not None:
+                    running[slot_name] = dict(job, process=process, started_at=time.monotonic(), attempt=job['attempt'] + 1)
+                    continue
+                failed.append(job['keyword'])
+                status = "失敗 (再起動に失敗)"
+            else:
+                failed.append(job['keyword'])
+                status = f"失敗 (終了コード: {returncode})"
+                if not args.fixed_workspaces:
+                    print(f"  作業フォルダーを再開用に保持します: {workspace}")
+            finished = len(completed) + len(failed)
+            print(f"[{finished}/{total_files}] '{job['keyword']}' {status} - {slot_name} ({elapsed:.1f}秒)")
+
+        # 空きスロットに未処理キーワードを割り当てる (停止要求後は割り当てない)
+        free_slots = [slot for slot in slots if slot['name'] not in running]
+        pending = []
+        if free_slots and not shutdown_state['requests']:
+            if queue.sync() and args.watch:
+                # 監視モード: 新しく追加されたキーワードを進捗表示の総数に加える
+                known = len(completed) + len(failed) + len(running) + len(extract_queue) + queue.count()
+                if known > total_files:
+                    print(f"新しいキーワードを {known - total_files} 件検出しました。")
+                    total_files = known
+            # 再開可能なキーワードを優先し、残りはキューの先頭から空きスロット分だけ取得する
+            pending = [k for k in resumable if k not in dispatched and queue.is_pending(k)]
+            pending += [k for k in queue.pending(limit=len(free_slots) + len(resumable)) if k not in resumable]
+
+        for slot in free_slots:
+            if shutdown_state['requests']:
+                break
+            if slot['phase'] == PHASE_EXTRACT:
+                if not extract_queue:
+                    continue
+                keyword = extract_queue.popleft()
+            else:
+                # 抽出待ちが溜まりすぎないよう、抽出スロット数を超えたら検索を控える
+                if slot['phase'] == PHASE_SEARCH and len(extract_queue) >= args.extract_slots:
+                    continue
+                if slot['workspace']:
+                    # 固定フォルダー: 再開予約があればそのキーワード、なければ予約されていない次のキーワード
+                    keyword = reserved.get(slot['workspace'])
+                    if keyword not in pending:
+                        keyword = next((k for k in pending if k not in resumable), None)
+                else:
+                    keyword = pending[0] if pending else None
+                if keyword is None:
+                    continue
+                pending.remove(keyword)
+                dispatched.add(keyword)
+                queue.mark_dispatched(keyword)
+
+            # 連続起動を避けるための起動間隔 (--stagger)
+            wait = args.stagger - (time.monotonic() - last_launch)
+            if wait > 0:
+                time.sleep(wait)
+
+            workspace = slot['workspace'] or job_workspaces.get(keyword)
+            if not workspace and keyword in resumable:
+                workspace = resumable[keyword]['workspace']
+            if not workspace:
+                try:
+                    workspace = workspace_manager.create_workspace(keyword, args.scratch_root, args.template_config)
+                except OSError as e:
+                    print(f"エラー: キーワード '{keyword}' の作業フォルダーを作成できませんでした: {e}")
+                    failed.append(keyword)
+                    continue
+            job_workspaces[keyword] = workspace
+            print(f"'{slot['name']}' ({workspace}) にキーワード '{keyword}' を割り当てました。")
+            command_info = {
+                'dir': workspace,
+                'script_path': common_start_script,
+                'keyword': keyword,
+                'work_dir_name': slot['name'],
+                'stages': slot['phase'],
+                'cpus': slot['cpus'],
+            }
+            process = launch_keyword(command_info, args)
+            last_launch = time.monotonic()
+            if process is None:
+                failed.append(keyword)
+                continue
+
+            running[slot['name']] = {
+                'process': process,
+                'keyword': keyword,
+                'phase': slot['phase'],
+                'started_at': last_launch,
+                'attempt': 1,
+                'command_info': command_info,
+            }
+            slot_stats[slot['name']]['jobs'] += 1
+
+        # 実行中のプロセスも未処理キーワードもなければ終了 (停止要求後は実行中のプロセスのみ待つ)
+        # 監視モードでは停止要求があるまで新しいキーワードを待ち続ける
+        if not running and (shutdown_state['requests'] or (not pending and not extract_queue and not args.watch)):
+            break
+
+        # 処理状況 (スループット・段階ごとの所要時間・ETA) を定期的に出力
+        reporter.maybe_report(remaining=max(0, total_files - len(completed) - len(failed)), running=len(running))
+        time.sleep(POLL_INTERVAL)
+
+    reporter.maybe_report(remaining=max(0, total_files - len(completed) - len(failed)), running=0, force=True)
+    ledger.close()
+    if args.warm_pool is not None:
+        args.warm_pool.shutdown()
+        args.warm_pool = None
+
+    if extract_queue:
+        print(f"抽出待ちのまま停止したキーワード: {', '.join(extract_queue)} (次回の実行で再開します)")
+
+    return {
+        'completed': completed,
+        'failed': failed,
+        'exit_codes': exit_codes,
+        'slot_stats': slot_stats,
+        'makespan': time.monotonic() - scheduler_start,
+    }
+
+
+def find_resumable_jobs(slots, args, queue):
+    """
+    ジョブ台帳から再開可能なキーワードと作業フォルダーを探す
+
+    固定フォルダーモードではスロットのフォルダー、一時作業フォルダーモードでは
+    スクラッチ領域に残っている作業フォルダーで中断したジョブのみを対象にする。
+
+    Returns:
+    dict: キーワード -> {'workspace': 作業フォルダーの絶対パス, 'done_stages': 完了済みの段階}
+    """
+    resumable = {}
+    try:
+        ledger = job_ledger.JobLedger()
         try:
-            process = subprocess.Popen(
-                [sys.executable, command_info['script_path'], command_info['keyword']],
-                cwd=command_info['dir'],
-                creationflags=subprocess.CREATE_NEW_CONSOLE
-            )
-            processes.append(process)
-            print(f"{command_info['work_dir_name']} フォルダーで共通start.pyをキーワード '{command_info['keyword']}' で起動しました。")
-            time.sleep(5)  # 5秒待機
-        except FileNotFoundError:
-            print(f"エラー: Pythonインタープリタが見つからないか、{command_info['script_path']} (作業ディレクトリ: {command_info['dir']}) の実行に失敗しました。")
-        except Exception as e:
-            print(f"エラー: {command_info['work_dir_name']} での起動中に問題が発生しました: {e}")
-    
-    print("\nすべてのスクリプトの起動を試みました。")
-    print("プロセスの完了を待機中...")
-    
-    # すべての子プロセスが終了するのを待つ
-    for i, p in enumerate(processes):
-        print(f"プロセス {i+1}/{len(processes)} の完了を待機中...")
-        p.wait()
-    
-    print(f"バッチ {batch_number} の処理が完了しました。")
-    return True
+            resumable_jobs = ledger.get_resumable_jobs()
+        finally:
+            ledger.close()
+    except Exception as e:
+        print(f"警告: ジョブ台帳の読み込みに失敗しました。再開処理を行いません: {e}")
+        return resumable
+
+    slot_workspaces = set(slot['workspace'] for slot in slots if slot['workspace'])
+    used_workspaces = set()
+    for job in resumable_jobs:
+        workspace = job['workspace']
+        if not queue.is_pending(job['keyword']) or not workspace or workspace in used_workspaces:
+            continue
+        if args.fixed_workspaces:
+            if workspace not in slot_workspaces:
+                continue
+        elif not (os.path.isdir(workspace) and workspace_manager.is_managed_workspace(workspace, args.scratch_root)):
+            continue
+        resumable[job['keyword']] = {'workspace': workspace, 'done_stages': job['done_stages']}
+        used_workspaces.add(workspace)
+        print(f"再開: '{job['keyword']}' を前回の作業フォルダー {workspace} で再開します (完了済み: {', '.join(job['done_stages'])})")
+    return resumable
 
-# スクリプト自身のディレクトリを取得
-script_directory = os.path.dirname(os.path.abspath(__file__))
-delivery_folder_path = os.path.join(script_directory, "delivery_folder")
 
-if not os.path.isdir(delivery_folder_path):
-    print(f"エラー: delivery_folder が見つかりません: {delivery_folder_path}")
-    exit() # フォルダが見つからない場合は終了
+def parse_args():
+    """コマンドライン引数を解析する"""
+    parser = argparse.ArgumentParser(description='delivery_folder のキーワードを各作業フォルダーで並列処理します。')
+    parser.add_argument('--headless', action='store_true',
+                        help='子プロセスを別コンソールではなくバックグラウンドで起動し、出力をログファイルに保存する（Windows以外では常に有効）')
+    parser.add_argument('--log-dir', default=os.path.join(script_directory, 'logs'),
+                        help='headlessモードで子プロセスのログを保存するディレクトリ')
+    parser.add_argument('--stagger', type=float, default=0.0,
+                        help='プロセス起動間隔（秒）。デフォルトは0（待機なし）')
+    parser.add_argument('--max-restarts', type=int, default=2,
+                        help='異常終了した子プロセスを再起動する最大回数')
+    parser.add_argument('--concurrency', type=int, default=workspace_manager.default_concurrency(),
+                        help='同時に処理するキーワード数（デフォルトはCPU数と空きメモリから自動計算）')
+    parser.add_argument('--scratch-root', default=workspace_manager.default_scratch_root(),
+                        help='ジョブごとの作業フォルダーを作成するディレクトリ（デフォルトは /dev/shm などのtmpfs）')
+    parser.add_argument('--template-config', default=os.path.join(script_directory, 'config.ini'),
+                        help='作業フォルダーにコピーする config.ini のテンプレート')
+    parser.add_argument('--fixed-workspaces', action='store_true',
+                        help='一時作業フォルダーではなく従来の WebText_extraction フォルダーを使用する')
+    parser.add_argument('--pipeline', action='store_true',
+                        help='検索段階と抽出段階を別々のスロットで実行し、キーワード間で段階を重ねて処理する')
+    parser.add_argument('--search-slots', type=int, default=2,
+                        help='パイプラインモードで同時に実行する検索段階（Chromeでの検索）の数')
+    parser.add_argument('--extract-slots', type=int, default=None,
+                        help='パイプラインモードで同時に実行する抽出段階の数（デフォルトは --concurrency と同じ）')
+    parser.add_argument('--cpu-layout', choices=cpu_affinity.LAYOUTS, default=cpu_affinity.LAYOUT_SPREAD,
+                        help='スロットへのCPU割り当て: spread=重ならない区間に分割, numa=NUMAノード単位で分割, shared=割り当てなし')
+    parser.add_argument('--in-process', action='store_true',
+                        help='start.py の各段階を別プロセスで起動せず、キーワードごとに1つのプロセス内で実行する')
+    parser.add_argument('--status-interval', type=float, default=telemetry.DEFAULT_INTERVAL,
+                        help='処理状況（スループット・所要時間・ETA）を表示して状態ファイルを更新する間隔（秒）。0で終了時のみ')
+    parser.add_argument('--status-file', default=None,
+                        help='処理状況を書き出すJSONファイル（デフォルトは state/status.json）')
+    parser.add_argument('--watch', action='store_true',
+                        help='処理対象がなくなっても終了せず、delivery_folder に追加されたキーワードを処理し続ける（常駐ワーカーを使用し、--in-process を含む）')
+    parser.add_argument('--serve', action='store_true',
+                        help='コーディネーターとして起動し、delivery_folder のキーワードをワーカーノードに配布する')
+    parser.add_argument('--bind', default='127.0.0.1',
+                        help='コーディネーターが待ち受けるアドレス（他のマシンから接続する場合は 0.0.0.0 など）')
+    parser.add_argument('--port', type=int, default=coordinator.DEFAULT_PORT,
+                        help='コーディネーターが待ち受けるポート')
+    parser.add_argument('--lease-timeout', type=float, default=coordinator.DEFAULT_LEASE_TIMEOUT,
+                        help='ハートビートが途絶えたワーカーのキーワードを再配布するまでの秒数')
+    parser.add_argument('--join', metavar='URL', default=None,
+                        help='ワーカーノードとして起動し、指定したコーディネーター (例: http://host:8765) からキーワードを受け取る')
+    parser.add_argument('--worker-name', default=node_worker.default_worker_name(),
+                        help='コーディネーターに通知するワーカー名')
+    args = parser.parse_args()
+    if args.serve and args.join:
+        parser.error('--serve と --join は同時に指定できません')
+    if args.concurrency < 1:
+        parser.error('--concurrency は1以上を指定してください')
+    if args.extract_slots is None:
+        args.extract_slots = args.concurrency
+    if args.pipeline:
+        if args.fixed_workspaces:
+            parser.error('--pipeline は --fixed-workspaces と同時に指定できません')
+        if args.search_slots < 1 or args.extract_slots < 1:
+            parser.error('--search-slots と --extract-slots は1以上を指定してください')
+    if args.watch and (args.serve or args.join):
+        parser.error('--watch は --serve / --join と同時に指定できません')
+    if args.watch:
+        # 常駐ワーカーは start.main() を呼び出すだけなので、各段階も同じプロセス内で実行しないと
+        # 段階ごとに新しいプロセスが起動され、事前に読み込んだモジュールが使われない
+        args.in_process = True
+    args.scratch_root = os.path.realpath(args.scratch_root)
+    args.warm_pool = None  # 監視モードの常駐ワーカー (run_scheduler で作成)
+    return args
+
+delivery_folder_path = shared_state.get_delivery_folder()
+
+def run_coordinator(args):
+    """コーディネーターモード: キーワードをワーカーノードに配布する"""
+    print("=" * 60)
+    print("コーディネーターを開始します")
+    print("=" * 60)
+    status = coordinator.serve(delivery_folder_path, host=args.bind, port=args.port,
+                               lease_timeout=args.lease_timeout, max_attempts=args.max_restarts + 1,
+                               should_stop=lambda: shutdown_state['requests'] > 0)
+    print("\n" + "=" * 60)
+    print(f"完了したキーワード: {len(status['completed'])}件 / 未処理: {status['pending']}件")
+    if status['failed']:
+        print(f"⚠️ 失敗したキーワード ({len(status['failed'])}件): {', '.join(status['failed'])}")
+    print("=" * 60)
+    if status['failed']:
+        sys.exit(1)
+
+def run_node_worker(args):
+    """ワーカーモード: コーディネーターからキーワードを受け取って処理する"""
+    args.coordinator_url = args.join
+    node_worker.run_worker(args, should_stop=lambda: shutdown_state['requests'] > 0)
 
 def main():
-    """メイン処理：バッチ処理ループを実行"""
-    batch_number = 0
-    total_files_processed = 0
-    
+    """メイン処理：連続スケジューラでキーワードを処理する"""
+    args = parse_args()
+
+    # systemd などからの停止要求に対応
+    signal.signal(signal.SIGTERM, handle_shutdown_signal)
+    signal.signal(signal.SIGINT, handle_shutdown_signal)
+
+    if args.join:
+        run_node_worker(args)
+        return
+
+    if not os.path.isdir(delivery_folder_path):
+        print(f"エラー: delivery_folder が見つかりません: {delivery_folder_path}")
+        sys.exit(1)
+
+    if args.serve:
+        run_coordinator(args)
+        return
+
     print("=" * 60)
     print("自動バッチ処理システムを開始します")
     print("=" * 60)
-    
-    # 初回の全ファイル数を取得（進捗表示用）
-    initial_files = get_remaining_txt_files(delivery_folder_path)
-    total_initial_files = len(initial_files)
-    
-    if total_initial_files == 0:
+
+    # 未処理キーワードのキューを delivery_folder と同期し、初回の全ファイル数を取得（進捗表示用）
+    queue = keyword_queue.KeywordQueue(delivery_folder_path)
+    queue.reset_dispatched()
+    queue.sync(force=True)
+    total_initial_files = queue.count()
+
+    if total_initial_files == 0 and args.watch:
+        print("処理対象のテキストファイルはまだありません。delivery_folder への追加を待ちます。")
+    elif total_initial_files == 0:
         print("処理対象のテキストファイルが見つかりません。")
         print("delivery_folder内にテキストファイルを配置してから実行してください。")
+        queue.close()
         return
-    
+
     print(f"処理対象ファイル数: {total_initial_files}")
-    total_batches = math.ceil(total_initial_files / len(work_directories))
-    print(f"予想バッチ数: {total_batches}")
+    if args.pipeline:
+        print(f"パイプラインモード: 検索スロット {args.search_slots} / 抽出スロット {args.extract_slots} (作業フォルダー: {args.scratch_root})")
+    elif args.fixed_workspaces:
+        print(f"同時実行スロット数: {len(work_directories)} (固定フォルダー)")
+    else:
+        print(f"同時実行スロット数: {args.concurrency} (作業フォルダー: {args.scratch_root})")
+    if use_console_windows(args):
+        print("起動モード: コンソール")
+    else:
+        print(f"起動モード: headless (ログ: {args.log_dir})")
+    print(f"起動間隔: {args.stagger}秒 / 最大再起動回数: {args.max_restarts}")
+    if args.watch:
+        print("監視モード: delivery_folder に追加されたキーワードを処理し続けます (停止: SIGTERM / Ctrl+C)")
     print()
-    
-    while True:
-        batch_number += 1
-        
-        # 残りのテキストファイルを取得
-        remaining_txt_files = get_remaining_txt_files(delivery_folder_path)
-        
-        # 処理するファイルがない場合は終了
-        if not remaining_txt_files:
-            print("\n" + "=" * 60)
-            print("🎉 すべてのファイルの処理が完了しました！")
-            print(f"総処理ファイル数: {total_files_processed}")
-            print(f"実行バッチ数: {batch_number - 1}")
-            print("=" * 60)
-            break
-        
-        # 現在のバッチで処理するファイル数を決定
-        batch_size = min(len(remaining_txt_files), len(work_directories))
-        current_batch_files = remaining_txt_files[:batch_size]
-        
-        # バッチ処理を実行
-        success = process_batch(
-            current_batch_files, 
-            batch_number, 
-            total_initial_files, 
-            total_files_processed
-        )
-        
-        if not success:
-            print(f"⚠️ バッチ {batch_number} の処理中にエラーが発生しました。")
-            print("処理を継続しますが、結果を確認してください。")
-        
-        total_files_processed += batch_size
-        
-        # バッチ間の待機時間
-        if len(get_remaining_txt_files(delivery_folder_path)) > 0:
-            print(f"\n次のバッチまで10秒待機します...")
-            time.sleep(10)
+
+    summary = run_scheduler(total_initial_files, args, queue)
+    queue.close()
+    if summary is None:
+        return
+
+    print("\n" + "=" * 60)
+    print("🎉 すべてのファイルの処理が完了しました！")
+    print(f"総処理ファイル数: {len(summary['completed'])}")
+    if summary['failed']:
+        print(f"⚠️ 失敗したキーワード ({len(summary['failed'])}件): {', '.join(summary['failed'])}")
+        print("失敗したキーワードは delivery_folder に残っています。結果を確認してから再実行してください。")
+    print_exit_codes(summary['exit_codes'])
+    print_slot_utilization(summary['slot_stats'], summary['makespan'])
+    print("=" * 60)
+
+    # 失敗があった場合は非0で終了 (systemdなどから結果を判別できるように)
+    if summary['failed']:
+        sys.exit(1)
 
 # メイン処理を実行
 if __name__ == "__main__":